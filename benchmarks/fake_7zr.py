@@ -0,0 +1,32 @@
+"""
+Fake 7zr executable for offline TubeArc benchmarks.
+
+Understands the single invocation TubeArc uses for FFmpeg
+("7zr x ARCHIVE -oDIR -y") and extracts a ZIP archive in its place, so the
+extraction path can be exercised without the real 7-Zip binary.
+"""
+
+import sys
+import zipfile
+
+
+def main(argv):
+    if len(argv) < 2 or argv[0] != 'x':
+        print("fake 7zr only supports: x ARCHIVE -oDIR [-y]")
+        return 2
+
+    archive = argv[1]
+    out_dir = '.'
+    for arg in argv[2:]:
+        if arg.startswith('-o'):
+            out_dir = arg[2:]
+
+    with zipfile.ZipFile(archive) as zf:
+        zf.extractall(out_dir)
+        print(f"Extracted {len(zf.namelist())} files")
+    print("Everything is Ok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,215 @@
+"""
+Fake yt-dlp executable for offline TubeArc benchmarks.
+
+Accepts the subset of yt-dlp arguments that TubeArc builds, "downloads" a
+file of a configurable size at a configurable rate and prints progress
+lines in the same format as yt-dlp run with --newline.
+
+Behaviour is controlled through environment variables:
+    FAKE_YTDLP_SIZE     - Bytes written per requested format (default 5 MiB)
+    FAKE_YTDLP_RATE     - Download rate in bytes/second, 0 = unthrottled
+    FAKE_YTDLP_STARTUP  - Seconds of simulated interpreter/extractor startup
+    FAKE_YTDLP_ERROR    - If set, print this as an ERROR line and exit 1
+
+Single URLs can fail too: one containing "private" gets yt-dlp's private
+video error and one containing "throttled" an HTTP 429. The remaining URLs
+are still processed (as with --no-abort-on-error) and the exit code is 1.
+"""
+
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _format_bytes(num):
+    """Format a byte count the way yt-dlp does (e.g. '10.00MiB')."""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if num < 1024 or unit == "GiB":
+            return f"{num:.2f}{unit}"
+        num /= 1024
+
+
+def _format_eta(seconds):
+    """Format seconds as MM:SS."""
+    seconds = int(seconds)
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+def _parse_args(argv):
+    """Pull out the arguments the fake cares about."""
+    args = {'urls': [], 'output': '%(title)s.%(ext)s', 'format': 'best',
+            'merge': None, 'audio_format': None, 'batch_file': None,
+            'print_to_file': None, 'print_template': None, 'skip_download': False,
+            'dump_json': False}
+    takes_value = {'-o': 'output', '-f': 'format',
+                   '--merge-output-format': 'merge',
+                   '--audio-format': 'audio_format', '-a': 'batch_file'}
+    skip_value = {'--ffmpeg-location', '--postprocessor-args', '--sub-format',
+                  '--print'}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg in takes_value:
+            args[takes_value[arg]] = argv[i + 1]
+            i += 2
+            continue
+        if arg in skip_value:
+            i += 2
+            continue
+        if arg == '--print-to-file':
+            # "[when:]template" - a bare field name stands for %(name)s
+            template = re.sub(r'^\w+:(?!/)', '', argv[i + 1])
+            if '%(' not in template:
+                template = f"%({template})s"
+            args['print_template'] = template
+            args['print_to_file'] = argv[i + 2]
+            i += 3
+            continue
+        if arg == '--skip-download':
+            args['skip_download'] = True
+        if arg in ('--dump-json', '-j'):
+            args['dump_json'] = True
+        if arg in ('--version',):
+            print("2099.01.01-fake")
+            sys.exit(0)
+        if not arg.startswith('-'):
+            args['urls'].append(arg)
+        i += 1
+    if args['batch_file']:
+        with open(args['batch_file'], encoding='utf-8') as f:
+            args['urls'].extend(line.strip() for line in f if line.strip())
+    return args
+
+
+def _title_for(url):
+    """Derive a stable, filesystem-safe title from the URL."""
+    tail = url.rstrip('/').rsplit('/', 1)[-1] or 'video'
+    return re.sub(r'[^\w.-]+', '_', tail)
+
+
+def _render_template(template, title, ext):
+    """Fill an output template; unknown fields get yt-dlp's "NA"-style value."""
+    known = {'title': title, 'id': title, 'ext': ext, 'extractor_key': 'Generic'}
+
+    def field(match):
+        name = re.split(r'[,>|&.]', match.group(1))[0]
+        return known.get(name, 'NA')
+
+    return re.sub(r'%\(([^)]+)\)s', field, template)
+
+
+def _url_error(url):
+    """The error a marked URL fails with (see the module docstring), or None."""
+    video_id = _title_for(url)
+    if 'throttled' in url:
+        return (f"[generic] {video_id}: Unable to download webpage: "
+                "HTTP Error 429: Too Many Requests")
+    if 'private' in url:
+        return (f"[generic] {video_id}: Private video. "
+                "Sign in if you've been granted access to this video")
+    return None
+
+
+def _download_stream(path, size, rate):
+    """Write size bytes to path, printing progress lines as we go."""
+    part = Path(str(path) + '.part')
+    done = part.stat().st_size if part.exists() else 0
+    print(f"[download] Destination: {path}", flush=True)
+    if done:
+        print(f"[download] Resuming download at byte {done}", flush=True)
+
+    started = time.perf_counter()
+    start_done = done
+    chunk = b'\0' * CHUNK_SIZE
+    with part.open('ab') as f:
+        while done < size:
+            n = min(CHUNK_SIZE, size - done)
+            f.write(chunk[:n])
+            done += n
+            elapsed = max(time.perf_counter() - started, 1e-6)
+            if rate:
+                # Sleep until we're back under the configured rate
+                ahead = (done - start_done) / rate - elapsed
+                if ahead > 0:
+                    time.sleep(ahead)
+                    elapsed += ahead
+            speed = (done - start_done) / elapsed
+            eta = (size - done) / speed if speed else 0
+            print(f"[download] {done * 100 / size:5.1f}% of {_format_bytes(size)} "
+                  f"at {_format_bytes(speed)}/s ETA {_format_eta(eta)}", flush=True)
+    part.replace(path)
+
+
+def main(argv):
+    args = _parse_args(argv)
+    size = int(os.environ.get('FAKE_YTDLP_SIZE', 5 * 1024 * 1024))
+    rate = float(os.environ.get('FAKE_YTDLP_RATE', 0))
+    time.sleep(float(os.environ.get('FAKE_YTDLP_STARTUP', 0)))
+
+    error = os.environ.get('FAKE_YTDLP_ERROR')
+    if error:
+        print(f"ERROR: {error}", flush=True)
+        return 1
+
+    failed = False
+    for url in args['urls']:
+        print(f"[generic] Extracting URL: {url}", flush=True)
+        url_error = _url_error(url)
+        if url_error:
+            print(f"ERROR: {url_error}", flush=True)
+            failed = True
+            continue
+        title = _title_for(url)
+        streams = args['format'].split('/')[0].split('+') if args['merge'] else ['best']
+        ext = args['merge'] or args['audio_format'] or 'mp4'
+        final = Path(_render_template(args['output'], title, ext))
+
+        if args['dump_json']:
+            # Probe: report the formats that would be downloaded, write nothing
+            formats = [{'format_id': str(index), 'filesize': size}
+                       for index, _ in enumerate(streams)]
+            print(json.dumps({'id': title, 'title': title, 'duration': 60,
+                              'requested_formats': formats}), flush=True)
+            continue
+
+        final.parent.mkdir(parents=True, exist_ok=True)
+        if args['skip_download']:
+            # Metadata-only run: write the info JSON a real probe would produce
+            info = {'title': title, 'id': title, 'uploader': 'Fake Uploader',
+                    'upload_date': '20240101', 'extractor_key': 'Generic',
+                    'tags': ['fake'], 'webpage_url': url}
+            info_path = final.with_name(final.stem + '.info.json')
+            info_path.write_text(json.dumps(info), encoding='utf-8')
+            print(f"[info] Writing video metadata as JSON to: {info_path}", flush=True)
+        elif len(streams) > 1:
+            parts = []
+            for index, _ in enumerate(streams):
+                stream_path = final.with_name(f"{final.stem}.f{index}{final.suffix}")
+                _download_stream(stream_path, size, rate)
+                parts.append(stream_path)
+            print(f'[Merger] Merging formats into "{final}"', flush=True)
+            with final.open('wb') as out:
+                for stream_path in parts:
+                    out.write(stream_path.read_bytes())
+                    stream_path.unlink()
+        else:
+            _download_stream(final, size, rate)
+
+        if args['print_to_file']:
+            fields = {'filepath': str(final), 'filename': str(final),
+                      'original_url': url, 'webpage_url': url,
+                      'id': title, 'title': title}
+            line = re.sub(r'%\(([^)]+)\)s', lambda m: fields.get(m.group(1), 'NA'),
+                          args['print_template'])
+            with open(args['print_to_file'], 'a', encoding='utf-8') as f:
+                f.write(f"{line}\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,568 @@
+"""
+Offline benchmark suite for TubeArc.
+
+Drives the same code paths the application uses - building and running
+yt-dlp jobs, downloading tools and extracting FFmpeg - against a fake
+yt-dlp, a fake 7zr and a local throttleable HTTP server, then reports
+throughput and latency numbers that can be compared across commits.
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --compare baseline.json
+    python benchmarks/run_benchmarks.py --only ytdlp_job --repeat 10
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent.resolve()
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+import tubearc  # noqa: E402
+from server import BenchmarkServer  # noqa: E402
+
+MIB = 1024 * 1024
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def make_shim(bin_dir, name, script):
+    """
+    Create an executable wrapper that runs a fake tool with this interpreter.
+    
+    Args:
+        bin_dir: Directory to create the wrapper in
+        name: Base name of the wrapper (e.g. "yt-dlp")
+        script: Python script the wrapper should run
+        
+    Returns:
+        Path: Path to the executable wrapper
+    """
+    if os.name == 'nt':
+        shim = bin_dir / f"{name}.cmd"
+        shim.write_text(f'@"{sys.executable}" "{script}" %*\r\n')
+    else:
+        shim = bin_dir / name
+        shim.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n')
+        shim.chmod(0o755)
+    return shim
+
+
+def summarize(samples):
+    """Reduce a list of timings to median/min/max."""
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'max': max(samples),
+    }
+
+
+def git_commit():
+    """Return the current commit hash, or 'unknown' outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              cwd=BENCH_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def point_tools_at(work_dir, bin_dir):
+    """Redirect TubeArc's tool paths into the benchmark sandbox."""
+    tubearc.SCRIPT_DIR = work_dir
+    tubearc.BIN_DIR = bin_dir
+    tubearc.YT_DLP_PATH = make_shim(bin_dir, "yt-dlp", BENCH_DIR / "fake_ytdlp.py")
+    tubearc.SEVEN_ZIP_PATH = make_shim(bin_dir, "7zr", BENCH_DIR / "fake_7zr.py")
+    tubearc.FFMPEG_PATH = bin_dir / "ffmpeg.exe"
+    tubearc.FFMPEG_ARCHIVE = bin_dir / "ffmpeg-git-full.7z"
+
+
+# ============================================================================
+# SCENARIOS
+# Each scenario returns a flat dict of metrics. Names ending in _s are
+# latencies (lower is better); everything else is a rate (higher is better).
+# ============================================================================
+
+def bench_command_build(args, work_dir):
+    """Raw cost of turning options into a yt-dlp command line."""
+    iterations = 20000
+    option_sets = [
+        dict(tubearc.DEFAULT_DOWNLOAD_OPTIONS),
+        dict(tubearc.DEFAULT_DOWNLOAD_OPTIONS, combined=False, audio_only=True,
+             metadata=True, subtitles=True),
+    ]
+    started = time.perf_counter()
+    for i in range(iterations):
+        tubearc.build_download_command(f"https://youtu.be/{i}", work_dir,
+                                       option_sets[i % len(option_sets)])
+    elapsed = time.perf_counter() - started
+    return {'commands_per_s': iterations / elapsed}
+
+
+def bench_ytdlp_job(args, work_dir):
+    """Full job: build the command, run the fake yt-dlp, stream progress."""
+    out_dir = work_dir / "downloads"
+    os.environ['FAKE_YTDLP_SIZE'] = str(args.job_size_mb * MIB)
+    os.environ['FAKE_YTDLP_RATE'] = str(args.rate_mb * MIB)
+
+    first_progress, walls = [], []
+    for i in range(args.repeat):
+        cmd = tubearc.build_download_command(f"https://example.com/watch/{i}", out_dir,
+                                             tubearc.DEFAULT_DOWNLOAD_OPTIONS)
+        first = []
+        started = time.perf_counter()
+
+        def on_progress(progress, first=first, started=started):
+            if not first:
+                first.append(time.perf_counter() - started)
+
+        result = tubearc.run_download_command(cmd, on_progress)
+        walls.append(time.perf_counter() - started)
+        if result.returncode != 0:
+            raise RuntimeError(f"fake yt-dlp failed: {result.stdout[-300:]}")
+        first_progress.append(first[0] if first else walls[-1])
+
+    # Combined mode downloads two streams per job
+    job_bytes = 2 * args.job_size_mb * MIB
+    return {
+        'time_to_first_progress_s': statistics.median(first_progress),
+        'job_wall_s': statistics.median(walls),
+        'job_mb_per_s': job_bytes / MIB / statistics.median(walls),
+        'jobs_per_min': 60 / statistics.median(walls),
+    }
+
+
+def bench_engines(args, work_dir):
+    """
+    Per-job overhead of each download engine: a small direct-link download
+    through the real yt-dlp, as a process, in-process and on a warm worker.
+    The first job is reported separately - it includes warm-up costs.
+    """
+    if tubearc.load_yt_dlp_module() is None:
+        return {'skipped': 'yt_dlp package not installed'}
+
+    # Subprocess engine runs the installed package as a stand-in for yt-dlp.exe
+    script = work_dir / "real_ytdlp.py"
+    script.write_text("import yt_dlp\nyt_dlp.main()\n")
+    real_ytdlp = make_shim(work_dir / "bin", "real-yt-dlp", script)
+
+    metrics = {}
+    with BenchmarkServer() as server:
+        url = server.add_file("/clip.mp4", os.urandom(MIB), content_type="video/mp4")
+        # The pool starts warming up here, as it does when TubeArc starts
+        engines = [tubearc.SubprocessEngine(), tubearc.EmbeddedEngine(),
+                   tubearc.WorkerPoolEngine()]
+        for engine in engines:
+            walls = []
+            for i in range(args.repeat + 1):
+                out_dir = work_dir / f"engine-{engine.name}-{i}"
+                cmd = [str(real_ytdlp), url, "-o", str(out_dir / "%(title)s.%(ext)s"),
+                       "-f", "b", "--newline", "--no-playlist"]
+                started = time.perf_counter()
+                result = engine.run(cmd)
+                walls.append(time.perf_counter() - started)
+                if result.returncode != 0:
+                    raise RuntimeError(f"{engine.name} engine failed: {result.stdout[-300:]}")
+            engine.close()
+            metrics[f'{engine.name}_first_job_s'] = walls[0]
+            metrics[f'{engine.name}_job_s'] = statistics.median(walls[1:])
+    return metrics
+
+
+def bench_size_probe(args, work_dir):
+    """Cost of predicting a job's size before admitting it (fake yt-dlp probe)."""
+    os.environ['FAKE_YTDLP_SIZE'] = str(args.job_size_mb * MIB)
+    engine = tubearc.SubprocessEngine()
+    walls = []
+    for i in range(args.repeat):
+        job = tubearc.ArchiveJob(f"https://example.com/watch/{i}", work_dir / "downloads",
+                                 tubearc.DEFAULT_DOWNLOAD_OPTIONS)
+        started = time.perf_counter()
+        size = tubearc.predict_job_size(job, engine)
+        walls.append(time.perf_counter() - started)
+        if size != 2 * 2 * args.job_size_mb * MIB:
+            raise RuntimeError(f"unexpected prediction {size}")
+    return {'probe_s': statistics.median(walls)}
+
+
+def bench_download_file(args, work_dir):
+    """Tool download through download_file() against the local server."""
+    if not tubearc.REQUESTS_AVAILABLE:
+        return {'skipped': 'requests not installed'}
+
+    payload = os.urandom(args.tool_size_mb * MIB)
+    destination = work_dir / "tool.bin"
+    walls = []
+    with BenchmarkServer(rate=args.rate_mb * MIB) as server:
+        url = server.add_file("/tool.bin", payload)
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            tubearc.download_file(url, destination)
+            walls.append(time.perf_counter() - started)
+            destination.unlink()
+
+    return {
+        'download_wall_s': statistics.median(walls),
+        'download_mb_per_s': args.tool_size_mb / statistics.median(walls),
+    }
+
+
+def bench_ffmpeg_mirrors(args, work_dir):
+    """
+    FFmpeg archive from three mirrors of different speeds: the old sequential
+    path (first mirror only) vs. racing, plus failover from a mirror that
+    hangs halfway through - resuming when the hash is known, restarting
+    when it isn't.
+    """
+    if not tubearc.REQUESTS_AVAILABLE:
+        return {'skipped': 'requests not installed'}
+
+    size = args.tool_size_mb * MIB
+    payload = os.urandom(size)
+    destination = work_dir / "ffmpeg.7z"
+    # Rates are relative to the file size so the scenario takes a few
+    # seconds whatever --tool-size-mb is: 8s, 4s and 2s at full length
+    with BenchmarkServer() as server:
+        slow = server.add_file("/slow/ffmpeg.7z", payload, rate=size / 8)
+        medium = server.add_file("/medium/ffmpeg.7z", payload, rate=size / 4)
+        fast = server.add_file("/fast/ffmpeg.7z", payload, rate=size / 2)
+        hung = server.add_file("/hung/ffmpeg.7z", payload, rate=size / 2,
+                               stall_after=size // 2)
+
+        started = time.perf_counter()
+        tubearc.download_file(slow, destination)
+        sequential = time.perf_counter() - started
+        destination.unlink()
+
+        started = time.perf_counter()
+        tubearc.download_from_mirrors([slow, medium, fast], destination, probe_seconds=1.0)
+        hedged = time.perf_counter() - started
+        if destination.read_bytes() != payload:
+            raise RuntimeError("raced download is corrupt")
+        destination.unlink()
+
+        started = time.perf_counter()
+        tubearc.download_from_mirrors([slow, hung, medium], destination,
+                                      probe_seconds=1.0, stall_timeout=1.0,
+                                      sha256=hashlib.sha256(payload).hexdigest())
+        failover = time.perf_counter() - started
+        if destination.read_bytes() != payload:
+            raise RuntimeError("failed-over download is corrupt")
+        destination.unlink()
+
+        started = time.perf_counter()
+        tubearc.download_from_mirrors([slow, hung, medium], destination,
+                                      probe_seconds=1.0, stall_timeout=1.0)
+        restart = time.perf_counter() - started
+        if destination.read_bytes() != payload:
+            raise RuntimeError("restarted download is corrupt")
+        destination.unlink()
+
+    return {
+        'sequential_wall_s': sequential,
+        'hedged_wall_s': hedged,
+        'failover_wall_s': failover,
+        'failover_restart_wall_s': restart,
+    }
+
+
+def bench_extract_ffmpeg(args, work_dir):
+    """FFmpeg extraction path: unpack, locate ffmpeg.exe, move, clean up."""
+    payload = os.urandom(args.tool_size_mb * MIB)
+    walls = []
+    for _ in range(args.repeat):
+        with zipfile.ZipFile(tubearc.FFMPEG_ARCHIVE, 'w') as zf:
+            zf.writestr("ffmpeg-2099-full_build/bin/ffmpeg.exe", payload)
+            zf.writestr("ffmpeg-2099-full_build/doc/readme.txt", "fake")
+        started = time.perf_counter()
+        tubearc.extract_ffmpeg()
+        walls.append(time.perf_counter() - started)
+        tubearc.FFMPEG_PATH.unlink()
+
+    return {
+        'extract_wall_s': statistics.median(walls),
+        'extract_mb_per_s': args.tool_size_mb / statistics.median(walls),
+    }
+
+
+def bench_metadata_harvest(args, work_dir):
+    """Metadata-only probes driven by the asyncio harvester."""
+    os.environ['FAKE_YTDLP_STARTUP'] = str(args.startup_s)
+    urls = [f"https://example.com/watch/meta{i}" for i in range(args.harvest_urls)]
+    started = time.perf_counter()
+    results = tubearc.harvest_metadata(urls, work_dir / "harvest", concurrency=args.concurrency,
+                                       update_catalog=False)
+    elapsed = time.perf_counter() - started
+    os.environ['FAKE_YTDLP_STARTUP'] = '0'
+    if not all(result['ok'] for result in results):
+        raise RuntimeError("fake metadata probe failed")
+    return {'harvest_wall_s': elapsed, 'urls_per_s': len(urls) / elapsed}
+
+
+def bench_update_check(args, work_dir):
+    """Self-update against a GitHub stand-in: first check vs. a 304 re-check."""
+    if not tubearc.REQUESTS_AVAILABLE:
+        return {'skipped': 'requests not installed'}
+
+    files = {name: os.urandom(256 * 1024) for name in tubearc.UPDATE_FILES}
+    with BenchmarkServer(rate=args.rate_mb * MIB) as server:
+        api_url, raw_url = server.add_github_release("v99.0.0", files)
+        tubearc.GITHUB_API_URL, tubearc.GITHUB_RAW_URL = api_url, raw_url
+
+        started = time.perf_counter()
+        release, validators, _ = tubearc.fetch_latest_release({})
+        first_check = time.perf_counter() - started
+
+        cache = {'release': release, 'release_validators': validators}
+        rechecks = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            _, _, changed = tubearc.fetch_latest_release(cache)
+            rechecks.append(time.perf_counter() - started)
+            if changed:
+                raise RuntimeError("unchanged release was not answered with 304")
+
+        started = time.perf_counter()
+        payloads, file_validators = tubearc.download_update_files(tubearc.UPDATE_FILES)
+        full_download = time.perf_counter() - started
+        if payloads is None:
+            raise RuntimeError("release manifest was not found")
+
+        started = time.perf_counter()
+        unchanged, _ = tubearc.download_update_files(tubearc.UPDATE_FILES, file_validators)
+        recheck_download = time.perf_counter() - started
+        if unchanged:
+            raise RuntimeError("unchanged files were downloaded again")
+
+    return {
+        'first_check_s': first_check,
+        'unchanged_check_s': statistics.median(rechecks),
+        'update_download_s': full_download,
+        'unchanged_update_s': recheck_download,
+    }
+
+
+def bench_batch(args, work_dir):
+    """
+    Batched short clips: one fake yt-dlp per batch, with every job's result
+    read back from the shared output and manifest. A private clip must fail
+    alone, and a throttled one must stop the batch and halve its size.
+    """
+    os.environ['FAKE_YTDLP_SIZE'] = str(256 * 1024)
+    os.environ['FAKE_YTDLP_RATE'] = str(args.rate_mb * MIB)
+    out_dir = work_dir / "batches"
+    options = dict(tubearc.DEFAULT_DOWNLOAD_OPTIONS, combined=False)
+    batcher = tubearc.JobBatcher(start=4)
+
+    def make_jobs(names):
+        return [tubearc.ArchiveJob(f"https://www.tiktok.com/@fake/video/{name}", out_dir,
+                                   options, source='api')
+                for name in names]
+
+    def run(jobs):
+        started = time.perf_counter()
+        results = batcher.run(jobs)
+        wall = time.perf_counter() - started
+        for job in jobs:
+            if not results.get(job.job_id):
+                job.failure, _ = tubearc.classify_failure(job.error)
+        return results, wall
+
+    jobs = make_jobs(["1001", "private-1002", "1003", "1004"])
+    results, mixed_wall = run(jobs)
+    mixed_jobs = len(jobs)
+    for job in jobs:
+        expected = 'private' not in job.url
+        if results.get(job.job_id) != expected or bool(job.files) != expected:
+            raise RuntimeError(f"{job.url}: archived={results.get(job.job_id)}, "
+                               f"files={job.files}, error={job.error!r}")
+    if jobs[1].failure != tubearc.FAILURE_PERMANENT:
+        raise RuntimeError(f"private clip failed as {jobs[1].failure}")
+    if batcher.sizes().get('tiktok') != 5:
+        raise RuntimeError(f"full batch didn't grow the size: {batcher.sizes()}")
+
+    jobs = make_jobs(["2001", "2002", "throttled-2003", "2004", "2005"])
+    results, throttled_wall = run(jobs)
+    if not (results.get(jobs[0].job_id) and results.get(jobs[1].job_id)):
+        raise RuntimeError("clips before the throttled one weren't archived")
+    for job in jobs[2:]:
+        # Clips after the throttled one may have finished before the batch
+        # was stopped; the rest must be backed off as throttled
+        if not results.get(job.job_id) and job.failure != tubearc.FAILURE_THROTTLED:
+            raise RuntimeError(f"{job.url} failed as {job.failure}: {job.error!r}")
+    if results.get(jobs[2].job_id):
+        raise RuntimeError("throttled clip counted as archived")
+    if batcher.sizes().get('tiktok') != 2:
+        raise RuntimeError(f"throttling didn't halve the batch size: {batcher.sizes()}")
+
+    return {
+        'batch_wall_s': mixed_wall,
+        'batch_jobs_per_s': mixed_jobs / mixed_wall,
+        'throttled_batch_wall_s': throttled_wall,
+    }
+
+
+# Real yt-dlp error output and the failure class TubeArc must give it
+FAILURE_CASES = [
+    ("ERROR: [youtube] dQw4w9WgXcQ: Unable to download API page: HTTP Error 429: Too Many Requests",
+     tubearc.FAILURE_THROTTLED),
+    ("ERROR: [youtube] dQw4w9WgXcQ: Sign in to confirm you’re not a bot. Use --cookies-from-browser "
+     "or --cookies for the authentication.",
+     tubearc.FAILURE_THROTTLED),
+    ("ERROR: [instagram] C0ffee: Requested content is not available, rate-limit reached "
+     "or login required. HTTP Error 403: Forbidden",
+     tubearc.FAILURE_THROTTLED),
+    ("ERROR: unable to download video data: HTTP Error 403: Forbidden",
+     tubearc.FAILURE_TRANSIENT),
+    ("ERROR: [generic] Unable to download webpage: HTTP Error 403: Forbidden (Access Denied)",
+     tubearc.FAILURE_PERMANENT),
+    ("ERROR: [youtube] dQw4w9WgXcQ: The uploader has not made this video available in your "
+     "country. HTTP Error 403: Forbidden",
+     tubearc.FAILURE_PERMANENT),
+    ("ERROR: unable to download video data: HTTP Error 503: Service Unavailable",
+     tubearc.FAILURE_TRANSIENT),
+    ("ERROR: [youtube] dQw4w9WgXcQ: Unable to download API page: HTTP Error 500: "
+     "Internal Server Error",
+     tubearc.FAILURE_TRANSIENT),
+    ("WARNING: [youtube] Unable to download webpage: The read operation timed out. Retrying (1/3)...\n"
+     "ERROR: [youtube] dQw4w9WgXcQ: Unable to download webpage: The read operation timed out "
+     "(caused by TransportError('The read operation timed out'))",
+     tubearc.FAILURE_TRANSIENT),
+    ("ERROR: [youtube] dQw4w9WgXcQ: Video unavailable. This video is not available in your country",
+     tubearc.FAILURE_PERMANENT),
+    ("ERROR: [youtube] dQw4w9WgXcQ: Private video. Sign in if you've been granted access to this video",
+     tubearc.FAILURE_PERMANENT),
+    ("ERROR: [youtube] dQw4w9WgXcQ: Sign in to confirm your age. This video may be inappropriate "
+     "for some users.",
+     tubearc.FAILURE_PERMANENT),
+    ("ERROR: [youtube] dQw4w9WgXcQ: Video unavailable. This video has been removed by the uploader",
+     tubearc.FAILURE_PERMANENT),
+    ("WARNING: [youtube] HTTP Error 429: Too Many Requests. Retrying (1/3)...\n"
+     "ERROR: [youtube] dQw4w9WgXcQ: Private video. Sign in if you've been granted access to this video",
+     tubearc.FAILURE_PERMANENT),
+    ("Worker process exited unexpectedly (exit code -9)",
+     tubearc.FAILURE_TRANSIENT),
+]
+
+
+def bench_failure_classification(args, work_dir):
+    """Failure classification of real yt-dlp errors (any misclassification fails)."""
+    wrong = []
+    for output, expected in FAILURE_CASES:
+        failure, _ = tubearc.classify_failure(output)
+        if failure != expected:
+            wrong.append(f"{output.splitlines()[-1][:80]!r}: {failure}, expected {expected}")
+    if wrong:
+        raise RuntimeError("misclassified failures:\n  " + "\n  ".join(wrong))
+
+    iterations = 2000
+    started = time.perf_counter()
+    for i in range(iterations):
+        tubearc.classify_failure(FAILURE_CASES[i % len(FAILURE_CASES)][0])
+    return {'classifications_per_s': iterations / (time.perf_counter() - started)}
+
+
+SCENARIOS = {
+    'command_build': bench_command_build,
+    'ytdlp_job': bench_ytdlp_job,
+    'engines': bench_engines,
+    'size_probe': bench_size_probe,
+    'download_file': bench_download_file,
+    'ffmpeg_mirrors': bench_ffmpeg_mirrors,
+    'extract_ffmpeg': bench_extract_ffmpeg,
+    'metadata_harvest': bench_metadata_harvest,
+    'update_check': bench_update_check,
+    'batch': bench_batch,
+    'failure_classification': bench_failure_classification,
+}
+
+
+# ============================================================================
+# REPORTING
+# ============================================================================
+
+def print_results(results, baseline=None):
+    """Print metrics, with the change against a baseline run if provided."""
+    base = baseline['scenarios'] if baseline else {}
+    for scenario, metrics in results['scenarios'].items():
+        print(f"\n{scenario}")
+        for name, value in metrics.items():
+            if not isinstance(value, (int, float)):
+                print(f"  {name:<28} {value}")
+                continue
+            line = f"  {name:<28} {value:>12.4f}"
+            old = base.get(scenario, {}).get(name)
+            if isinstance(old, (int, float)) and old:
+                change = (value - old) / old * 100
+                better = change < 0 if name.endswith('_s') else change > 0
+                line += f"   {change:+7.1f}% {'better' if better else 'worse'}"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run TubeArc offline benchmarks")
+    parser.add_argument("--only", action="append", choices=sorted(SCENARIOS),
+                        help="Run only the given scenario (repeatable)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Samples per scenario (default: 5)")
+    parser.add_argument("--job-size-mb", type=int, default=8,
+                        help="Size of each fake media stream (default: 8)")
+    parser.add_argument("--tool-size-mb", type=int, default=32,
+                        help="Size of the fake tool download (default: 32)")
+    parser.add_argument("--rate-mb", type=float, default=0,
+                        help="Throttle fake downloads to MB/s (default: unthrottled)")
+    parser.add_argument("--harvest-urls", type=int, default=100,
+                        help="URLs probed by the metadata_harvest scenario (default: 100)")
+    parser.add_argument("--concurrency", type=int, default=32,
+                        help="Concurrent probes for metadata_harvest (default: 32)")
+    parser.add_argument("--startup-s", type=float, default=0.1,
+                        help="Simulated yt-dlp startup per probe (default: 0.1)")
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON to compare against")
+    args = parser.parse_args()
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scenarios': {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="tubearc-bench-") as tmp:
+        work_dir = Path(tmp)
+        bin_dir = work_dir / "bin"
+        bin_dir.mkdir()
+        point_tools_at(work_dir, bin_dir)
+
+        for name in args.only or SCENARIOS:
+            print(f"Running {name}...", file=sys.stderr)
+            # TubeArc's own logging goes to stderr so stdout stays readable
+            with contextlib.redirect_stdout(sys.stderr):
+                results['scenarios'][name] = SCENARIOS[name](args, work_dir)
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    print(f"TubeArc benchmarks @ {results['commit']} (Python {results['python']})")
+    print_results(results, baseline)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Local, throttleable HTTP server for offline TubeArc benchmarks.
+
+Serves in-memory files so tool downloads (yt-dlp, 7-Zip, FFmpeg) can be
+measured without touching the internet. Supports HEAD, byte-range requests,
+conditional requests (ETag / Last-Modified -> 304), a per-connection
+rate limit and mirrors that stall mid-transfer. add_github_release() makes it stand in for GitHub's releases
+API and raw file hosting during update checks.
+
+Usage:
+    server = BenchmarkServer(rate=5 * 1024 * 1024)
+    url = server.add_file("/ffmpeg.7z", payload)
+    server.start()
+    ...
+    server.stop()
+"""
+
+import hashlib
+import json
+import sys
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHUNK_SIZE = 64 * 1024
+
+# How long a stalling file keeps the connection open after it stops sending
+STALL_SECONDS = 60
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler serving the files registered on the server."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        pass
+
+    def _lookup(self):
+        entry = self.server.files.get(self.path.split('?', 1)[0])
+        if entry is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        return entry
+
+    def _byte_range(self, size):
+        """Return (start, end) for a Range header, or None for the full body."""
+        header = self.headers.get("Range")
+        if not header or not header.startswith("bytes="):
+            return None
+        start, _, end = header[len("bytes="):].partition("-")
+        start = int(start or 0)
+        end = int(end) if end else size - 1
+        return start, min(end, size - 1)
+
+    def _not_modified(self, entry):
+        """Answer a conditional request with 304 if the client copy is current."""
+        if_none_match = self.headers.get("If-None-Match")
+        if_modified_since = self.headers.get("If-Modified-Since")
+        fresh = (if_none_match == entry['etag'] if if_none_match
+                 else if_modified_since == entry['last_modified'])
+        if fresh:
+            self.server.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", entry['etag'])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        return fresh
+
+    def _send_headers(self, entry):
+        payload = entry['data']
+        byte_range = self._byte_range(len(payload))
+        if byte_range:
+            start, end = byte_range
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(payload)}")
+        else:
+            start, end = 0, len(payload) - 1
+            self.send_response(200)
+        self.send_header("Content-Type", entry['content_type'])
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", entry['etag'])
+        self.send_header("Last-Modified", entry['last_modified'])
+        self.end_headers()
+        return start, end
+
+    def do_HEAD(self):
+        entry = self._lookup()
+        if entry is not None:
+            self._send_headers(entry)
+
+    def do_GET(self):
+        entry = self._lookup()
+        if entry is None:
+            return
+        self.server.requests += 1
+        if self._not_modified(entry):
+            return
+        start, end = self._send_headers(entry)
+        rate = entry['rate'] if entry['rate'] is not None else self.server.rate
+        view = memoryview(entry['data'])[start:end + 1]
+
+        started = time.perf_counter()
+        sent = 0
+        stall_after = entry['stall_after']
+        try:
+            while sent < len(view):
+                if stall_after is not None and start + sent >= stall_after:
+                    # Hold the connection open without sending anything
+                    time.sleep(STALL_SECONDS)
+                    return
+                chunk = view[sent:sent + CHUNK_SIZE]
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                if rate:
+                    ahead = sent / rate - (time.perf_counter() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled the download - expected when racing mirrors
+            pass
+
+
+class _QuietServer(ThreadingHTTPServer):
+    """Doesn't print a traceback when a client hangs up mid-request."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+class BenchmarkServer:
+    """
+    Threaded HTTP server bound to localhost on an ephemeral port.
+    
+    Args:
+        rate: Default per-connection rate limit in bytes/second (0 = none)
+    """
+
+    def __init__(self, rate=0):
+        self._httpd = _QuietServer(("127.0.0.1", 0), _Handler)
+        self._httpd.files = {}
+        self._httpd.rate = rate
+        self._httpd.requests = 0
+        self._httpd.not_modified = 0
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_file(self, path, data, rate=None, content_type="application/octet-stream",
+                 stall_after=None):
+        """
+        Register an in-memory file.
+        
+        Args:
+            path: URL path, e.g. "/yt-dlp.exe"
+            data: File contents (bytes)
+            rate: Per-file rate limit overriding the server default
+            content_type: Content-Type header value
+            stall_after: Stop sending (but keep the connection open) once this
+                byte offset is reached - simulates a hung mirror
+            
+        Returns:
+            str: Absolute URL of the file
+        """
+        self._httpd.files[path] = {
+            'data': data, 'rate': rate, 'content_type': content_type,
+            'stall_after': stall_after,
+            'etag': '"%s"' % hashlib.blake2b(data, digest_size=12).hexdigest(),
+            'last_modified': formatdate(time.time(), usegmt=True),
+        }
+        return self.base_url + path
+
+    def add_github_release(self, tag, files, owner="owner", repo="repo"):
+        """
+        Mimic a GitHub release: the releases API plus raw files and SHA256SUMS.
+        
+        Args:
+            tag: Release tag, e.g. "v9.9.9"
+            files: Dict of file name -> bytes served from the raw URL
+            
+        Returns:
+            tuple: (api_url, raw_base_url) for TUBEARC_GITHUB_API_URL and
+                TUBEARC_GITHUB_RAW_URL
+        """
+        release = json.dumps({'tag_name': tag, 'body': f"Release {tag}"}).encode()
+        api_url = self.add_file(f"/repos/{owner}/{repo}/releases/latest", release,
+                                content_type="application/json")
+        sums = "".join(f"{hashlib.sha256(data).hexdigest()}  {name}\n"
+                       for name, data in files.items())
+        raw_base = f"/{owner}/{repo}/main"
+        for name, data in files.items():
+            self.add_file(f"{raw_base}/{name}", data, content_type="text/plain")
+        self.add_file(f"{raw_base}/SHA256SUMS", sums.encode(), content_type="text/plain")
+        return api_url, self.base_url + raw_base
+
+    @property
+    def stats(self):
+        """Request counters: total GETs and how many were answered with 304."""
+        return {'requests': self._httpd.requests, 'not_modified': self._httpd.not_modified}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -33,7 +33,39 @@ import re
 import json
 import shutil
 import sys
+import os
+import time
+import cProfile
+import pstats
+import uuid
+import random
+import heapq
+import hashlib
+import hmac
+import argparse
+import sqlite3
+import asyncio
+import tempfile
+import queue
+import multiprocessing
+import importlib.util
+from collections import deque, defaultdict, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+# resource is POSIX-only; subprocess CPU accounting is skipped without it
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# psutil is optional; worker memory falls back to resource's peak RSS
+try:
+    import psutil
+except ImportError:
+    psutil = None
 
 # Try to import requests, handle if not available
 try:
@@ -56,6 +88,14 @@ GITHUB_REPO_NAME = "TubeArc"
 GITHUB_RAW_URL = f"https://raw.githubusercontent.com/{GITHUB_REPO_OWNER}/{GITHUB_REPO_NAME}/main"
 GITHUB_API_URL = f"https://api.github.com/repos/{GITHUB_REPO_OWNER}/{GITHUB_REPO_NAME}/releases/latest"
 
+# Point the update check at a local stand-in (e.g. for testing)
+GITHUB_RAW_URL = os.environ.get("TUBEARC_GITHUB_RAW_URL", GITHUB_RAW_URL)
+GITHUB_API_URL = os.environ.get("TUBEARC_GITHUB_API_URL", GITHUB_API_URL)
+
+# Files replaced by a self-update, and the checksum manifest that vouches for them
+UPDATE_FILES = ["tubearc.py", "updater.py", "README.md", "README_TUBEARC.md"]
+UPDATE_CHECKSUMS_FILE = "SHA256SUMS"
+
 # ============================================================================
 # CONFIGURATION & CONSTANTS
 # Project Kitsune - Like the mythical fox, adaptable and clever
@@ -65,25 +105,46 @@ GITHUB_API_URL = f"https://api.github.com/repos/{GITHUB_REPO_OWNER}/{GITHUB_REPO
 SCRIPT_DIR = Path(__file__).parent.resolve()
 BIN_DIR = SCRIPT_DIR / "bin"
 DOWNLOAD_FOLDER = SCRIPT_DIR / "TubeArcDownloads"
+STATE_DB_PATH = SCRIPT_DIR / "tubearc_state.db"
+PROFILE_DIR = SCRIPT_DIR / "profiles"
+
+# Legacy state files, imported into the state store on first start
 CONFIG_PATH = SCRIPT_DIR / "config.json"
 VERSION_CACHE_PATH = SCRIPT_DIR / "version_cache.json"
+JOURNAL_PATH = SCRIPT_DIR / "jobs.journal"
+DEDUP_CACHE_PATH = SCRIPT_DIR / "dedup_cache.json"
+CATALOG_PATH = SCRIPT_DIR / "catalog.db"
 
 # Tool paths
 YT_DLP_PATH = BIN_DIR / "yt-dlp.exe"
 SEVEN_ZIP_PATH = BIN_DIR / "7zr.exe"
 FFMPEG_PATH = BIN_DIR / "ffmpeg.exe"
+FFPROBE_PATH = BIN_DIR / "ffprobe.exe"
 FFMPEG_ARCHIVE = BIN_DIR / "ffmpeg-git-full.7z"
 
 # Download URLs
 YT_DLP_URL = "https://github.com/yt-dlp/yt-dlp/releases/latest/download/yt-dlp.exe"
 SEVEN_ZIP_URL = "https://7-zip.org/a/7zr.exe"
 
-# FFmpeg URLs - Primary and fallback
+# FFmpeg URLs - mirrors of the same release build (never mix in a nightly:
+# the mirrors are raced and must all serve identical bytes)
 FFMPEG_URLS = [
-    "https://www.gyan.dev/ffmpeg/builds/ffmpeg-git-full.7z",
+    "https://www.gyan.dev/ffmpeg/builds/packages/ffmpeg-7.1-full_build.7z",
     "https://github.com/GyanD/codexffmpeg/releases/download/7.1/ffmpeg-7.1-full_build.7z",
 ]
 
+# SHA-256 of the archive above, when known. With a hash a stalled download
+# resumes on another mirror and is checked at the end; without one the next
+# mirror starts the file over, since bytes from two servers can't be trusted
+# to splice
+FFMPEG_SHA256 = None
+
+# Mirror racing - all FFMPEG_URLS are probed for this long before the fastest
+# one is kept, and a mirror that sends nothing for the stall timeout is
+# abandoned in favour of the next-best one
+MIRROR_PROBE_SECONDS = 3.0
+MIRROR_STALL_TIMEOUT = 20.0
+
 # Platform detection patterns
 PLATFORM_PATTERNS = {
     "youtube": r'https?://(www\.)?(youtube\.com|youtu\.be)',
@@ -99,6 +160,5770 @@ PLATFORM_CONFIG = {
     "unknown": {"label": "⚠ Unknown platform", "color": "red"}
 }
 
+# Progress line emitted by yt-dlp when run with --newline, e.g.
+# "[download]  42.3% of ~ 10.00MiB at  1.23MiB/s ETA 00:05"
+PROGRESS_PATTERN = re.compile(
+    r'\[download\]\s+(?P<percent>[\d.]+)%'
+    r'(?:\s+of\s+~?\s*(?P<total>[\d.]+\s*\w+))?'
+    r'(?:\s+at\s+(?P<speed>\S+(?:\s*\S+/s)?))?'
+    r'(?:\s+ETA\s+(?P<eta>\S+))?'
+)
+
+# Default archive options (mirrors the checkboxes in the options section)
+DEFAULT_DOWNLOAD_OPTIONS = {
+    'combined': True,
+    'video_only': False,
+    'audio_only': False,
+    'metadata': False,
+    'subtitles': False,
+    'metadata_only': False,
+    'layout': 'flat',
+    'quality': 'best',
+}
+
+# Output layouts - where files land inside the archive directory.
+# "hash" can't be expressed as a yt-dlp template; files are written flat and
+# then moved into their shard by place_in_shard() once the job finishes.
+OUTPUT_LAYOUTS = {
+    'flat': "%(title)s.%(ext)s",
+    'platform': "%(extractor_key|Unknown)s/%(title)s.%(ext)s",
+    'uploader': "%(uploader,channel,uploader_id|Unknown)s/%(title)s.%(ext)s",
+    'date': "%(upload_date>%Y|Unknown)s/%(upload_date>%m|00)s/%(title)s.%(ext)s",
+    'hash': "%(title)s.%(ext)s",
+}
+
+# Number of hex digits in a hash shard directory name (2 = 256 shards)
+HASH_SHARD_WIDTH = 2
+
+# File extensions treated as the main media file of a download
+MEDIA_EXTENSIONS = {
+    '.mp4', '.mkv', '.webm', '.mov', '.avi', '.flv', '.m4v',
+    '.m4a', '.mp3', '.opus', '.ogg', '.wav', '.flac', '.aac',
+}
+
+# Finished/failed jobs are kept in the job history for this many days
+JOB_HISTORY_DAYS = 30
+
+# Disk space admission - space always left free on an archive volume, the
+# size assumed for a job whose formats couldn't be probed, and how much more
+# than the download a merge/audio conversion needs while both files exist
+DISK_SAFETY_MARGIN_MB = 2048
+UNKNOWN_JOB_SIZE_MB = 512
+POSTPROCESS_SPACE_FACTOR = 2.0
+
+# How often jobs held back for disk space are checked again
+HELD_JOB_RECHECK_SECONDS = 30
+
+# Automatic retries of failed jobs - (first delay, longest delay) in seconds
+# per failure class, doubling with every retry. Throttled jobs back off much
+# longer so the site has a chance to forget about us.
+JOB_MAX_RETRIES = 5
+RETRY_BACKOFF = {
+    'transient': (30, 15 * 60),
+    'throttled': (5 * 60, 60 * 60),
+}
+
+# Batched short-form archiving - queued jobs for these sites that share their
+# options run several at a time in one yt-dlp.exe (-a batch file), so process
+# startup and extractor setup are paid once per batch. A site's batch size
+# starts at BATCH_SIZE_START, grows by one after every full batch that went
+# through cleanly and halves when the site throttles us.
+BATCH_PLATFORMS = ('tiktok', 'instagram')
+BATCH_SIZE_START = 4
+BATCH_SIZE_MAX = 25
+# Time allowed per clip in a batch, and the size the disk check assumes for
+# one (batched jobs aren't probed - that would start the process batching saves)
+BATCH_TIMEOUT_PER_JOB = 120
+BATCH_JOB_SIZE_MB = 64
+
+# Job queue limits - waiting jobs beyond the capacity are refused (HTTP 429
+# from the API), and only this many finished jobs are kept in memory
+DEFAULT_QUEUE_CAPACITY = 100
+JOB_QUEUE_KEEP_FINISHED = 1000
+
+# HTTP API (service mode) - local-only unless api_host is changed
+API_DEFAULT_HOST = "127.0.0.1"
+API_DEFAULT_PORT = 8765
+API_MAX_BODY = 1024 * 1024
+API_EVENT_INTERVAL = 0.25
+API_EVENT_HEARTBEAT = 15
+
+# Channel subscriptions - how often each one is synced by default, how many
+# of its newest video IDs are remembered as the high-water mark, the most
+# entries one sync lists (in case every remembered ID has been deleted), and
+# the least time between two listings on the same platform
+SUBSCRIPTION_INTERVAL_HOURS = 24
+SUBSCRIPTION_SEEN_IDS = 50
+SUBSCRIPTION_MAX_NEW = 200
+SUBSCRIPTION_ERROR_RETRY = 60 * 60
+PLATFORM_LISTING_SPACING = {'youtube': 30, 'tiktok': 120, 'instagram': 300}
+DEFAULT_LISTING_SPACING = 60
+
+# Concurrent yt-dlp probes for metadata-only harvests
+DEFAULT_HARVEST_CONCURRENCY = 32
+
+# Warm worker pool - recycle a worker after this many jobs or this much memory,
+# and kill it if a job is still running this long after its timeout
+WORKER_MAX_JOBS = 50
+WORKER_MAX_MEMORY_MB = 1024
+WORKER_KILL_GRACE = 10
+
+# Extractors loaded by each pool worker before it takes its first job
+WORKER_WARM_EXTRACTORS = ['Youtube', 'YoutubeTab', 'TikTok', 'Instagram', 'Generic']
+
+# Set TUBEARC_PROFILE=1 (or "profile_jobs": true in config.json) to profile jobs
+PROFILE_ENV_VAR = "TUBEARC_PROFILE"
+
+
+# ============================================================================
+# SELF-UPDATE HELPERS
+# Kitsune only sheds its coat when the new one truly fits
+# ============================================================================
+
+def conditional_get(url, validators=None, timeout=30):
+    """
+    GET a URL, sending stored validators so an unchanged resource costs a 304.
+    
+    Args:
+        url: URL to fetch
+        validators: Dict with optional 'etag' and 'last_modified' from a
+            previous response
+        timeout: Request timeout in seconds
+        
+    Returns:
+        tuple: (response, validators to store for next time)
+    """
+    validators = validators or {}
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    
+    response = requests.get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304:
+        return response, validators
+    
+    new_validators = {}
+    if response.headers.get('ETag'):
+        new_validators['etag'] = response.headers['ETag']
+    if response.headers.get('Last-Modified'):
+        new_validators['last_modified'] = response.headers['Last-Modified']
+    return response, new_validators
+
+
+def fetch_latest_release(cache):
+    """
+    Fetch the latest release, reusing the cached copy when GitHub says 304.
+    
+    Args:
+        cache: Version cache dict (release_validators and release are used)
+        
+    Returns:
+        tuple: (release dict or None on error, validators, changed flag)
+    """
+    validators = cache.get('release_validators')
+    response, validators = conditional_get(GITHUB_API_URL, validators, timeout=10)
+    
+    if response.status_code == 304 and cache.get('release'):
+        return cache['release'], validators, False
+    if response.status_code != 200:
+        print(f"Could not check for updates (HTTP {response.status_code})")
+        return None, None, False
+    
+    release = response.json()
+    # Only keep what the update prompt needs
+    release = {'tag_name': release['tag_name'], 'body': release.get('body') or ''}
+    return release, validators, True
+
+
+def parse_checksums(text):
+    """
+    Parse a sha256sum-style manifest ("<hex>  <filename>" per line).
+    
+    Returns:
+        dict: File name -> lowercase hex digest
+    """
+    checksums = {}
+    for line in text.splitlines():
+        parts = line.strip().split()
+        if len(parts) == 2:
+            checksums[parts[1].lstrip('*')] = parts[0].lower()
+    return checksums
+
+
+def download_update_files(filenames, file_validators=None, max_workers=4):
+    """
+    Download changed update files in parallel and verify every hash.
+    
+    Each file is requested conditionally, so files that haven't changed
+    since the last applied update cost a 304 and are skipped. Nothing is
+    returned unless every downloaded file matches the release's checksum
+    manifest.
+    
+    Args:
+        filenames: Files to fetch from GITHUB_RAW_URL
+        file_validators: Dict of file name -> validators from the last update
+        max_workers: Parallel downloads
+        
+    Returns:
+        tuple: (dict of file name -> bytes for changed files,
+                dict of file name -> validators to store once applied).
+                The dict of files is None when the release has no checksum
+                manifest - such a release can't be verified, so it is never
+                applied automatically.
+        
+    Raises:
+        Exception: If any file fails to verify
+    """
+    file_validators = file_validators or {}
+    
+    def fetch(filename):
+        url = f"{GITHUB_RAW_URL}/{filename}"
+        print(f"Checking {filename}: {url}")
+        return conditional_get(url, file_validators.get(filename))
+    
+    names = [UPDATE_CHECKSUMS_FILE] + list(filenames)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        responses = dict(zip(names, pool.map(fetch, names)))
+    
+    manifest_response, _ = responses.pop(UPDATE_CHECKSUMS_FILE)
+    if manifest_response.status_code != 200:
+        print(f"Release has no {UPDATE_CHECKSUMS_FILE} manifest "
+              f"(HTTP {manifest_response.status_code}); it can't be verified.")
+        return None, {}
+    checksums = parse_checksums(manifest_response.text)
+    
+    payloads, validators = {}, {}
+    for filename, (response, new_validators) in responses.items():
+        if response.status_code == 304:
+            print(f"  {filename} unchanged (304)")
+            validators[filename] = new_validators
+            continue
+        if response.status_code == 404:
+            print(f"  Skipping {filename} (not found in repo)")
+            continue
+        response.raise_for_status()
+        
+        digest = hashlib.sha256(response.content).hexdigest()
+        expected = checksums.get(filename)
+        if expected != digest:
+            raise Exception(f"Checksum mismatch for {filename} "
+                            f"(expected {expected or 'no entry'}, got {digest}); "
+                            "update not applied.")
+        print(f"  ✓ {filename} verified ({len(response.content)} bytes)")
+        payloads[filename] = response.content
+        validators[filename] = new_validators
+    return payloads, validators
+
+
+def write_update_checksums(directory=SCRIPT_DIR):
+    """
+    Write the SHA256SUMS manifest a release needs for its update files.
+    
+    Only UPDATE_FILES present in the directory are listed; the update check
+    skips the others (they 404 on GitHub too).
+    
+    Args:
+        directory: Folder holding the files to publish
+        
+    Returns:
+        dict: File name -> hex digest written to the manifest
+    """
+    directory = Path(directory)
+    checksums = {}
+    for filename in UPDATE_FILES:
+        path = directory / filename
+        if path.is_file():
+            checksums[filename] = hashlib.sha256(path.read_bytes()).hexdigest()
+    
+    manifest_path = directory / UPDATE_CHECKSUMS_FILE
+    tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+    # sha256sum's format, with Unix line endings on every platform
+    tmp_path.write_bytes(''.join(f"{digest}  {filename}\n"
+                                 for filename, digest in checksums.items()).encode('utf-8'))
+    os.replace(str(tmp_path), str(manifest_path))
+    return checksums
+
+
+def stage_update_files(payloads):
+    """
+    Write verified update files next to TubeArc for the updater to apply.
+    
+    Files are saved with a _new suffix (except updater.py, which is needed
+    right away), each through a temp file and an atomic rename.
+    
+    Returns:
+        list: Paths of the staged files
+    """
+    staged = []
+    for filename, content in payloads.items():
+        if filename == "updater.py":
+            target_path = SCRIPT_DIR / filename
+        else:
+            target_path = SCRIPT_DIR / f"{Path(filename).stem}_new{Path(filename).suffix}"
+        tmp_path = target_path.with_name(target_path.name + '.tmp')
+        tmp_path.write_bytes(content)
+        os.replace(str(tmp_path), str(target_path))
+        staged.append(target_path)
+        print(f"✓ Staged: {target_path}")
+    return staged
+
+
+# ============================================================================
+# DOWNLOAD HELPERS
+# Kitsune's tools work with or without the interface
+# ============================================================================
+
+class JobCancelled(Exception):
+    """Raised when a running job is stopped through its cancel event."""
+    
+    def __init__(self, output=''):
+        super().__init__("Archive cancelled")
+        self.output = output
+
+
+def build_download_command(url, download_path, options, manifest_path=None):
+    """
+    Build the yt-dlp command with appropriate flags and options.
+    
+    Args:
+        url: Video URL to download
+        download_path: Directory to save downloaded files
+        options: Archive options dict (see DEFAULT_DOWNLOAD_OPTIONS), plus an
+            optional 'format' chosen by choose_job_format()
+        manifest_path: Optional file yt-dlp appends each final file path to
+        
+    Returns:
+        list: Command arguments for subprocess
+    """
+    options = dict(DEFAULT_DOWNLOAD_OPTIONS, **options)
+    
+    # Build proper output template for the selected layout
+    layout = OUTPUT_LAYOUTS.get(options['layout'], OUTPUT_LAYOUTS['flat'])
+    output_template = str(Path(download_path) / layout)
+    
+    # Base command
+    cmd = [str(YT_DLP_PATH), url, "-o", output_template]
+    
+    # Set FFmpeg location
+    cmd.extend(["--ffmpeg-location", str(FFMPEG_PATH)])
+    
+    # Download type selection
+    if options['metadata_only']:
+        # Catalog data only - info JSON, description, thumbnail and subtitles
+        cmd.extend(["--skip-download", "--write-info-json", "--write-description",
+                    "--write-thumbnail", "--write-subs", "--write-auto-subs",
+                    "--sub-format", "srt", "--no-playlist", "--newline"])
+        if manifest_path:
+            # Nothing is moved without a download, so log at the video stage
+            cmd.extend(["--print-to-file", "video:filename", str(manifest_path)])
+        return cmd
+    elif options['combined']:
+        # Combined video + audio - Kitsune merges them cleverly. A format
+        # picked by choose_job_format() goes first; if its ids have gone
+        # stale by now, yt-dlp falls back to the usual selection.
+        if options.get('format'):
+            cmd.extend(["-f", f"{options['format']}/{DEFAULT_FORMAT_SPEC}"])
+        else:
+            cmd.extend(["-f", DEFAULT_FORMAT_SPEC])
+        cmd.extend(["--merge-output-format", "mp4"])
+        # Ensure audio codec is copied properly
+        cmd.extend(["--postprocessor-args", "ffmpeg:-c:v copy -c:a aac"])
+    else:
+        # Separate downloads
+        if options['video_only'] and options['audio_only']:
+            # Download both separately
+            cmd.extend(["-f", "bestvideo[ext=mp4],bestaudio[ext=m4a]"])
+            cmd.append("--keep-video")
+        elif options['video_only']:
+            # Video only
+            cmd.extend(["-f", "bestvideo[ext=mp4]/bestvideo"])
+        elif options['audio_only']:
+            # Audio only - extract to mp3
+            cmd.extend(["-f", "bestaudio/best"])
+            cmd.extend(["-x", "--audio-format", "mp3"])
+    
+    # Optional features
+    if options['metadata']:
+        cmd.extend(["--write-description", "--write-thumbnail", "--write-info-json"])
+    
+    if options['subtitles']:
+        cmd.extend(["--write-subs", "--write-auto-subs", "--sub-format", "srt"])
+    
+    # Common options - one progress update per line so it can be parsed,
+    # and resume .part files left behind by interrupted jobs
+    cmd.extend(["--no-playlist", "--newline", "--continue"])
+    
+    if manifest_path:
+        cmd.extend(["--print-to-file", "after_move:filepath", str(manifest_path)])
+    
+    return cmd
+
+
+def parse_progress(line):
+    """
+    Parse a yt-dlp progress line.
+    
+    Args:
+        line: A single line of yt-dlp output
+        
+    Returns:
+        dict: Progress fields (percent, total, speed, eta) or None
+    """
+    match = PROGRESS_PATTERN.search(line)
+    if not match:
+        return None
+    
+    progress = match.groupdict()
+    progress['percent'] = float(progress['percent'])
+    return progress
+
+
+def run_download_command(cmd, progress_callback=None, timeout=600, cancel_event=None):
+    """
+    Run a yt-dlp command, streaming its output and reporting progress.
+    
+    Args:
+        cmd: Command arguments from build_download_command()
+        progress_callback: Optional callable receiving parsed progress dicts
+        timeout: Seconds before the process is killed
+        cancel_event: Optional threading.Event; setting it kills the process
+        
+    Returns:
+        subprocess.CompletedProcess: Result with combined output in stdout
+        
+    Raises:
+        subprocess.TimeoutExpired: If the process ran longer than timeout
+        JobCancelled: If cancel_event was set
+    """
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, text=True,
+                               encoding='utf-8', errors='replace')
+    
+    # Kill the process from a watchdog so a silent hang can't block forever
+    timed_out = threading.Event()
+    finished = threading.Event()
+    deadline = time.monotonic() + timeout
+    
+    def _watch():
+        while not finished.wait(0.2):
+            if cancel_event is not None and cancel_event.is_set():
+                process.kill()
+                return
+            if time.monotonic() > deadline:
+                timed_out.set()
+                process.kill()
+                return
+    
+    watchdog = threading.Thread(target=_watch, daemon=True)
+    watchdog.start()
+    
+    output = []
+    try:
+        for line in process.stdout:
+            output.append(line)
+            if progress_callback:
+                progress = parse_progress(line)
+                if progress:
+                    progress_callback(progress)
+        process.wait()
+    finally:
+        finished.set()
+        process.stdout.close()
+    
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout, output=''.join(output))
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobCancelled(''.join(output))
+    
+    return subprocess.CompletedProcess(cmd, process.returncode,
+                                       stdout=''.join(output), stderr='')
+
+
+def download_file(url, destination):
+    """
+    Download a file from a URL to a destination path.
+
+    Args:
+        url: URL to download from
+        destination: Path to save the file
+    """
+    print(f"Downloading from: {url}")
+    print(f"Saving to: {destination}")
+
+    try:
+        # Get file size first
+        response = requests.head(url, timeout=30, allow_redirects=True)
+        total_size = int(response.headers.get('content-length', 0))
+        print(f"File size: {total_size / (1024*1024):.2f} MB")
+
+        # Download with streaming
+        response = requests.get(url, timeout=300, stream=True, allow_redirects=True)
+        response.raise_for_status()
+
+        downloaded = 0
+        with destination.open('wb') as f:
+            for chunk in response.iter_content(chunk_size=8192):
+                if chunk:
+                    f.write(chunk)
+                    downloaded += len(chunk)
+                    # Print progress every 10MB
+                    if downloaded % (10 * 1024 * 1024) < 8192:
+                        progress = (downloaded / total_size * 100) if total_size > 0 else 0
+                        print(f"Progress: {downloaded / (1024*1024):.1f} MB / {total_size / (1024*1024):.1f} MB ({progress:.1f}%)")
+
+        final_size = destination.stat().st_size
+        print(f"Download complete! Final size: {final_size / (1024*1024):.2f} MB")
+
+        if final_size == 0:
+            raise Exception("Downloaded file is 0 bytes!")
+
+    except Exception as e:
+        print(f"Download error: {e}")
+        # Clean up partial download
+        if destination.exists():
+            destination.unlink()
+        raise Exception(f"Failed to download {url}: {e}")
+
+def extract_ffmpeg():
+    """Extract FFmpeg from the downloaded archive using 7-Zip."""
+    try:
+        print(f"Extracting FFmpeg archive: {FFMPEG_ARCHIVE}")
+        print(f"Archive size: {FFMPEG_ARCHIVE.stat().st_size / (1024*1024):.2f} MB")
+
+        # Verify 7-Zip exists
+        if not SEVEN_ZIP_PATH.exists():
+            raise Exception("7-Zip not found! Cannot extract FFmpeg.")
+
+        # Verify archive exists and is not empty
+        if not FFMPEG_ARCHIVE.exists():
+            raise Exception("FFmpeg archive does not exist!")
+
+        if FFMPEG_ARCHIVE.stat().st_size == 0:
+            raise Exception("FFmpeg archive is 0 bytes! Download failed.")
+
+        print("Running 7-Zip extraction...")
+
+        # Extract the archive
+        result = subprocess.run([
+            str(SEVEN_ZIP_PATH), "x",
+            str(FFMPEG_ARCHIVE),
+            f"-o{BIN_DIR}",
+            "-y"  # Overwrite without prompt
+        ], check=True, capture_output=True, text=True)
+
+        print("7-Zip output:", result.stdout)
+        if result.stderr:
+            print("7-Zip errors:", result.stderr)
+
+        print("Searching for ffmpeg.exe in extracted files...")
+
+        # Find the ffmpeg.exe in the extracted folder
+        found = False
+        for item in BIN_DIR.rglob("ffmpeg.exe"):
+            print(f"Found ffmpeg.exe at: {item}")
+            # Move it to the bin directory
+            if item != FFMPEG_PATH:
+                shutil.move(str(item), str(FFMPEG_PATH))
+                print(f"Moved to: {FFMPEG_PATH}")
+            found = True
+            break
+
+        if not found:
+            raise Exception("Could not find ffmpeg.exe in extracted archive!")
+
+        # Verify ffmpeg was extracted successfully
+        if not FFMPEG_PATH.exists():
+            raise Exception("FFmpeg extraction failed - ffmpeg.exe not found!")
+
+        print(f"FFmpeg ready at: {FFMPEG_PATH}")
+        print(f"FFmpeg size: {FFMPEG_PATH.stat().st_size / (1024*1024):.2f} MB")
+
+        # ffprobe is only needed by `tubearc verify`, so a build without it is fine
+        for item in BIN_DIR.rglob("ffprobe.exe"):
+            if item != FFPROBE_PATH:
+                shutil.move(str(item), str(FFPROBE_PATH))
+            print(f"ffprobe ready at: {FFPROBE_PATH}")
+            break
+
+        # Clean up: remove the archive and extracted folder
+        print("Cleaning up temporary files...")
+        if FFMPEG_ARCHIVE.exists():
+            FFMPEG_ARCHIVE.unlink()
+            print("Removed archive")
+
+        # Remove extracted directory
+        for item in BIN_DIR.iterdir():
+            if item.is_dir() and item.name.startswith("ffmpeg"):
+                print(f"Removing extracted folder: {item}")
+                shutil.rmtree(item)
+
+        print("FFmpeg extraction complete!")
+
+    except subprocess.CalledProcessError as e:
+        error_msg = f"7-Zip extraction failed: {e}\nStdout: {e.stdout}\nStderr: {e.stderr}"
+        print(error_msg)
+        raise Exception(error_msg)
+    except Exception as e:
+        print(f"FFmpeg extraction error: {e}")
+        raise Exception(f"Failed to extract FFmpeg: {e}")
+
+
+class _MirrorDownload(threading.Thread):
+    """
+    One streaming GET against a single mirror, written to its own file.
+
+    The racing and failover logic in download_from_mirrors() watches the
+    counters on these threads; a thread never decides on its own whether it
+    won or lost.
+    """
+
+    def __init__(self, url, path, offset=0, expected_total=None):
+        super().__init__(daemon=True)
+        self.url = url
+        self.path = path
+        self.offset = offset
+        self.expected_total = expected_total
+        self.total = None
+        self.received = 0
+        self.started_at = None
+        self.last_progress = time.monotonic()
+        self.error = None
+        self.completed = False
+        self._cancelled = threading.Event()
+        self._discard = False
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        """Bytes of the file present on disk (resume offset + received)."""
+        return self.offset + self.received
+
+    def throughput(self):
+        """Average bytes/second since the first byte arrived."""
+        if not self.started_at or not self.received:
+            return 0.0
+        return self.received / max(time.monotonic() - self.started_at, 1e-6)
+
+    def cancel(self, discard=False):
+        """
+        Stop writing to the file. Once this returns no further bytes are
+        written, so another thread may take the file over. A read blocked on
+        a hung connection only returns at the read timeout; the thread is a
+        daemon and simply exits then.
+
+        Args:
+            discard: Delete the file once the thread has let go of it
+        """
+        with self._lock:
+            self._cancelled.set()
+            self._discard = discard
+        if discard and not self.is_alive():
+            self._remove_file()
+
+    def _remove_file(self):
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+    def _open(self):
+        headers = {'Range': f"bytes={self.offset}-"} if self.offset else {}
+        response = requests.get(self.url, headers=headers, stream=True,
+                                allow_redirects=True,
+                                timeout=(30, MIRROR_STALL_TIMEOUT))
+        response.raise_for_status()
+
+        if self.offset and response.status_code == 206:
+            # "Content-Range: bytes 100-999/1000"
+            total = response.headers.get('Content-Range', '').rpartition('/')[2]
+            total = int(total) if total.isdigit() else None
+            if self.expected_total and total != self.expected_total:
+                # Mirrors don't necessarily serve the same build; splicing
+                # two different archives would produce garbage
+                print(f"Mirror size differs ({total} vs {self.expected_total}), restarting from 0")
+                response.close()
+                self.offset = 0
+                return self._open()
+            self.total = total
+        else:
+            # 200 - server ignored the Range header, start over
+            self.offset = 0
+            length = response.headers.get('Content-Length')
+            self.total = int(length) if length and length.isdigit() else None
+        return response
+
+    def run(self):
+        try:
+            self._download()
+        except Exception as e:
+            if not self._cancelled.is_set():
+                self.error = e
+        finally:
+            if self._discard:
+                self._remove_file()
+
+    def _download(self):
+        response = self._open()
+        try:
+            self.started_at = self.last_progress = time.monotonic()
+            mode = 'ab' if self.offset else 'wb'
+            with self.path.open(mode) as f:
+                if self.offset:
+                    f.truncate(self.offset)
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    if not chunk:
+                        continue
+                    with self._lock:
+                        if self._cancelled.is_set():
+                            return
+                        f.write(chunk)
+                    self.received += len(chunk)
+                    self.last_progress = time.monotonic()
+        finally:
+            response.close()
+
+        if self._cancelled.is_set():
+            return
+        if self.total is not None and self.size != self.total:
+            raise Exception(f"incomplete body ({self.size} of {self.total} bytes)")
+        if self.size == 0:
+            raise Exception("downloaded file is 0 bytes")
+        self.completed = True
+
+    @property
+    def finished(self):
+        return self.completed or self.error is not None
+
+
+def download_from_mirrors(urls, destination, probe_seconds=None,
+                          stall_timeout=None, status_callback=None, sha256=None):
+    """
+    Download one file that is available from several mirrors.
+
+    All mirrors are started at once, each into its own file. After
+    probe_seconds the one with the best throughput keeps going and the rest
+    are cancelled. If the winner stalls (no bytes for stall_timeout seconds)
+    or errors, the next-best mirror takes over. With a known sha256 it
+    resumes with a Range request from the current offset, so the bytes
+    already on disk aren't fetched again, and the finished file is checked
+    against the hash; without one it starts the file over.
+
+    Args:
+        urls: Mirrors of one identical file, in order of preference
+        destination: Path to save the file
+        probe_seconds: Length of the race before a winner is picked
+        stall_timeout: Seconds without progress before failing over
+        status_callback: Optional callable(message) for progress messages
+        sha256: Expected hex digest of the file, if known
+
+    Raises:
+        Exception: If every mirror fails or the file doesn't match sha256
+    """
+    probe_seconds = MIRROR_PROBE_SECONDS if probe_seconds is None else probe_seconds
+    stall_timeout = MIRROR_STALL_TIMEOUT if stall_timeout is None else stall_timeout
+    status = status_callback or (lambda message: None)
+
+    racers = [
+        _MirrorDownload(url, destination.with_name(f"{destination.name}.mirror{i}"))
+        for i, url in enumerate(urls)
+    ]
+    print(f"Racing {len(racers)} mirrors for {destination.name}")
+    status(f"Probing {len(racers)} download mirrors...")
+    for racer in racers:
+        racer.start()
+
+    try:
+        deadline = time.monotonic() + probe_seconds
+        while time.monotonic() < deadline:
+            if any(r.completed for r in racers) or all(r.finished for r in racers):
+                break
+            time.sleep(0.05)
+
+        for racer in racers:
+            print(f"  {racer.throughput() / (1024*1024):7.2f} MB/s  "
+                  f"{'failed: ' + str(racer.error) if racer.error else 'ok'}  {racer.url}")
+
+        done = [r for r in racers if r.completed]
+        ranked = sorted((r for r in racers if r.error is None),
+                        key=lambda r: (r.completed, r.throughput()), reverse=True)
+        if not ranked:
+            raise Exception("all mirrors failed: " +
+                            "; ".join(str(r.error) for r in racers))
+
+        winner = done[0] if done else ranked[0]
+        backups = [r.url for r in ranked if r is not winner]
+        for racer in racers:
+            if racer is not winner:
+                racer.cancel(discard=True)
+        print(f"Using mirror: {winner.url}")
+
+        last_percent = None
+
+        while not winner.completed:
+            stalled = time.monotonic() - winner.last_progress > stall_timeout
+            if not winner.error and not stalled:
+                percent = int(winner.size * 100 / winner.total) if winner.total else None
+                if percent is not None and percent != last_percent:
+                    status(f"Downloading {destination.name}... {percent}%")
+                    last_percent = percent
+                time.sleep(0.1)
+                continue
+
+            reason = winner.error or f"stalled for {stall_timeout:g}s"
+            winner.cancel()
+            if not backups:
+                raise Exception(f"mirror failed ({reason}) and no mirrors are left")
+
+            url = backups.pop(0)
+            if sha256:
+                offset = winner.size
+                print(f"Mirror {winner.url} failed ({reason}); resuming at "
+                      f"{offset / (1024*1024):.1f} MB from {url}")
+            else:
+                offset = 0
+                print(f"Mirror {winner.url} failed ({reason}); restarting from {url}")
+            status("Download stalled, switching mirror...")
+            winner = _MirrorDownload(url, winner.path, offset=offset,
+                                     expected_total=winner.total if offset else None)
+            racers.append(winner)
+            winner.start()
+
+        winner.join()
+        if sha256:
+            with winner.path.open('rb') as f:
+                digest = hashlib.sha256()
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+            if digest.hexdigest() != sha256.lower():
+                raise Exception(f"checksum mismatch for {destination.name} "
+                                f"(expected {sha256}, got {digest.hexdigest()})")
+        print(f"Download complete! Final size: {winner.size / (1024*1024):.2f} MB")
+        os.replace(winner.path, destination)
+
+    finally:
+        # Leftover partial files go, whether we succeeded or not
+        for racer in racers:
+            racer.cancel(discard=True)
+
+
+# ============================================================================
+# DOWNLOAD ENGINES
+# Kitsune can send a helper or do the work herself
+# ============================================================================
+
+_yt_dlp_module = None
+
+
+def load_yt_dlp_module():
+    """
+    Import the yt_dlp package on first use.
+    
+    The import takes a noticeable fraction of a second, so it is deferred
+    until an embedded job actually runs instead of slowing down start-up.
+    
+    Returns:
+        module: The yt_dlp package, or None if it isn't installed
+    """
+    global _yt_dlp_module
+    if _yt_dlp_module is None:
+        try:
+            import yt_dlp
+            _yt_dlp_module = yt_dlp
+        except ImportError:
+            return None
+    return _yt_dlp_module
+
+
+def yt_dlp_module_available():
+    """Return True if the yt_dlp package is installed (without importing it)."""
+    return _yt_dlp_module is not None or importlib.util.find_spec("yt_dlp") is not None
+
+
+def _ytdlp_version_key(version):
+    """Turn a yt-dlp version ("2024.08.06" or "2024.08.06.232253") into a tuple."""
+    try:
+        return tuple(int(part) for part in version.split('.'))
+    except (AttributeError, ValueError):
+        return None
+
+
+def yt_dlp_package_version():
+    """
+    Version of the installed yt_dlp package, read without importing it.
+    
+    Returns:
+        str: e.g. "2024.08.06", or None if the package isn't installed
+    """
+    if _yt_dlp_module is not None:
+        return _yt_dlp_module.version.__version__
+    spec = importlib.util.find_spec("yt_dlp")
+    if spec is None or not spec.origin:
+        return None
+    try:
+        text = (Path(spec.origin).parent / "version.py").read_text(encoding='utf-8')
+    except OSError:
+        return None
+    match = re.search(r"^__version__\s*=\s*['\"]([^'\"]+)['\"]", text, re.MULTILINE)
+    return match.group(1) if match else None
+
+
+def yt_dlp_exe_version():
+    """
+    Version of the managed yt-dlp.exe.
+    
+    Asking the exe costs a process start, so the answer is cached in the
+    version cache and reused until the exe changes (e.g. after `yt-dlp -U`).
+    
+    Returns:
+        str: e.g. "2024.08.06", or None if the exe is missing or won't say
+    """
+    try:
+        st = YT_DLP_PATH.stat()
+    except OSError:
+        return None
+    stamp = [st.st_size, st.st_mtime_ns]
+    
+    store = get_state_store()
+    cached = store.get_section('version_cache').get('ytdlp_exe') or {}
+    if cached.get('stamp') == stamp:
+        return cached.get('version')
+    
+    try:
+        result = subprocess.run([str(YT_DLP_PATH), "--version"], capture_output=True,
+                                text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"Could not read the yt-dlp.exe version: {e}")
+        return None
+    version = result.stdout.strip() if result.returncode == 0 else None
+    store.update_section('version_cache', {'ytdlp_exe': {'stamp': stamp, 'version': version}})
+    return version
+
+
+class SubprocessEngine:
+    """Runs every job in a fresh yt-dlp.exe process (the original behaviour)."""
+    
+    name = 'subprocess'
+    
+    def available(self):
+        return YT_DLP_PATH.exists()
+    
+    def build_command(self, url, download_path, options, manifest_path=None):
+        """Build the yt-dlp command line (see build_download_command)."""
+        return build_download_command(url, download_path, options, manifest_path)
+    
+    def run(self, cmd, progress_callback=None, timeout=600, cancel_event=None):
+        """
+        Run a command from build_command().
+        
+        Returns:
+            subprocess.CompletedProcess: Result with combined output in stdout
+            
+        Raises:
+            subprocess.TimeoutExpired: If the job ran longer than timeout
+            JobCancelled: If cancel_event was set
+        """
+        return run_download_command(cmd, progress_callback, timeout=timeout,
+                                    cancel_event=cancel_event)
+    
+    def probe(self, cmd, timeout=120):
+        """
+        Resolve the formats a command would download, without downloading.
+        
+        Returns:
+            dict: Size-related fields of the info dict (see _size_fields),
+                or None if the probe failed
+        """
+        result = run_download_command(cmd + ["--dump-json"], timeout=timeout)
+        if result.returncode != 0:
+            return None
+        for line in reversed(result.stdout.splitlines()):
+            if line.startswith('{'):
+                return _size_fields(json.loads(line))
+        return None
+    
+    def close(self):
+        """Nothing to release - each job cleans up after itself."""
+
+
+class _OutputLogger:
+    """yt-dlp logger that collects output lines instead of printing them."""
+    
+    def __init__(self):
+        self.lines = []
+    
+    def debug(self, msg):
+        # Progress lines arrive through the progress hook already
+        if not msg.startswith('[download] ') or '%' not in msg:
+            self.lines.append(msg)
+    
+    def info(self, msg):
+        self.lines.append(msg)
+    
+    def warning(self, msg):
+        self.lines.append(msg if msg.startswith('WARNING:') else f"WARNING: {msg}")
+    
+    def error(self, msg):
+        self.lines.append(msg)
+    
+    @property
+    def output(self):
+        return '\n'.join(self.lines) + '\n' if self.lines else ''
+
+
+class EmbeddedEngine:
+    """
+    Runs jobs in-process through the yt_dlp package API.
+    
+    The command line from build_download_command() is turned into
+    YoutubeDL options with yt_dlp.parse_options(), so both engines accept
+    exactly the same flags. Progress and post-processing are reported
+    through yt-dlp's hooks rather than by parsing output.
+    
+    Jobs can't be killed like a process; the timeout and cancellation are
+    enforced from the hooks, so a job stops at its next progress update.
+    """
+    
+    name = 'embedded'
+    
+    def available(self):
+        return yt_dlp_module_available()
+    
+    def build_command(self, url, download_path, options, manifest_path=None):
+        """Build the yt-dlp command line (see build_download_command)."""
+        return build_download_command(url, download_path, options, manifest_path)
+    
+    def run(self, cmd, progress_callback=None, timeout=600, cancel_event=None):
+        """
+        Run a command from build_command() in this process.
+        
+        Returns:
+            subprocess.CompletedProcess: Result with yt-dlp's log in stdout
+            
+        Raises:
+            subprocess.TimeoutExpired: If the job ran longer than timeout
+            JobCancelled: If cancel_event was set
+        """
+        yt_dlp = load_yt_dlp_module()
+        if yt_dlp is None:
+            raise RuntimeError("The yt_dlp package is not installed")
+        
+        # cmd[0] is the executable; the rest is yt-dlp's own argv
+        parsed = yt_dlp.parse_options(cmd[1:])
+        logger = _OutputLogger()
+        deadline = time.monotonic() + timeout
+        timed_out = threading.Event()
+        
+        def check_deadline():
+            if cancel_event is not None and cancel_event.is_set():
+                raise yt_dlp.utils.DownloadCancelled("Archive cancelled")
+            if time.monotonic() > deadline:
+                timed_out.set()
+                raise yt_dlp.utils.DownloadCancelled("Archive timed out")
+        
+        def on_progress(status):
+            check_deadline()
+            if progress_callback and status.get('status') == 'downloading':
+                progress_callback(_hook_progress(status, yt_dlp.utils))
+        
+        def on_postprocess(status):
+            check_deadline()
+            if progress_callback and status.get('status') == 'started':
+                progress_callback({'percent': 100.0, 'total': None, 'speed': None,
+                                   'eta': None, 'postprocessor': status.get('postprocessor')})
+        
+        ydl_opts = dict(parsed.ydl_opts, logger=logger,
+                        progress_hooks=[on_progress],
+                        postprocessor_hooks=[on_postprocess])
+        
+        try:
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                returncode = ydl.download(parsed.urls)
+        except yt_dlp.utils.DownloadCancelled:
+            returncode = 1
+        except yt_dlp.utils.DownloadError:
+            # Already logged through the logger as "ERROR: ..."
+            returncode = 1
+        except Exception as e:
+            logger.error(f"ERROR: {e}")
+            returncode = 1
+        
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(cmd, timeout, output=logger.output)
+        if cancel_event is not None and cancel_event.is_set():
+            raise JobCancelled(logger.output)
+        
+        return subprocess.CompletedProcess(cmd, returncode, stdout=logger.output, stderr='')
+    
+    def probe(self, cmd, timeout=120):
+        """
+        Resolve the formats a command would download, without downloading.
+        
+        Returns:
+            dict: Size-related fields of the info dict (see _size_fields),
+                or None if the probe failed
+        """
+        yt_dlp = load_yt_dlp_module()
+        parsed = yt_dlp.parse_options(cmd[1:])
+        ydl_opts = dict(parsed.ydl_opts, logger=_OutputLogger(), print_to_file={},
+                        socket_timeout=min(timeout, 30))
+        try:
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(parsed.urls[0], download=False)
+        except Exception:
+            return None
+        return _size_fields(info) if info else None
+    
+    def close(self):
+        """Nothing to release - each job cleans up after itself."""
+
+
+def _hook_progress(status, utils):
+    """
+    Convert a yt-dlp progress hook dict into the shape parse_progress() returns.
+    
+    Args:
+        status: Dict passed to a yt-dlp progress hook
+        utils: The yt_dlp.utils module (for its formatting helpers)
+        
+    Returns:
+        dict: Progress fields (percent, total, speed, eta)
+    """
+    downloaded = status.get('downloaded_bytes') or 0
+    total = status.get('total_bytes') or status.get('total_bytes_estimate')
+    speed, eta = status.get('speed'), status.get('eta')
+    return {
+        'percent': downloaded / total * 100 if total else 0.0,
+        'total': utils.format_bytes(total) if total else None,
+        'speed': f"{utils.format_bytes(speed)}/s" if speed else None,
+        'eta': '%02d:%02d' % divmod(int(eta), 60) if eta is not None else None,
+    }
+
+
+def _process_rss():
+    """
+    Memory used by this process in bytes.
+    
+    Uses psutil when installed; otherwise the peak RSS from resource usage
+    (POSIX only). Returns 0 when neither is available.
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+    return 0
+
+
+def _warm_up_worker(yt_dlp):
+    """
+    Do the one-off work of a first job ahead of time.
+    
+    Finding the extractor for a URL compiles the URL pattern of every
+    extractor that is tried - nearly 2000 regexes for a URL that only the
+    generic extractor accepts. The patterns are cached on the classes, so
+    matching a dummy URL once makes that lookup cheap for every later job.
+    """
+    from yt_dlp.extractor import gen_extractor_classes
+    for extractor in gen_extractor_classes():
+        try:
+            extractor.suitable("https://warm-up.invalid/")
+        except Exception:
+            pass
+    with yt_dlp.YoutubeDL({'quiet': True, 'logger': _OutputLogger()}) as ydl:
+        for key in WORKER_WARM_EXTRACTORS:
+            try:
+                ydl.get_info_extractor(key)
+            except Exception:
+                pass
+
+
+def _worker_main(conn):
+    """
+    Entry point of a pool worker process.
+    
+    Messages in:  ('run', cmd, timeout), ('probe', cmd, timeout) or ('stop',)
+    Messages out: ('ready',), ('started',), ('progress', dict) and finally
+                  one of ('done', returncode, output, rss), ('info', dict, rss),
+                  ('timeout', output, rss) or ('error', message, rss)
+    """
+    yt_dlp = load_yt_dlp_module()
+    if yt_dlp is None:
+        conn.send(('error', "The yt_dlp package is not installed", 0))
+        return
+    _warm_up_worker(yt_dlp)
+    engine = EmbeddedEngine()
+    conn.send(('ready',))
+    
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message[0] not in ('run', 'probe'):
+            break
+        kind, cmd, timeout = message
+        conn.send(('started',))
+        if kind == 'probe':
+            conn.send(('info', engine.probe(cmd, timeout=timeout), _process_rss()))
+            continue
+        
+        last_sent = [0.0]
+        
+        def on_progress(progress):
+            # Hooks fire for every block; a few updates a second is plenty
+            now = time.monotonic()
+            if progress.get('postprocessor') or now - last_sent[0] >= 0.1:
+                last_sent[0] = now
+                conn.send(('progress', progress))
+        
+        try:
+            result = engine.run(cmd, on_progress, timeout=timeout)
+            conn.send(('done', result.returncode, result.stdout, _process_rss()))
+        except subprocess.TimeoutExpired as e:
+            conn.send(('timeout', e.output or '', _process_rss()))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}", _process_rss()))
+
+
+class _PoolWorker:
+    """Parent-side handle for one worker process."""
+    
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,),
+                                       name="tubearc-worker", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+        self.rss = 0
+    
+    def stop(self, timeout=5):
+        try:
+            self.conn.send(('stop',))
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1)
+        self.conn.close()
+    
+    def kill(self):
+        self.process.terminate()
+        self.process.join(1)
+        self.conn.close()
+
+
+class WorkerPool:
+    """
+    Long-lived worker processes with yt-dlp imported and warmed up.
+    
+    Workers are started as soon as the pool is created, so they finish
+    warming up while TubeArc is still getting ready. Each job goes to an
+    idle worker over a pipe and progress streams back the same way. Since
+    the work happens in other processes, it never competes with the
+    interface for the GIL. A worker is replaced after max_jobs jobs or once
+    its memory passes max_memory_mb, and it is killed outright if a job
+    overruns its timeout.
+    
+    Args:
+        size: Number of worker processes
+        max_jobs: Jobs a worker runs before it is recycled
+        max_memory_mb: Recycle a worker whose RSS exceeds this (0 = never)
+    """
+    
+    def __init__(self, size=1, max_jobs=None, max_memory_mb=None):
+        # spawn everywhere - forking a process that runs Tk threads isn't safe
+        self._context = multiprocessing.get_context('spawn')
+        self.max_jobs = max_jobs or WORKER_MAX_JOBS
+        self.max_memory = (WORKER_MAX_MEMORY_MB if max_memory_mb is None
+                           else max_memory_mb) * 1024 * 1024
+        self.recycled = 0
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(max(1, size)):
+            self._idle.put(self._spawn())
+    
+    def _spawn(self):
+        worker = _PoolWorker(self._context)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+    
+    def _retire(self, worker, kill=False):
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        worker.kill() if kill else worker.stop()
+    
+    def run(self, cmd, progress_callback=None, timeout=600, cancel_event=None):
+        """
+        Run a command from build_download_command() on an idle worker.
+        
+        Returns:
+            subprocess.CompletedProcess: Result with yt-dlp's log in stdout
+            
+        Raises:
+            subprocess.TimeoutExpired: If the job ran longer than timeout
+            JobCancelled: If cancel_event was set (the worker is killed)
+        """
+        return self._call('run', cmd, progress_callback, timeout, cancel_event)
+    
+    def probe(self, cmd, timeout=120):
+        """Probe a command's formats on an idle worker (see EmbeddedEngine.probe)."""
+        return self._call('probe', cmd, None, timeout, None)
+    
+    def _call(self, kind, cmd, progress_callback, timeout, cancel_event):
+        if self._closed:
+            raise RuntimeError("Worker pool is shut down")
+        worker = self._idle.get()
+        if not worker.process.is_alive():
+            self._retire(worker, kill=True)
+            worker = self._spawn()
+        
+        try:
+            result = self._dispatch(worker, kind, cmd, progress_callback, timeout, cancel_event)
+        except BaseException:
+            # A timed-out, cancelled or broken worker can't be trusted with another job
+            self._retire(worker, kill=True)
+            self._idle.put(self._spawn())
+            raise
+        
+        worker.jobs += 1
+        if worker.jobs >= self.max_jobs or (self.max_memory and worker.rss > self.max_memory):
+            print(f"Recycling worker {worker.process.pid} after {worker.jobs} job(s), "
+                  f"{worker.rss / (1024*1024):.0f} MB")
+            self.recycled += 1
+            # Start the replacement first so it warms up while the old one exits
+            self._idle.put(self._spawn())
+            threading.Thread(target=self._retire, args=(worker,), daemon=True).start()
+        else:
+            self._idle.put(worker)
+        return result
+    
+    def _dispatch(self, worker, kind, cmd, progress_callback, timeout, cancel_event):
+        worker.conn.send((kind, cmd, timeout))
+        deadline = None
+        while True:
+            # Checked on every pass, not just when the pipe is quiet: a worker
+            # streaming progress would otherwise never be cancelled or timed
+            # out. Raising here makes _call() kill the worker.
+            if cancel_event is not None and cancel_event.is_set():
+                raise JobCancelled()
+            if deadline is not None and time.monotonic() >= deadline:
+                raise subprocess.TimeoutExpired(cmd, timeout)
+            
+            # No deadline until the worker has finished warming up
+            wait = 0.2 if deadline is None else min(0.2, max(0.0, deadline - time.monotonic()))
+            if not worker.conn.poll(wait):
+                continue
+            try:
+                message = worker.conn.recv()
+            except EOFError:
+                worker.process.join(1)
+                raise RuntimeError(f"Worker process exited unexpectedly "
+                                   f"(exit code {worker.process.exitcode})")
+            reply = message[0]
+            if reply == 'started':
+                # The worker enforces the timeout itself; this is the backstop
+                deadline = time.monotonic() + timeout + WORKER_KILL_GRACE
+            elif reply == 'progress':
+                if progress_callback:
+                    progress_callback(message[1])
+            elif reply == 'done':
+                _, returncode, output, worker.rss = message
+                return subprocess.CompletedProcess(cmd, returncode, stdout=output, stderr='')
+            elif reply == 'info':
+                _, info, worker.rss = message
+                return info
+            elif reply == 'timeout':
+                worker.rss = message[2]
+                raise subprocess.TimeoutExpired(cmd, timeout, output=message[1])
+            elif reply == 'error':
+                worker.rss = message[2]
+                raise RuntimeError(message[1])
+    
+    def shutdown(self):
+        """Stop all worker processes."""
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.stop()
+
+
+class WorkerPoolEngine(EmbeddedEngine):
+    """Runs jobs on a WorkerPool of warm yt-dlp processes."""
+    
+    name = 'pool'
+    
+    def __init__(self, size=1, max_jobs=None, max_memory_mb=None):
+        self.pool = WorkerPool(size, max_jobs, max_memory_mb)
+    
+    def run(self, cmd, progress_callback=None, timeout=600, cancel_event=None):
+        """
+        Run a command from build_command() on a pool worker.
+        
+        Returns:
+            subprocess.CompletedProcess: Result with yt-dlp's log in stdout
+            
+        Raises:
+            subprocess.TimeoutExpired: If the job ran longer than timeout
+            JobCancelled: If cancel_event was set
+        """
+        return self.pool.run(cmd, progress_callback, timeout=timeout,
+                             cancel_event=cancel_event)
+    
+    def probe(self, cmd, timeout=120):
+        """Probe a command's formats on a pool worker (see EmbeddedEngine.probe)."""
+        return self.pool.probe(cmd, timeout=timeout)
+    
+    def close(self):
+        """Stop the worker processes."""
+        self.pool.shutdown()
+
+
+def _size_fields(info):
+    """
+    Keep only what estimate_download_size() and select_formats() need from a
+    yt-dlp info dict, so probe results are small enough to pass between
+    processes. 'formats' are the ones the command would download, 'available'
+    every format the site offers.
+    """
+    keys = ('filesize', 'filesize_approx', 'tbr', 'format_id')
+    format_keys = keys + ('ext', 'vcodec', 'acodec', 'height', 'fps', 'has_drm')
+    formats = info.get('requested_downloads') or info.get('requested_formats') or []
+    return {
+        'duration': info.get('duration'),
+        'formats': [{key: f.get(key) for key in keys} for f in formats]
+                   or [{key: info.get(key) for key in keys}],
+        'available': [{key: f.get(key) for key in format_keys}
+                      for f in info.get('formats') or []],
+    }
+
+
+DOWNLOAD_ENGINES = {
+    SubprocessEngine.name: SubprocessEngine,
+    EmbeddedEngine.name: EmbeddedEngine,
+    WorkerPoolEngine.name: WorkerPoolEngine,
+}
+
+
+def get_engine(name='auto', config=None):
+    """
+    Pick the download engine.
+    
+    Args:
+        name: 'pool', 'embedded', 'subprocess', or 'auto' (the worker pool if
+            the yt_dlp package is installed and at least as new as
+            yt-dlp.exe, otherwise yt-dlp.exe)
+        config: Settings for the worker pool (max_concurrent_jobs,
+            worker_max_jobs, worker_max_memory_mb)
+            
+    Returns:
+        SubprocessEngine, EmbeddedEngine or WorkerPoolEngine
+    """
+    config = config or {}
+    if name not in DOWNLOAD_ENGINES and name != 'auto':
+        print(f"Unknown engine '{name}', using auto")
+        name = 'auto'
+    if name != 'subprocess' and not yt_dlp_module_available():
+        if name != 'auto':
+            print("yt_dlp package not installed, using yt-dlp.exe")
+        name = 'subprocess'
+    
+    package_version = yt_dlp_package_version() if name != 'subprocess' else None
+    if name == 'auto':
+        # yt-dlp.exe updates itself daily but the package only moves with
+        # pip, and site extractors break often - never trade a fresh exe
+        # for a stale package just to save start-up time
+        exe_version = yt_dlp_exe_version() if YT_DLP_PATH.exists() else None
+        package_key = _ytdlp_version_key(package_version)
+        exe_key = _ytdlp_version_key(exe_version)
+        if not YT_DLP_PATH.exists() or (package_key and exe_key and package_key >= exe_key):
+            name = WorkerPoolEngine.name
+        else:
+            print(f"yt_dlp package {package_version or '(unknown version)'} is not as new as "
+                  f"yt-dlp.exe {exe_version or '(unknown version)'}; using yt-dlp.exe "
+                  "(py -m pip install -U yt-dlp to use the worker pool)")
+            name = 'subprocess'
+    
+    if name == 'subprocess':
+        print(f"Download engine: subprocess (yt-dlp.exe {yt_dlp_exe_version() or 'not installed'})")
+    else:
+        print(f"Download engine: {name} (yt_dlp package {package_version or 'unknown version'})")
+    
+    if name == WorkerPoolEngine.name:
+        return WorkerPoolEngine(size=config.get('max_concurrent_jobs', 1),
+                                max_jobs=config.get('worker_max_jobs'),
+                                max_memory_mb=config.get('worker_max_memory_mb'))
+    return DOWNLOAD_ENGINES[name]()
+
+
+# ============================================================================
+# OUTPUT LAYOUTS & SHARDING
+# Kitsune keeps a tidy den, even with 100k treasures
+# ============================================================================
+
+def shard_for_name(stem, width=HASH_SHARD_WIDTH):
+    """
+    Return the hash shard directory name for a media file.
+    
+    Args:
+        stem: File name without its extension
+        width: Number of hex digits in the shard name
+        
+    Returns:
+        str: Shard directory name, e.g. "3f"
+    """
+    return hashlib.blake2b(stem.encode('utf-8'), digest_size=8).hexdigest()[:width]
+
+
+def _sanitize_dir_name(name):
+    """Make a metadata value safe to use as a directory name on any OS."""
+    name = re.sub(r'[<>:"/\\|?*\x00-\x1f]', '_', str(name)).strip().rstrip('. ')
+    return name[:100] or 'Unknown'
+
+
+def group_media_files(directory, names=None):
+    """
+    Group the files in one directory by the media file they belong to.
+    
+    Sidecars (thumbnail, description, subtitles, info JSON) share the media
+    file's stem: "title.mp4" owns "title.webp", "title.en.srt" and
+    "title.info.json". A sidecar is matched to the longest media stem that
+    prefixes it, so "a.b.mp4" doesn't steal the sidecars of "a.mp4".
+    
+    Args:
+        directory: Directory to scan (not recursive)
+        names: File names in the directory, if already known (e.g. from os.walk)
+        
+    Returns:
+        dict: Media stem -> list of file names (media file and its sidecars)
+    """
+    if names is None:
+        try:
+            names = [entry.name for entry in os.scandir(directory) if entry.is_file()]
+        except OSError:
+            return {}
+    
+    groups = {}
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if ext.lower() in MEDIA_EXTENSIONS:
+            groups.setdefault(stem, [])
+    
+    for name in names:
+        if name.endswith(('.part', '.ytdl')):
+            continue
+        stem = name
+        while '.' in stem:
+            stem = stem.rsplit('.', 1)[0]
+            if stem in groups:
+                groups[stem].append(name)
+                break
+    return groups
+
+
+def _read_info_json(directory, names):
+    """Load the .info.json sidecar from a file group, if there is one."""
+    for name in names:
+        if name.endswith('.info.json'):
+            try:
+                with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                return None
+    return None
+
+
+def layout_subdir(layout, stem, info=None):
+    """
+    Work out the relative directory a file group belongs in.
+    
+    Args:
+        layout: Output layout name (see OUTPUT_LAYOUTS)
+        stem: Media file stem
+        info: Parsed .info.json, required for metadata-based layouts
+        
+    Returns:
+        str: Relative directory ('' for flat), or None if the layout needs
+            metadata that isn't available
+    """
+    if layout == 'flat':
+        return ''
+    if layout == 'hash':
+        return shard_for_name(stem)
+    if not info:
+        return None
+    if layout == 'platform':
+        return _sanitize_dir_name(info.get('extractor_key') or info.get('extractor') or 'Unknown')
+    if layout == 'uploader':
+        return _sanitize_dir_name(info.get('uploader') or info.get('channel')
+                                  or info.get('uploader_id') or 'Unknown')
+    if layout == 'date':
+        date = str(info.get('upload_date') or '')
+        if len(date) != 8:
+            return os.path.join('Unknown', '00')
+        return os.path.join(date[:4], date[4:6])
+    return None
+
+
+def _move_file(source, target):
+    """Move without overwriting; a rename when both are on the same volume."""
+    if os.path.exists(target):
+        return False
+    try:
+        os.rename(source, target)
+    except OSError:
+        shutil.move(source, target)
+    return True
+
+
+def place_in_shard(media_path):
+    """
+    Move a freshly downloaded file and its sidecars into their hash shard.
+    
+    Args:
+        media_path: Final path of the media file reported by yt-dlp (or the
+            .info.json of a metadata-only job)
+        
+    Returns:
+        Path: New location of the media file
+    """
+    media_path = Path(media_path)
+    directory = media_path.parent
+    if media_path.name.endswith('.info.json'):
+        # Metadata-only job: there is no media file, just its sidecars
+        stem = media_path.name[:-len('.info.json')]
+        names = [name for name in os.listdir(directory) if name.startswith(stem + '.')]
+    else:
+        stem = media_path.stem
+        names = group_media_files(directory).get(stem, [media_path.name])
+    shard_dir = directory / shard_for_name(stem)
+    shard_dir.mkdir(exist_ok=True)
+    
+    new_path = media_path
+    for name in names:
+        target = shard_dir / name
+        if _move_file(str(directory / name), str(target)) and name == media_path.name:
+            new_path = target
+    return new_path
+
+
+def reshard_archive(root, layout, dry_run=False):
+    """
+    Move every file group under root into its place in the given layout.
+    
+    Works on flat archives as well as ones already using another layout.
+    Files are moved (renamed), never copied, and never overwrite anything.
+    Metadata-based layouts need an .info.json sidecar; groups without one
+    are left where they are.
+    
+    Args:
+        root: Archive directory
+        layout: Target layout name (see OUTPUT_LAYOUTS)
+        dry_run: Only report the planned moves
+        
+    Returns:
+        dict: Counts of moved groups, files, and skipped groups by reason
+    """
+    root = os.path.abspath(root)
+    stats = {'groups': 0, 'files': 0, 'already_placed': 0,
+             'no_metadata': 0, 'conflicts': 0}
+    created = set()
+    vacated = set()
+    
+    directories = [dirpath for dirpath, _, _ in os.walk(root)]
+    for directory in directories:
+        for stem, names in group_media_files(directory).items():
+            info = _read_info_json(directory, names) if layout not in ('flat', 'hash') else None
+            subdir = layout_subdir(layout, stem, info)
+            if subdir is None:
+                stats['no_metadata'] += 1
+                continue
+            
+            target_dir = os.path.join(root, subdir) if subdir else root
+            if os.path.normcase(target_dir) == os.path.normcase(directory):
+                stats['already_placed'] += 1
+                continue
+            if any(os.path.exists(os.path.join(target_dir, name)) for name in names):
+                print(f"  Conflict: {stem} already exists in {target_dir}")
+                stats['conflicts'] += 1
+                continue
+            
+            if dry_run:
+                print(f"  Would move {len(names)} file(s): {stem} -> {subdir or '.'}")
+            else:
+                if target_dir not in created:
+                    os.makedirs(target_dir, exist_ok=True)
+                    created.add(target_dir)
+                for name in names:
+                    _move_file(os.path.join(directory, name), os.path.join(target_dir, name))
+                vacated.add(directory)
+            stats['groups'] += 1
+            stats['files'] += len(names)
+    
+    # Remove directories the move emptied (deepest first), and parents left
+    # empty by that - directories that were empty to begin with stay
+    for directory in sorted(vacated, key=len, reverse=True):
+        while directory != root and directory.startswith(root):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+    return stats
+
+
+# ============================================================================
+# METADATA CATALOG
+# Kitsune remembers every treasure and where it is buried
+# ============================================================================
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    media_path TEXT UNIQUE NOT NULL,
+    sidecar_mtime_ns INTEGER,
+    sidecar_size INTEGER,
+    title TEXT,
+    uploader TEXT,
+    tags TEXT,
+    description TEXT,
+    upload_date TEXT,
+    platform TEXT,
+    duration REAL,
+    webpage_url TEXT
+);
+CREATE INDEX IF NOT EXISTS items_upload_date ON items(upload_date);
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    title, uploader, tags, description,
+    content='items', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS items_ai AFTER INSERT ON items BEGIN
+    INSERT INTO items_fts(rowid, title, uploader, tags, description)
+    VALUES (new.id, new.title, new.uploader, new.tags, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS items_ad AFTER DELETE ON items BEGIN
+    INSERT INTO items_fts(items_fts, rowid, title, uploader, tags, description)
+    VALUES ('delete', old.id, old.title, old.uploader, old.tags, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS items_au AFTER UPDATE ON items BEGIN
+    INSERT INTO items_fts(items_fts, rowid, title, uploader, tags, description)
+    VALUES ('delete', old.id, old.title, old.uploader, old.tags, old.description);
+    INSERT INTO items_fts(rowid, title, uploader, tags, description)
+    VALUES (new.id, new.title, new.uploader, new.tags, new.description);
+END;
+"""
+
+
+def _fts_terms(text, column=None):
+    """Turn free text into an FTS5 expression of quoted prefix terms."""
+    terms = re.findall(r'\w+', text or '')
+    prefix = f"{column} : " if column else ""
+    return ' '.join(f'{prefix}"{term}"*' for term in terms)
+
+
+class Catalog:
+    """
+    Full-text catalog of archived media, built from yt-dlp sidecars.
+    
+    Each media file is indexed from its .info.json (title, uploader, tags,
+    description, upload date) or, failing that, its .description file. The
+    catalog is an SQLite FTS5 index, so searches stay in the millisecond
+    range on archives of 100k+ items. Indexing is incremental: a file is
+    only re-read when its sidecar's size or mtime changes.
+    
+    Args:
+        path: SQLite database file
+    """
+    
+    def __init__(self, path=CATALOG_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(CATALOG_SCHEMA)
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+    
+    def _items_in(self, directory, names):
+        """
+        List the catalog items in one directory.
+        
+        An item is a media file, or an .info.json with no media file next to
+        it (what a metadata-only harvest leaves behind).
+        """
+        groups = group_media_files(directory, names)
+        for stem, group in groups.items():
+            for name in group:
+                base, ext = os.path.splitext(name)
+                if base == stem and ext.lower() in MEDIA_EXTENSIONS:
+                    yield os.path.join(directory, name)
+                    break
+        
+        grouped = {name for group in groups.values() for name in group}
+        for name in names:
+            if name.endswith('.info.json') and name not in grouped:
+                yield os.path.join(directory, name)
+    
+    def _sidecar_for(self, media_path):
+        """Return the best metadata sidecar for a media file, if any."""
+        if media_path.endswith('.info.json'):
+            return media_path if os.path.exists(media_path) else None
+        base = os.path.splitext(media_path)[0]
+        for suffix in ('.info.json', '.description'):
+            if os.path.exists(base + suffix):
+                return base + suffix
+        return None
+    
+    def _read_record(self, media_path, sidecar):
+        """Build an index record from a sidecar file."""
+        name = os.path.basename(media_path)
+        title = name[:-len('.info.json')] if name.endswith('.info.json') else os.path.splitext(name)[0]
+        record = {'title': title, 'uploader': None, 'tags': '',
+                  'description': '', 'upload_date': None, 'platform': None,
+                  'duration': None, 'webpage_url': None}
+        with open(sidecar, 'r', encoding='utf-8', errors='replace') as f:
+            if sidecar.endswith('.description'):
+                record['description'] = f.read()
+                return record
+            info = json.load(f)
+        
+        record.update({
+            'title': info.get('title') or record['title'],
+            'uploader': info.get('uploader') or info.get('channel'),
+            'tags': ' '.join(info.get('tags') or []) + ' ' + ' '.join(info.get('categories') or []),
+            'description': info.get('description') or '',
+            'upload_date': info.get('upload_date'),
+            'platform': info.get('extractor_key') or info.get('extractor'),
+            'duration': info.get('duration'),
+            'webpage_url': info.get('webpage_url'),
+        })
+        # Fall back to a .description file if yt-dlp wrote one alongside the JSON
+        description_path = sidecar[:-len('.info.json')] + '.description'
+        if not record['description'] and os.path.exists(description_path):
+            with open(description_path, 'r', encoding='utf-8', errors='replace') as f:
+                record['description'] = f.read()
+        return record
+    
+    def _index_one(self, media_path, known=None):
+        """
+        Index a single media file if its sidecar changed.
+        
+        Returns:
+            bool: True if the catalog was updated
+        """
+        sidecar = self._sidecar_for(media_path)
+        if not sidecar:
+            return False
+        try:
+            st = os.stat(sidecar)
+            if known is None:
+                known = self._conn.execute(
+                    "SELECT sidecar_mtime_ns, sidecar_size FROM items WHERE media_path = ?",
+                    (media_path,)).fetchone()
+            if known and tuple(known) == (st.st_mtime_ns, st.st_size):
+                return False
+            record = self._read_record(media_path, sidecar)
+        except (OSError, ValueError) as e:
+            print(f"  Could not index {media_path}: {e}")
+            return False
+        
+        self._conn.execute("""
+            INSERT INTO items (media_path, sidecar_mtime_ns, sidecar_size, title, uploader,
+                               tags, description, upload_date, platform, duration, webpage_url)
+            VALUES (:media_path, :mtime, :size, :title, :uploader, :tags, :description,
+                    :upload_date, :platform, :duration, :webpage_url)
+            ON CONFLICT(media_path) DO UPDATE SET
+                sidecar_mtime_ns = excluded.sidecar_mtime_ns,
+                sidecar_size = excluded.sidecar_size,
+                title = excluded.title, uploader = excluded.uploader,
+                tags = excluded.tags, description = excluded.description,
+                upload_date = excluded.upload_date, platform = excluded.platform,
+                duration = excluded.duration, webpage_url = excluded.webpage_url
+        """, dict(record, media_path=media_path, mtime=st.st_mtime_ns, size=st.st_size))
+        return True
+    
+    def index_files(self, media_paths):
+        """
+        Index specific media files (e.g. the output of a finished job).
+        
+        Args:
+            media_paths: Paths of media files, or .info.json files from a
+                metadata-only job
+            
+        Returns:
+            int: Number of files added or updated
+        """
+        with self._lock, self._conn:
+            return sum(self._index_one(os.path.abspath(path)) for path in media_paths
+                       if os.path.splitext(path)[1].lower() in MEDIA_EXTENSIONS
+                       or path.endswith('.info.json'))
+    
+    def scan(self, root):
+        """
+        Bring the catalog in line with an archive directory.
+        
+        New and changed files are indexed; entries whose media file is gone
+        are removed.
+        
+        Args:
+            root: Archive directory
+            
+        Returns:
+            dict: Counts of indexed, unchanged and removed items
+        """
+        root = os.path.abspath(root)
+        stats = {'indexed': 0, 'unchanged': 0, 'removed': 0}
+        prefix = os.path.join(root, '')
+        
+        with self._lock:
+            known = {row['media_path']: (row['sidecar_mtime_ns'], row['sidecar_size'])
+                     for row in self._conn.execute(
+                         "SELECT media_path, sidecar_mtime_ns, sidecar_size FROM items "
+                         "WHERE substr(media_path, 1, ?) = ?", (len(prefix), prefix))}
+            seen = set()
+            pending = 0
+            self._conn.execute("BEGIN")
+            for dirpath, _, filenames in os.walk(root):
+                for media_path in self._items_in(dirpath, filenames):
+                    seen.add(media_path)
+                    if self._index_one(media_path, known.get(media_path, ())):
+                        stats['indexed'] += 1
+                        pending += 1
+                    else:
+                        stats['unchanged'] += 1
+                    # Commit in batches to keep the WAL small
+                    if pending >= 500:
+                        self._conn.execute("COMMIT")
+                        self._conn.execute("BEGIN")
+                        pending = 0
+            
+            gone = [path for path in known if path not in seen]
+            self._conn.executemany("DELETE FROM items WHERE media_path = ?",
+                                   [(path,) for path in gone])
+            stats['removed'] = len(gone)
+            self._conn.execute("COMMIT")
+        return stats
+    
+    def search(self, query=None, uploader=None, tag=None, date_from=None,
+               date_to=None, limit=50):
+        """
+        Search the catalog.
+        
+        Args:
+            query: Free text matched against title, uploader, tags, description
+            uploader: Restrict to uploaders matching this text
+            tag: Restrict to items with a matching tag
+            date_from: Earliest upload date (YYYYMMDD or YYYY-MM-DD)
+            date_to: Latest upload date (YYYYMMDD or YYYY-MM-DD)
+            limit: Maximum number of results
+            
+        Returns:
+            list: Result dicts, best matches first
+        """
+        match = ' '.join(filter(None, [
+            _fts_terms(query),
+            _fts_terms(uploader, 'uploader'),
+            _fts_terms(tag, 'tags'),
+        ]))
+        
+        sql = ("SELECT items.media_path, items.title, items.uploader, items.upload_date, "
+               "items.platform, items.duration, items.webpage_url FROM items")
+        where, params = [], []
+        if match:
+            sql += " JOIN items_fts ON items_fts.rowid = items.id"
+            where.append("items_fts MATCH ?")
+            params.append(match)
+        if date_from:
+            where.append("items.upload_date >= ?")
+            params.append(date_from.replace('-', ''))
+        if date_to:
+            where.append("items.upload_date <= ?")
+            params.append(date_to.replace('-', ''))
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY " + ("items_fts.rank" if match else "items.upload_date DESC")
+        sql += " LIMIT ?"
+        params.append(limit)
+        
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+    
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+
+# ============================================================================
+# METADATA HARVEST
+# Kitsune scouts ten thousand burrows at once without digging
+# ============================================================================
+
+class MetadataHarvester:
+    """
+    Collect catalog data (info JSON, thumbnail, subtitles) for many URLs.
+    
+    Each URL is probed with a metadata-only yt-dlp run. The runs are driven
+    by asyncio subprocesses from a single thread, so concurrency is limited
+    by the semaphore rather than by one OS thread per job.
+    
+    Args:
+        download_path: Directory the sidecar files are written to
+        options: Archive options (layout etc.); metadata_only is forced on
+        concurrency: Maximum simultaneous yt-dlp processes
+        timeout: Seconds allowed per URL
+        progress_callback: Optional callable(done, total, result) per finished URL
+    """
+    
+    def __init__(self, download_path, options=None, concurrency=DEFAULT_HARVEST_CONCURRENCY,
+                 timeout=120, progress_callback=None):
+        self.download_path = Path(download_path)
+        self.options = dict(DEFAULT_DOWNLOAD_OPTIONS, **(options or {}))
+        self.options['metadata_only'] = True
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.progress_callback = progress_callback
+        self._done = 0
+    
+    def run(self, urls):
+        """
+        Harvest metadata for every URL.
+        
+        Args:
+            urls: Iterable of URLs
+            
+        Returns:
+            list: One dict per URL with 'url', 'ok', 'error' and 'files'
+        """
+        urls = list(urls)
+        self.download_path.mkdir(parents=True, exist_ok=True)
+        if sys.platform == 'win32' and sys.version_info < (3, 8):
+            # Subprocesses need the Proactor loop, the default only from 3.8
+            asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+        return asyncio.run(self._run_all(urls))
+    
+    async def _run_all(self, urls):
+        self._done = 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+        with tempfile.TemporaryDirectory(prefix="tubearc-harvest-") as manifest_dir:
+            tasks = [self._probe(url, index, len(urls), semaphore, Path(manifest_dir))
+                     for index, url in enumerate(urls)]
+            return await asyncio.gather(*tasks)
+    
+    async def _probe(self, url, index, total, semaphore, manifest_dir):
+        """Run one metadata-only yt-dlp process."""
+        result = {'url': url, 'ok': False, 'error': None, 'files': []}
+        manifest_path = manifest_dir / f"{index}.files"
+        cmd = build_download_command(url, self.download_path, self.options, manifest_path)
+        
+        async with semaphore:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+                try:
+                    output, _ = await asyncio.wait_for(process.communicate(), self.timeout)
+                except asyncio.TimeoutError:
+                    process.kill()
+                    await process.wait()
+                    raise
+                output = output.decode('utf-8', errors='replace')
+                result['ok'] = process.returncode == 0
+                if not result['ok']:
+                    errors = [line for line in output.splitlines() if line.startswith('ERROR')]
+                    result['error'] = (errors[-1] if errors else output[-300:]).strip()
+            except asyncio.TimeoutError:
+                result['error'] = f"Timed out after {self.timeout}s"
+            except OSError as e:
+                result['error'] = str(e)
+        
+        result['files'] = _read_manifest(manifest_path, metadata_only=True)
+        if result['ok'] and self.options.get('layout') == 'hash':
+            result['files'] = [str(place_in_shard(path)) for path in result['files']]
+        
+        self._done += 1
+        if self.progress_callback:
+            self.progress_callback(self._done, total, result)
+        return result
+
+
+def read_url_list(path):
+    """
+    Read URLs from a text file (one per line; blank lines and # comments skipped).
+    
+    Returns:
+        list: Unique URLs in file order
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        urls = [line.strip() for line in f]
+    return list(dict.fromkeys(url for url in urls if url and not url.startswith('#')))
+
+
+def harvest_metadata(urls, download_path, options=None, concurrency=DEFAULT_HARVEST_CONCURRENCY,
+                     progress_callback=None, update_catalog=True):
+    """
+    Harvest metadata for many URLs and add the results to the catalog.
+    
+    Returns:
+        list: Per-URL results from MetadataHarvester.run()
+    """
+    harvester = MetadataHarvester(download_path, options, concurrency=concurrency,
+                                  progress_callback=progress_callback)
+    results = harvester.run(urls)
+    
+    if update_catalog:
+        files = [path for result in results for path in result['files']]
+        if files:
+            catalog = Catalog()
+            catalog.index_files(files)
+            catalog.close()
+    return results
+
+
+# ============================================================================
+# JOB PROFILING
+# Kitsune watches where its time goes
+# ============================================================================
+
+def profiling_enabled(config):
+    """
+    Check whether per-job profiling is switched on.
+    
+    Args:
+        config: Application configuration dict
+        
+    Returns:
+        bool: True if the env var or the 'profile_jobs' config key enables it
+    """
+    env = os.environ.get(PROFILE_ENV_VAR, '').strip().lower()
+    if env:
+        return env in ('1', 'true', 'yes', 'on')
+    return bool(config.get('profile_jobs', False))
+
+
+# Only one cProfile profiler can be active per process (Python 3.12+ refuses
+# a second), so concurrent jobs take turns: a job that finds another one
+# being profiled runs unprofiled instead
+_profile_lock = threading.Lock()
+
+
+class JobProfiler:
+    """
+    Context manager that profiles the orchestration around a single job.
+    
+    The Python side runs under cProfile; time spent waiting on yt-dlp is
+    measured separately (wall clock plus child CPU from resource usage) so
+    the two can be told apart. On exit a .prof file and a .json summary are
+    written to PROFILE_DIR. When disabled, every method is a cheap no-op.
+    
+    Usage:
+        with JobProfiler(url, enabled=True, job_id=job.job_id) as profiler:
+            with profiler.subprocess():
+                result = run_download_command(cmd)
+    
+    Args:
+        label: What is being profiled (usually the URL)
+        enabled: Profile at all
+        job_id: Added to the artifact name so retries and repeated URLs
+            don't overwrite each other
+    """
+    
+    def __init__(self, label, enabled=True, job_id=None):
+        self.label = label
+        self.enabled = enabled
+        self.job_id = job_id or uuid.uuid4().hex[:12]
+        self.returncode = None
+        self.subprocess_wall = 0.0
+        self.subprocess_user = 0.0
+        self.subprocess_sys = 0.0
+        self.artifact = None
+        self._profile = None
+    
+    def __enter__(self):
+        if not self.enabled:
+            return self
+        if not _profile_lock.acquire(blocking=False):
+            print(f"Not profiling {self.label}: another job is being profiled")
+            self.enabled = False
+            return self
+        self._started = time.perf_counter()
+        self._cpu_started = time.thread_time()
+        self._profile = cProfile.Profile()
+        try:
+            self._profile.enable()
+        except ValueError as e:
+            # Some other profiler (a debugger, coverage) is already active
+            _profile_lock.release()
+            print(f"Not profiling {self.label}: {e}")
+            self.enabled = False
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if not self.enabled:
+            return False
+        self._profile.disable()
+        _profile_lock.release()
+        wall = time.perf_counter() - self._started
+        cpu = time.thread_time() - self._cpu_started
+        try:
+            self._save(wall, cpu, exc)
+        except Exception as e:
+            print(f"Failed to save job profile: {e}")
+        return False
+    
+    def subprocess(self):
+        """Return a context manager timing the wait on a child process."""
+        return _SubprocessTimer(self)
+    
+    def _save(self, wall, cpu, exc):
+        """Write the cProfile dump and a JSON summary next to it."""
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r'[^\w-]+', '_', self.label)[-60:].strip('_') or 'job'
+        base = PROFILE_DIR / f"{datetime.now():%Y%m%d-%H%M%S}_{slug}_{self.job_id}"
+        
+        self._profile.dump_stats(str(base.with_suffix('.prof')))
+        
+        stats = pstats.Stats(self._profile)
+        top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:15]
+        
+        summary = {
+            'label': self.label,
+            'returncode': self.returncode,
+            'error': repr(exc) if exc else None,
+            'wall_s': round(wall, 4),
+            'orchestration_wall_s': round(wall - self.subprocess_wall, 4),
+            'orchestration_cpu_s': round(cpu, 4),
+            'subprocess_wall_s': round(self.subprocess_wall, 4),
+            'subprocess_user_s': round(self.subprocess_user, 4),
+            'subprocess_sys_s': round(self.subprocess_sys, 4),
+            'top_cumulative': [
+                {'function': f"{path}:{line}({name})", 'calls': data[1],
+                 'cumulative_s': round(data[3], 4)}
+                for (path, line, name), data in top
+            ],
+        }
+        base.with_suffix('.json').write_text(json.dumps(summary, indent=2))
+        self.artifact = base.with_suffix('.prof')
+        print(f"Job profile saved: {self.artifact}")
+
+
+class _SubprocessTimer:
+    """Measure wall time and child CPU usage for JobProfiler.subprocess()."""
+    
+    def __init__(self, profiler):
+        self.profiler = profiler
+    
+    def __enter__(self):
+        if self.profiler.enabled:
+            self._started = time.perf_counter()
+            self._usage = resource.getrusage(resource.RUSAGE_CHILDREN) if resource else None
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if not self.profiler.enabled:
+            return False
+        self.profiler.subprocess_wall += time.perf_counter() - self._started
+        if self._usage is not None:
+            # RUSAGE_CHILDREN only counts children that have been waited for,
+            # so the delta covers the job's yt-dlp process (and any other
+            # child reaped concurrently - profile one job at a time for
+            # exact numbers).
+            usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            self.profiler.subprocess_user += usage.ru_utime - self._usage.ru_utime
+            self.profiler.subprocess_sys += usage.ru_stime - self._usage.ru_stime
+        return False
+
+
+# ============================================================================
+# JOB QUEUE & JOURNAL
+# Kitsune never forgets an unfinished hunt
+# ============================================================================
+
+# Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_FINISHED = "finished"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_HELD = "held"  # waiting for admission (e.g. disk space)
+JOB_RETRYING = "retrying"  # failed, waiting out its backoff before running again
+
+# States that mean the job still has work to do after a restart
+JOB_PENDING_STATES = (JOB_QUEUED, JOB_HELD, JOB_RETRYING, JOB_RUNNING)
+
+# Priority classes, highest first. Interactive jobs (the window) go ahead of
+# API submissions, which go ahead of bulk backfills such as playlists.
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_NORMAL = "normal"
+PRIORITY_BULK = "bulk"
+JOB_PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BULK)
+
+
+class ArchiveJob:
+    """
+    A single archive request: what to download, where, and with which options.
+    
+    Options are snapshotted when the job is created so a job resumed after a
+    restart (or after being preempted) builds exactly the same command and
+    finds its .part files.
+    
+    priority is one of JOB_PRIORITIES; source identifies who submitted the
+    job, so jobs of the same priority are shared fairly between submitters.
+    """
+    
+    def __init__(self, url, download_path, options, job_id=None, created=None,
+                 priority=PRIORITY_NORMAL, source='local'):
+        if priority not in JOB_PRIORITIES:
+            raise ValueError(f"unknown priority: {priority}")
+        self.job_id = job_id or uuid.uuid4().hex[:12]
+        self.url = url
+        self.download_path = str(download_path)
+        self.options = dict(DEFAULT_DOWNLOAD_OPTIONS, **options)
+        self.created = created or datetime.now().isoformat(timespec='seconds')
+        self.priority = priority
+        self.source = source
+        self.state = JOB_QUEUED
+        self.attempts = 0
+        self.error = None
+        self.progress = None
+        self.files = []
+        self.predicted_size = None
+        self.format_choice = None
+        self.failure = None
+        self.retries = 0
+        self.retry_at = None
+        self.cancel_event = threading.Event()
+        self.preempted = False
+        self.started_at = None
+    
+    def to_dict(self):
+        """Serialize the parts of the job needed to recreate it."""
+        return {
+            'job_id': self.job_id,
+            'url': self.url,
+            'download_path': self.download_path,
+            'options': self.options,
+            'created': self.created,
+            'priority': self.priority,
+            'source': self.source,
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Recreate a job from to_dict() output."""
+        return cls(data['url'], data['download_path'], data.get('options', {}),
+                   job_id=data['job_id'], created=data.get('created'),
+                   priority=data.get('priority', PRIORITY_NORMAL),
+                   source=data.get('source', 'local'))
+    
+    def status(self):
+        """Everything known about the job, for display or the HTTP API."""
+        return dict(self.to_dict(), state=self.state, attempts=self.attempts,
+                    error=self.error, progress=self.progress, files=self.files,
+                    predicted_size=self.predicted_size, format=self.format_choice,
+                    failure=self.failure,
+                    retries=self.retries, retry_at=self.retry_at)
+    
+    def __repr__(self):
+        return f"<ArchiveJob {self.job_id} {self.state} {self.url}>"
+
+
+def execute_job(job, progress_callback=None, timeout=600, profile=False, engine=None):
+    """
+    Run a job's yt-dlp command to completion.
+    
+    Args:
+        job: ArchiveJob to run
+        progress_callback: Optional callable receiving parsed progress dicts
+        timeout: Seconds before the download is killed
+        profile: Save a JobProfiler artifact for this job
+        engine: Download engine (see get_engine); defaults to yt-dlp.exe
+        
+    Returns:
+        subprocess.CompletedProcess: Result of the yt-dlp run
+        
+    Raises:
+        subprocess.TimeoutExpired: If the download ran longer than timeout
+        JobCancelled: If job.cancel_event was set while it ran
+    """
+    engine = engine or SubprocessEngine()
+    download_path = Path(job.download_path)
+    with JobProfiler(job.url, enabled=profile, job_id=job.job_id) as profiler:
+        download_path.mkdir(parents=True, exist_ok=True)
+        
+        # yt-dlp appends the final path of every file it produces here
+        manifest_path = download_path / f".tubearc-{job.job_id}.files"
+        if job.format_choice is None:
+            choose_job_format(job, engine)
+        options = job.options
+        if job.format_choice and job.format_choice.get('spec'):
+            options = dict(options, format=job.format_choice['spec'])
+        cmd = engine.build_command(job.url, download_path, options, manifest_path)
+        print(f"Executing command ({engine.name}):", ' '.join(cmd))
+        
+        def on_progress(progress):
+            job.progress = progress
+            if progress_callback:
+                progress_callback(progress)
+        
+        with profiler.subprocess():
+            try:
+                result = engine.run(cmd, on_progress, timeout=timeout,
+                                    cancel_event=job.cancel_event)
+            except BaseException:
+                # Cancelled, timed out or crashed - don't leave the manifest
+                # behind in the archive folder
+                _read_manifest(manifest_path)
+                raise
+        profiler.returncode = result.returncode
+        
+        job.files = _read_manifest(manifest_path, job.options.get('metadata_only'))
+        if result.returncode == 0 and job.options.get('layout') == 'hash':
+            job.files = [str(place_in_shard(path)) for path in job.files]
+    return result
+
+
+def _read_manifest(manifest_path, metadata_only=False):
+    """
+    Read and remove a job's file manifest.
+    
+    Args:
+        manifest_path: File yt-dlp wrote final paths to
+        metadata_only: The job skipped the media, so map each would-be media
+            path to the .info.json that was written instead
+        
+    Returns:
+        list: Unique paths that exist on disk
+    """
+    try:
+        with manifest_path.open('r', encoding='utf-8') as f:
+            paths = [line.strip() for line in f if line.strip()]
+        manifest_path.unlink()
+    except OSError:
+        return []
+    if metadata_only:
+        paths = [os.path.splitext(path)[0] + '.info.json' for path in paths]
+    return [path for path in dict.fromkeys(paths) if os.path.exists(path)]
+
+
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT UNIQUE NOT NULL,
+    state TEXT NOT NULL,
+    data TEXT NOT NULL,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state);
+CREATE TABLE IF NOT EXISTS subscriptions (
+    url TEXT PRIMARY KEY,
+    platform TEXT NOT NULL,
+    download_path TEXT NOT NULL,
+    options TEXT NOT NULL,
+    interval_hours REAL NOT NULL,
+    backfill INTEGER NOT NULL DEFAULT 0,
+    seen_ids TEXT NOT NULL DEFAULT '[]',
+    last_upload TEXT,
+    pending_ids TEXT NOT NULL DEFAULT '[]',
+    pending_upload TEXT,
+    last_sync REAL,
+    next_sync REAL NOT NULL,
+    last_error TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS verified (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    deep INTEGER NOT NULL,
+    problem TEXT,
+    checked REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class StateStore:
+    """
+    Transactional store for config, the version cache and job history.
+    
+    Backed by SQLite in WAL mode: every write is an atomic transaction,
+    readers never block the writer, and a busy timeout lets many worker
+    threads (or processes) share the file safely. Settings are stored one
+    key per row, so saving a changed value rewrites that row, not a file.
+    
+    Each thread gets its own connection. Use batch() to group several
+    writes into a single transaction.
+    
+    Args:
+        path: SQLite database file
+    """
+    
+    def __init__(self, path=None):
+        self.path = Path(path or STATE_DB_PATH)
+        self._local = threading.local()
+        conn = self._conn()
+        with conn:
+            conn.executescript(STATE_SCHEMA)
+            self._add_missing_columns(conn)
+        self._migrate_legacy_files()
+    
+    # Columns added after their table first shipped: (table, column, definition)
+    _ADDED_COLUMNS = (
+        ('subscriptions', 'pending_ids', "TEXT NOT NULL DEFAULT '[]'"),
+        ('subscriptions', 'pending_upload', "TEXT"),
+    )
+    
+    def _add_missing_columns(self, conn):
+        """Bring tables created by an older version up to STATE_SCHEMA."""
+        for table, column, definition in self._ADDED_COLUMNS:
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+    
+    def batch(self):
+        """
+        Context manager grouping writes into one transaction.
+        
+        Usage:
+            with store.batch():
+                store.update_section('config', {...})
+                store.record_job(job, JOB_FINISHED)
+        """
+        return _StoreTransaction(self)
+    
+    # --- Key/value sections (config, version cache, ...) ---------------------
+    
+    def get_section(self, namespace):
+        """
+        Read every key in a namespace.
+        
+        Returns:
+            dict: Key -> decoded JSON value
+        """
+        rows = self._conn().execute(
+            "SELECT key, value FROM kv WHERE namespace = ?", (namespace,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+    
+    def update_section(self, namespace, values):
+        """
+        Write keys to a namespace atomically, skipping unchanged values.
+        
+        Args:
+            namespace: Section name, e.g. 'config'
+            values: Dict of keys to set
+            
+        Returns:
+            int: Number of keys actually written
+        """
+        encoded = {key: json.dumps(value, sort_keys=True) for key, value in values.items()}
+        with self.batch():
+            conn = self._conn()
+            current = dict(conn.execute(
+                "SELECT key, value FROM kv WHERE namespace = ?", (namespace,)).fetchall())
+            changed = [(namespace, key, value) for key, value in encoded.items()
+                       if current.get(key) != value]
+            conn.executemany(
+                "INSERT INTO kv (namespace, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT(namespace, key) DO UPDATE SET value = excluded.value", changed)
+        return len(changed)
+    
+    def delete_key(self, namespace, key):
+        """Remove a single key from a namespace."""
+        with self.batch():
+            self._conn().execute("DELETE FROM kv WHERE namespace = ? AND key = ?",
+                                 (namespace, key))
+    
+    # --- Job history -----------------------------------------------------------
+    
+    def record_job(self, job, state):
+        """
+        Record a job's current state (one row per job, upserted).
+        
+        Args:
+            job: ArchiveJob that changed state
+            state: New state (one of the JOB_* constants)
+        """
+        with self.batch():
+            self._conn().execute(
+                "INSERT INTO jobs (job_id, state, data, error, attempts, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET state = excluded.state, "
+                "data = excluded.data, error = excluded.error, "
+                "attempts = excluded.attempts, updated = excluded.updated",
+                (job.job_id, state, json.dumps(job.to_dict()),
+                 (job.error or '')[-500:] or None, job.attempts, time.time()))
+    
+    def pending_jobs(self):
+        """
+        Jobs that were queued or running when TubeArc last stopped.
+        
+        Returns:
+            list: Job dicts (ArchiveJob.to_dict() format) in submission order
+        """
+        placeholders = ','.join('?' * len(JOB_PENDING_STATES))
+        rows = self._conn().execute(
+            f"SELECT data FROM jobs WHERE state IN ({placeholders}) ORDER BY seq",
+            JOB_PENDING_STATES).fetchall()
+        return [json.loads(data) for (data,) in rows]
+    
+    def job_history(self, limit=100):
+        """
+        Most recently updated jobs.
+        
+        Returns:
+            list: Dicts with job_id, state, url, error, attempts and updated
+        """
+        rows = self._conn().execute(
+            "SELECT job_id, state, data, error, attempts, updated FROM jobs "
+            "ORDER BY updated DESC LIMIT ?", (limit,)).fetchall()
+        return [{'job_id': job_id, 'state': state, 'url': json.loads(data)['url'],
+                 'error': error, 'attempts': attempts, 'updated': updated}
+                for job_id, state, data, error, attempts, updated in rows]
+    
+    def prune_job_history(self, days=JOB_HISTORY_DAYS):
+        """Delete finished and failed jobs older than the given number of days."""
+        placeholders = ','.join('?' * len(JOB_PENDING_STATES))
+        with self.batch():
+            self._conn().execute(
+                f"DELETE FROM jobs WHERE state NOT IN ({placeholders}) AND updated < ?",
+                JOB_PENDING_STATES + (time.time() - days * 86400,))
+    
+    # --- Subscriptions -----------------------------------------------------------
+    
+    _SUBSCRIPTION_COLUMNS = ('url', 'platform', 'download_path', 'options', 'interval_hours',
+                             'backfill', 'seen_ids', 'last_upload', 'pending_ids',
+                             'pending_upload', 'last_sync', 'next_sync', 'last_error')
+    
+    def subscriptions(self):
+        """
+        Every subscription, soonest sync first.
+        
+        Returns:
+            list: Dicts with the subscriptions columns (options, seen_ids
+                and pending_ids decoded)
+        """
+        rows = self._conn().execute(
+            f"SELECT {', '.join(self._SUBSCRIPTION_COLUMNS)} FROM subscriptions "
+            "ORDER BY next_sync").fetchall()
+        subs = [dict(zip(self._SUBSCRIPTION_COLUMNS, row)) for row in rows]
+        for sub in subs:
+            sub['options'] = json.loads(sub['options'])
+            sub['seen_ids'] = json.loads(sub['seen_ids'])
+            sub['pending_ids'] = json.loads(sub['pending_ids'])
+        return subs
+    
+    def save_subscription(self, sub):
+        """Insert or replace a subscription (a dict as returned by subscriptions())."""
+        values = dict(sub, options=json.dumps(sub['options']), seen_ids=json.dumps(sub['seen_ids']),
+                      pending_ids=json.dumps(sub.get('pending_ids') or []))
+        with self.batch():
+            self._conn().execute(
+                f"INSERT OR REPLACE INTO subscriptions ({', '.join(self._SUBSCRIPTION_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(self._SUBSCRIPTION_COLUMNS))})",
+                [values.get(column) for column in self._SUBSCRIPTION_COLUMNS])
+    
+    def delete_subscription(self, url):
+        """Remove a subscription. Returns True if it existed."""
+        with self.batch():
+            cursor = self._conn().execute("DELETE FROM subscriptions WHERE url = ?", (url,))
+        return cursor.rowcount > 0
+    
+    # --- Verification results ---------------------------------------------------
+    
+    def verification_results(self):
+        """
+        Results of earlier archive verifications.
+        
+        Returns:
+            dict: Path -> {'size', 'mtime_ns', 'deep', 'problem', 'checked'}
+                (problem is None for a file that passed)
+        """
+        rows = self._conn().execute(
+            "SELECT path, size, mtime_ns, deep, problem, checked FROM verified").fetchall()
+        return {path: {'size': size, 'mtime_ns': mtime_ns, 'deep': bool(deep),
+                       'problem': problem, 'checked': checked}
+                for path, size, mtime_ns, deep, problem, checked in rows}
+    
+    def record_verifications(self, results):
+        """
+        Store verification results in one transaction.
+        
+        Args:
+            results: Iterable of (path, size, mtime_ns, deep, problem)
+        """
+        now = time.time()
+        with self.batch():
+            self._conn().executemany(
+                "INSERT INTO verified (path, size, mtime_ns, deep, problem, checked) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET size = excluded.size, "
+                "mtime_ns = excluded.mtime_ns, deep = excluded.deep, "
+                "problem = excluded.problem, checked = excluded.checked",
+                [(path, size, mtime_ns, int(deep), problem, now)
+                 for path, size, mtime_ns, deep, problem in results])
+    
+    def forget_verifications(self, paths):
+        """Drop results for files that no longer exist."""
+        with self.batch():
+            self._conn().executemany("DELETE FROM verified WHERE path = ?",
+                                     [(path,) for path in paths])
+    
+    # --- Migration -----------------------------------------------------------
+    
+    def _migrate_legacy_files(self):
+        """Import config.json, version_cache.json and jobs.journal once."""
+        legacy = [(CONFIG_PATH, 'config'), (VERSION_CACHE_PATH, 'version_cache')]
+        for path, namespace in legacy:
+            if not path.exists():
+                continue
+            try:
+                with path.open('r') as f:
+                    values = json.load(f)
+                if not self.get_section(namespace):
+                    self.update_section(namespace, values)
+                path.replace(path.with_suffix(path.suffix + '.migrated'))
+                print(f"Migrated {path.name} into {self.path.name}")
+            except (OSError, ValueError) as e:
+                print(f"Could not migrate {path.name}: {e}")
+        
+        if JOURNAL_PATH.exists():
+            try:
+                with self.batch():
+                    for data in _read_legacy_journal(JOURNAL_PATH):
+                        self.record_job(ArchiveJob.from_dict(data), JOB_QUEUED)
+                JOURNAL_PATH.replace(JOURNAL_PATH.with_suffix('.journal.migrated'))
+                print(f"Migrated {JOURNAL_PATH.name} into {self.path.name}")
+            except (OSError, sqlite3.Error) as e:
+                print(f"Could not migrate {JOURNAL_PATH.name}: {e}")
+
+
+class _StoreTransaction:
+    """Re-entrant transaction for StateStore.batch()."""
+    
+    def __init__(self, store):
+        self.store = store
+    
+    def __enter__(self):
+        conn = self.store._conn()
+        if self.store._local.depth == 0:
+            conn.execute("BEGIN IMMEDIATE")
+        self.store._local.depth += 1
+        return conn
+    
+    def __exit__(self, exc_type, exc, tb):
+        local = self.store._local
+        local.depth -= 1
+        if local.depth == 0:
+            local.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def _read_legacy_journal(path):
+    """Return the unfinished jobs recorded in a pre-state-store jobs.journal."""
+    jobs, states = {}, {}
+    with Path(path).open('r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if 'job' in entry:
+                jobs[entry['id']] = entry['job']
+            states[entry['id']] = entry['state']
+    return [data for job_id, data in jobs.items() if states.get(job_id) in JOB_PENDING_STATES]
+
+
+_state_store = None
+_state_store_lock = threading.Lock()
+
+
+def get_state_store():
+    """Return the process-wide StateStore, opening it on first use."""
+    global _state_store
+    with _state_store_lock:
+        if _state_store is None:
+            _state_store = StateStore()
+        return _state_store
+
+
+class JobJournal:
+    """
+    Crash-safe record of job state transitions, kept in the state store.
+    
+    Every transition is committed before the job moves on, so if TubeArc is
+    closed or crashes, replay() returns the jobs that still have work to do.
+    Finished jobs stay behind as job history for JOB_HISTORY_DAYS.
+    
+    Args:
+        store: StateStore to use (defaults to the process-wide store)
+    """
+    
+    def __init__(self, store=None):
+        self.store = store or get_state_store()
+    
+    def record(self, job, state):
+        """
+        Record a state transition for a job.
+        
+        Args:
+            job: ArchiveJob that changed state
+            state: New state (one of the JOB_* constants)
+        """
+        try:
+            self.store.record_job(job, state)
+        except sqlite3.Error as e:
+            print(f"Job journal write error: {e}")
+    
+    def replay(self):
+        """
+        Return the jobs that never finished, pruning old history first.
+        
+        Returns:
+            list: ArchiveJob objects, in their original submission order
+        """
+        self.store.prune_job_history()
+        return [ArchiveJob.from_dict(data) for data in self.store.pending_jobs()]
+    
+    def close(self):
+        """Nothing to flush - every record is already committed."""
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit() when the queue is at capacity."""
+
+
+class _JobLanes:
+    """
+    Waiting jobs, ordered by priority class and shared fairly within one.
+    
+    Each class keeps a FIFO per source and takes turns between sources, so
+    one client's 5,000-item backfill doesn't starve another client's bulk
+    jobs. Supports the deque operations JobQueue uses.
+    """
+    
+    def __init__(self):
+        self._lanes = {priority: OrderedDict() for priority in JOB_PRIORITIES}
+        self._count = 0
+    
+    def append(self, job):
+        self._lanes[job.priority].setdefault(job.source, deque()).append(job)
+        self._count += 1
+    
+    def appendleft(self, job):
+        """Put a job at the very front of its class (its source goes next)."""
+        lane = self._lanes[job.priority]
+        lane.setdefault(job.source, deque()).appendleft(job)
+        lane.move_to_end(job.source, last=False)
+        self._count += 1
+    
+    def extendleft(self, jobs):
+        for job in jobs:
+            self.appendleft(job)
+    
+    def popleft(self):
+        for priority in JOB_PRIORITIES:
+            lane = self._lanes[priority]
+            if lane:
+                source, fifo = next(iter(lane.items()))
+                job = fifo.popleft()
+                if fifo:
+                    lane.move_to_end(source)
+                else:
+                    del lane[source]
+                self._count -= 1
+                return job
+        raise IndexError("pop from an empty queue")
+    
+    def remove(self, job):
+        lane = self._lanes[job.priority]
+        fifo = lane.get(job.source)
+        if fifo is None:
+            raise ValueError(f"{job!r} is not waiting")
+        fifo.remove(job)
+        if not fifo:
+            del lane[job.source]
+        self._count -= 1
+    
+    def take(self, priority, predicate, limit):
+        """Remove and return up to limit jobs of one class that match predicate, in order."""
+        taken = []
+        for fifo in self._lanes[priority].values():
+            for job in fifo:
+                if len(taken) >= limit:
+                    break
+                if predicate(job):
+                    taken.append(job)
+        for job in taken:
+            self.remove(job)
+        return taken
+    
+    def count(self, priority):
+        """Number of waiting jobs in one priority class."""
+        return sum(len(fifo) for fifo in self._lanes[priority].values())
+    
+    def __contains__(self, job):
+        fifo = self._lanes[job.priority].get(job.source)
+        return fifo is not None and job in fifo
+    
+    def __len__(self):
+        return self._count
+
+
+class JobQueue:
+    """
+    Thread-safe queue of archive jobs processed by a pool of worker threads.
+    
+    Jobs run in priority order (interactive, normal, bulk), taking turns
+    between sources within a class. When an interactive job arrives and
+    every worker is busy, the most recently started bulk job is preempted:
+    it is stopped like a cancelled job and put back at the front of the
+    bulk class, and yt-dlp resumes its .part file when it runs again.
+    
+    Failed jobs the retry policy considers worth another go wait out their
+    backoff in the "retrying" state, then rejoin their class at the back.
+    
+    Every state change is written to the journal as it happens, so a crash
+    at any point leaves enough behind to requeue the job.
+    
+    Args:
+        runner: Callable(job) -> bool that performs the job, True on success
+        journal: Optional JobJournal for crash recovery
+        max_workers: Number of jobs processed concurrently
+        capacity: Maximum number of waiting jobs (0 = unbounded)
+        admission: Optional object with admit(job) -> bool and release(job)
+            (e.g. DiskSpaceGuard). Jobs it refuses are held and retried
+            when another job finishes or every HELD_JOB_RECHECK_SECONDS.
+        preemption: Let interactive jobs pause running bulk jobs
+        retry_policy: Optional object with delay(job) -> seconds or None
+            (e.g. RetryPolicy), asked about every failed job
+        batcher: Optional object with key(job), limit(key) and
+            run(jobs) -> {job_id: bool} (e.g. JobBatcher). Waiting jobs with
+            the same non-None key as the job a worker picks up are run
+            together with it by batcher.run() instead of the runner.
+    """
+    
+    def __init__(self, runner, journal=None, max_workers=1, capacity=0, admission=None,
+                 preemption=True, retry_policy=None, batcher=None):
+        self.runner = runner
+        self.journal = journal
+        self.max_workers = max_workers
+        self.capacity = capacity
+        self.admission = admission
+        self.preemption = preemption
+        self.retry_policy = retry_policy
+        self.batcher = batcher
+        self._pending = _JobLanes()
+        self._held = []
+        self._held_recheck_at = None
+        self._retrying = []  # heap of (due, job_id, job)
+        self._jobs = {}
+        self._running = set()
+        self._active = 0
+        self._cond = threading.Condition()
+        self._listeners = []
+        self._started = False
+    
+    def add_listener(self, callback):
+        """Register a callable(job) invoked after every state change."""
+        self._listeners.append(callback)
+    
+    def remove_listener(self, callback):
+        """Unregister a callable added with add_listener."""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+    
+    def _set_state(self, job, state):
+        job.state = state
+        if self.journal:
+            self.journal.record(job, state)
+        for callback in list(self._listeners):
+            try:
+                callback(job)
+            except Exception as e:
+                print(f"Job listener error: {e}")
+        if state not in JOB_PENDING_STATES:
+            self._forget_old_jobs()
+    
+    def _forget_old_jobs(self):
+        """Drop the oldest finished jobs so a long-running queue stays small."""
+        with self._cond:
+            done = [job_id for job_id, job in self._jobs.items()
+                    if job.state not in JOB_PENDING_STATES]
+            for job_id in done[:-JOB_QUEUE_KEEP_FINISHED]:
+                del self._jobs[job_id]
+    
+    def submit(self, job, record=True):
+        """
+        Add a job to the end of the queue.
+        
+        Args:
+            job: ArchiveJob to run
+            record: Write the job to the journal (False when it is being
+                restored from the journal - restored jobs ignore capacity)
+                
+        Raises:
+            QueueFull: If the queue is at capacity
+        """
+        return self.submit_many([job], record=record)[0]
+    
+    def submit_many(self, jobs, record=True):
+        """
+        Add several jobs at once - either all of them fit or none is added.
+        
+        Raises:
+            QueueFull: If the jobs don't fit within the queue's capacity
+        """
+        with self._cond:
+            waiting = len(self._pending) + len(self._held) + len(self._retrying)
+            if record and self.capacity and waiting + len(jobs) > self.capacity:
+                raise QueueFull(f"{waiting} waiting, {len(jobs)} more requested, "
+                                f"capacity {self.capacity}")
+            for job in jobs:
+                self._jobs[job.job_id] = job
+                self._pending.append(job)
+            self._cond.notify(len(jobs))
+            if any(job.priority == PRIORITY_INTERACTIVE for job in jobs):
+                self._preempt_bulk_jobs()
+        if record:
+            for job in jobs:
+                self._set_state(job, JOB_QUEUED)
+        return jobs
+    
+    def get(self, job_id):
+        """Return a job submitted in this session (or None)."""
+        with self._cond:
+            return self._jobs.get(job_id)
+    
+    def jobs(self):
+        """Jobs submitted in this session, oldest first."""
+        with self._cond:
+            return list(self._jobs.values())
+    
+    def cancel(self, job_id):
+        """
+        Cancel a job. A waiting job is taken off the queue; a running one is
+        stopped by its engine (yt-dlp leaves its .part files behind).
+        
+        Returns:
+            ArchiveJob: The job, or None if it isn't known. Its state is
+                unchanged if it had already finished.
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state not in JOB_PENDING_STATES:
+                return job
+            job.preempted = False
+            job.cancel_event.set()
+            waiting = True
+            if job in self._pending:
+                self._pending.remove(job)
+            elif job in self._held:
+                self._held.remove(job)
+            elif any(entry[2] is job for entry in self._retrying):
+                self._retrying = [entry for entry in self._retrying if entry[2] is not job]
+                heapq.heapify(self._retrying)
+            else:
+                waiting = False
+        if waiting:
+            self._set_state(job, JOB_CANCELLED)
+        return job
+    
+    def restore(self):
+        """
+        Requeue jobs left unfinished by a previous run.
+        
+        Returns:
+            list: The restored jobs
+        """
+        if not self.journal:
+            return []
+        jobs = self.journal.replay()
+        for job in jobs:
+            print(f"Resuming interrupted job {job.job_id}: {job.url}")
+            self.submit(job, record=False)
+        return jobs
+    
+    def start(self):
+        """Start the worker threads (idempotent)."""
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+        for _ in range(self.max_workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+    
+    @property
+    def pending_count(self):
+        """Number of jobs waiting, held, retrying or running."""
+        with self._cond:
+            return len(self._pending) + len(self._held) + len(self._retrying) + self._active
+    
+    def counts(self):
+        """Number of waiting, held, retrying and running jobs and the queue capacity."""
+        with self._cond:
+            return {'queued': len(self._pending), 'held': len(self._held),
+                    'retrying': len(self._retrying), 'running': self._active, 'capacity': self.capacity,
+                    'workers': self.max_workers,
+                    'by_priority': {priority: self._pending.count(priority)
+                                    for priority in JOB_PRIORITIES}}
+    
+    def _preempt_bulk_jobs(self):
+        """
+        Pause running bulk jobs until every waiting interactive job has a
+        worker (call with the lock held).
+        """
+        if not self.preemption:
+            return
+        pausing = sum(1 for job in self._running if job.preempted)
+        free = self.max_workers - self._active
+        needed = self._pending.count(PRIORITY_INTERACTIVE) - free - pausing
+        if needed <= 0:
+            return
+        # Newest first: they have the least progress to pick up again
+        victims = sorted((job for job in self._running
+                          if job.priority == PRIORITY_BULK and not job.preempted),
+                         key=lambda job: job.started_at, reverse=True)
+        for job in victims[:needed]:
+            print(f"Pausing bulk job {job.job_id} for an interactive job")
+            job.preempted = True
+            job.cancel_event.set()
+    
+    def _requeue_preempted(self, job):
+        """Put a preempted job back at the front of its class."""
+        with self._cond:
+            job.cancel_event = threading.Event()
+            job.progress = None
+            self._pending.appendleft(job)
+            self._cond.notify()
+        self._set_state(job, JOB_QUEUED)
+    
+    def _requeue_held(self):
+        """Put held jobs back at the front of the queue (call with the lock held)."""
+        if self._held:
+            self._pending.extendleft(reversed(self._held))
+            self._held.clear()
+            self._cond.notify_all()
+    
+    def _release_due_retries(self):
+        """Move retries whose backoff is over into the queue (call with the lock held)."""
+        now = time.monotonic()
+        released = False
+        while self._retrying and self._retrying[0][0] <= now:
+            self._pending.append(heapq.heappop(self._retrying)[2])
+            released = True
+        if released:
+            self._cond.notify_all()
+    
+    def _wait_timeout(self):
+        """Seconds until the next retry or held-job recheck is due (None = no timeout)."""
+        deadlines = [self._retrying[0][0]] if self._retrying else []
+        if self._held:
+            deadlines.append(self._held_recheck_at)
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.monotonic())
+    
+    def _retry_delay(self, job):
+        try:
+            return self.retry_policy.delay(job)
+        except Exception as e:
+            print(f"Retry policy failed for {job.job_id}: {e}")
+            return None
+    
+    def _schedule_retry(self, job, delay):
+        job.retries += 1
+        job.retry_at = (datetime.now() + timedelta(seconds=delay)).isoformat(timespec='seconds')
+        with self._cond:
+            heapq.heappush(self._retrying, (time.monotonic() + delay, job.job_id, job))
+            self._cond.notify()
+        print(f"Job {job.job_id} failed ({job.failure}), retry {job.retries} in {delay:.0f}s")
+        self._set_state(job, JOB_RETRYING)
+    
+    def _admit(self, job):
+        try:
+            return self.admission.admit(job)
+        except Exception as e:
+            # A broken check mustn't stall the queue
+            print(f"Admission check failed for {job.job_id}: {e}")
+            return True
+    
+    def _worker(self):
+        while True:
+            with self._cond:
+                while True:
+                    self._release_due_retries()
+                    if self._pending:
+                        break
+                    self._cond.wait(self._wait_timeout())
+                    if self._held and time.monotonic() >= self._held_recheck_at:
+                        self._requeue_held()
+                job = self._pending.popleft()
+                self._active += 1
+            
+            if job.cancel_event.is_set():
+                # Cancelled between leaving the queue and starting
+                with self._cond:
+                    self._active -= 1
+                self._set_state(job, JOB_CANCELLED)
+                continue
+            
+            if self.admission is not None and not self._admit(job):
+                self._hold(job)
+                continue
+            
+            batch = self._gather_batch(job)
+            jobs = batch or [job]
+            with self._cond:
+                now = time.monotonic()
+                for member in jobs:
+                    member.started_at = now
+                    self._running.add(member)
+            for member in jobs:
+                member.attempts += 1
+                self._set_state(member, JOB_RUNNING)
+            if batch is None:
+                results = {job.job_id: self._run(job)}
+            else:
+                results = self._run_batch(batch)
+            for member in jobs:
+                if self.admission is not None:
+                    self.admission.release(member)
+                self._finish(member, results.get(member.job_id, False))
+    
+    def _hold(self, job):
+        """Park a job the admission check refused."""
+        with self._cond:
+            self._active -= 1
+            if not self._held:
+                self._held_recheck_at = time.monotonic() + HELD_JOB_RECHECK_SECONDS
+            self._held.append(job)
+        if job.state != JOB_HELD:
+            print(f"Holding job {job.job_id}: {job.error}")
+            self._set_state(job, JOB_HELD)
+    
+    def _gather_batch(self, job):
+        """
+        Take the waiting jobs that can share a batch with job.
+        
+        Returns:
+            list: job followed by the admitted batch mates, or None if job
+                isn't batched
+        """
+        if self.batcher is None:
+            return None
+        try:
+            key = self.batcher.key(job)
+            limit = self.batcher.limit(key) if key is not None else 0
+        except Exception as e:
+            print(f"Batching failed for {job.job_id}: {e}")
+            return None
+        if key is None:
+            return None
+        
+        urls = {job.url}
+        
+        def fits(other):
+            # One URL per batch - yt-dlp would only archive it once
+            if other.url in urls or other.cancel_event.is_set():
+                return False
+            try:
+                if self.batcher.key(other) != key:
+                    return False
+            except Exception:
+                return False
+            urls.add(other.url)
+            return True
+        
+        with self._cond:
+            mates = self._pending.take(job.priority, fits, limit - 1)
+            self._active += len(mates)
+        batch = [job]
+        for other in mates:
+            if self.admission is not None and not self._admit(other):
+                self._hold(other)
+            else:
+                batch.append(other)
+        return batch
+    
+    def _run(self, job):
+        try:
+            return self.runner(job)
+        except Exception as e:
+            job.error = str(e)
+            return False
+    
+    def _run_batch(self, jobs):
+        try:
+            return self.batcher.run(jobs)
+        except Exception as e:
+            for job in jobs:
+                job.error = str(e)
+            return {}
+    
+    def _finish(self, job, succeeded):
+        """Settle a job that has stopped running: requeue, retry or end it."""
+        with self._cond:
+            self._active -= 1
+            self._running.discard(job)
+            preempted, job.preempted = job.preempted, False
+            # Space (or whatever held them) may have been freed
+            self._requeue_held()
+        cancelled = job.cancel_event.is_set() and not preempted
+        delay = None
+        if not (succeeded or cancelled or preempted) and self.retry_policy is not None:
+            delay = self._retry_delay(job)
+        if preempted and not succeeded:
+            self._requeue_preempted(job)
+        elif cancelled:
+            self._set_state(job, JOB_CANCELLED)
+        elif delay is not None:
+            self._schedule_retry(job, delay)
+        else:
+            if succeeded:
+                job.failure = job.retry_at = None
+            self._set_state(job, JOB_FINISHED if succeeded else JOB_FAILED)
+
+
+def index_finished_job(job):
+    """JobQueue listener: add a finished job's metadata to the catalog."""
+    wants_catalog = job.options.get('metadata') or job.options.get('metadata_only')
+    if job.state == JOB_FINISHED and wants_catalog and job.files:
+        try:
+            catalog = Catalog()
+            catalog.index_files(job.files)
+            catalog.close()
+        except sqlite3.Error as e:
+            print(f"Catalog update failed: {e}")
+
+
+# ============================================================================
+# FORMAT SELECTION
+# Kitsune carries home only what she needs
+# ============================================================================
+
+# What "combined" downloads when no better format was picked
+DEFAULT_FORMAT_SPEC = "bestvideo[ext=mp4]+bestaudio[ext=m4a]/bestvideo+bestaudio/best"
+
+# Quality policies for combined archives. The cheapest format (or video +
+# audio pair) at the highest resolution the policy allows is downloaded.
+# max_height/max_filesize_mb of None mean no limit; codecs are the video
+# codec families allowed (any codec is used if none of them is offered).
+QUALITY_POLICIES = {
+    'best': {
+        'description': "Highest resolution available",
+        'max_height': None,
+        'max_filesize_mb': None,
+        'codecs': ('h264', 'vp9', 'av1', 'h265'),
+    },
+    '1080p': {
+        'description': "Up to 1080p",
+        'max_height': 1080,
+        'max_filesize_mb': None,
+        'codecs': ('h264', 'vp9', 'av1', 'h265'),
+    },
+    '720p': {
+        'description': "Up to 720p H.264 - plays everywhere",
+        'max_height': 720,
+        'max_filesize_mb': None,
+        'codecs': ('h264',),
+    },
+    'saver': {
+        'description': "Up to 480p and 250 MB per video",
+        'max_height': 480,
+        'max_filesize_mb': 250,
+        'codecs': ('h264', 'vp9', 'av1', 'h265'),
+    },
+}
+
+# A merge downloads two streams and then rewrites both into a new file, so a
+# progressive format up to this much larger is still the cheaper choice
+MERGE_COST_FACTOR = 1.5
+
+_CODEC_FAMILIES = (
+    (('avc', 'h264'), 'h264'),
+    (('hev', 'hvc', 'h265', 'bytevc1'), 'h265'),
+    (('vp9', 'vp09'), 'vp9'),
+    (('av01', 'av1'), 'av1'),
+)
+
+
+def _codec_family(codec):
+    """Map a yt-dlp vcodec string such as 'avc1.640028' to a codec family."""
+    codec = (codec or '').lower()
+    for prefixes, family in _CODEC_FAMILIES:
+        if codec.startswith(prefixes):
+            return family
+    return codec.split('.')[0]
+
+
+def _format_size(fmt, duration):
+    """Bytes a format will download (estimated from its bitrate if needed), or None."""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if not size and fmt.get('tbr') and duration:
+        size = fmt['tbr'] * 1000 / 8 * duration
+    return size or None
+
+
+def select_formats(available, duration, policy):
+    """
+    Pick the cheapest format or video + audio pair that meets a policy.
+    
+    The target is the highest resolution (and frame rate) the policy allows.
+    At that resolution a progressive format is preferred over a merge unless
+    it's more than MERGE_COST_FACTOR times larger. If the result is over the
+    policy's size limit, the next resolution down is tried.
+    
+    Args:
+        available: Probed formats (the 'available' list of a probe)
+        duration: Video length in seconds, for bitrate-based sizes
+        policy: Entry of QUALITY_POLICIES
+        
+    Returns:
+        dict: 'spec' (yt-dlp format spec), 'height', 'size' and 'merge', or
+            None if nothing suitable could be sized
+    """
+    video, audio = [], []
+    for fmt in available:
+        size = _format_size(fmt, duration)
+        if not size or fmt.get('has_drm') or not fmt.get('format_id'):
+            continue
+        has_video = fmt.get('vcodec') not in (None, 'none')
+        has_audio = fmt.get('acodec') not in (None, 'none')
+        if has_video and fmt.get('height'):
+            video.append((fmt, size, has_audio))
+        elif has_audio and not has_video:
+            audio.append((fmt, size))
+    if not video:
+        return None
+    
+    allowed = [entry for entry in video if _codec_family(entry[0]['vcodec']) in policy['codecs']]
+    video = allowed or video
+    # Same rule as the default spec: m4a audio merges into mp4 cleanly
+    m4a = [entry for entry in audio if entry[0].get('ext') == 'm4a']
+    best_audio = max(m4a or audio, key=lambda entry: entry[0].get('tbr') or 0, default=None)
+    
+    def target(fmt):
+        return (fmt['height'], fmt.get('fps') or 0)
+    
+    max_height = policy.get('max_height')
+    targets = sorted({target(fmt) for fmt, _, _ in video}, reverse=True)
+    within = [t for t in targets if not max_height or t[0] <= max_height]
+    limit = policy.get('max_filesize_mb')
+    limit = limit * 1024 * 1024 if limit else None
+    
+    choice = None
+    for wanted in within or targets[-1:]:
+        candidates = []
+        for fmt, size, progressive in video:
+            if target(fmt) != wanted:
+                continue
+            if progressive:
+                candidates.append((size, size, fmt['format_id'], False))
+            elif best_audio:
+                total = size + best_audio[1]
+                candidates.append((total * MERGE_COST_FACTOR, total,
+                                   f"{fmt['format_id']}+{best_audio[0]['format_id']}", True))
+        if not candidates:
+            continue
+        _, size, spec, merge = min(candidates, key=lambda c: c[0])
+        choice = {'spec': spec, 'height': wanted[0], 'size': int(size), 'merge': merge}
+        if limit is None or size <= limit:
+            break
+    return choice
+
+
+def quality_format_spec(policy):
+    """
+    Express a quality policy as a yt-dlp format spec, for runs whose formats
+    weren't probed (batches).
+    
+    yt-dlp can only filter single formats, so the size limit applies to
+    each stream rather than to video + audio together, and formats of
+    unknown size pass it. If nothing meets the policy, the smallest format
+    is taken, as select_formats() settles for the lowest resolution.
+    
+    Args:
+        policy: Entry of QUALITY_POLICIES
+        
+    Returns:
+        str: Format spec, or None if the policy allows anything (the
+            default selection then applies)
+    """
+    limits = ''
+    if policy.get('max_height'):
+        limits += f"[height<={policy['max_height']}]"
+    if policy.get('max_filesize_mb'):
+        limits += f"[filesize<?{policy['max_filesize_mb']}M]"
+    prefixes = [prefix for prefixes, family in _CODEC_FAMILIES
+                if family in policy['codecs'] for prefix in prefixes]
+    restricts_codecs = len(policy['codecs']) < len(_CODEC_FAMILIES)
+    if not limits and not restricts_codecs:
+        return None
+    
+    filters = [limits + f"[vcodec~='^({'|'.join(prefixes)})']"] if restricts_codecs else []
+    filters.append(limits)
+    choices = [f"bv*{f}+ba/b{f}" for f in filters]
+    if limits:
+        choices.append("wv*+ba/w")
+    return '/'.join(choices)
+
+
+def apply_quality_policy(job, probe):
+    """
+    Pick a job's format from its probe and log the bytes saved.
+    
+    The job's format_choice is set ({} if its options don't allow a choice
+    or nothing could be picked, so the default selection is used).
+    
+    Args:
+        job: ArchiveJob being prepared
+        probe: Result of an engine's probe() with the job's default command
+        
+    Returns:
+        dict: The probe narrowed to the chosen formats, for
+            estimate_download_size()
+    """
+    if job.format_choice is None:
+        job.format_choice = {}
+        options = job.options
+        policy = QUALITY_POLICIES.get(options.get('quality'))
+        if policy and options.get('combined') and not options.get('metadata_only'):
+            choice = select_formats(probe.get('available') or [], probe.get('duration'), policy)
+            if choice:
+                job.format_choice = choice
+                default = [_format_size(fmt, probe.get('duration')) for fmt in probe['formats']]
+                kind = "merged" if choice['merge'] else "progressive, no merge"
+                message = (f"Format {choice['spec']} for {job.url}: {choice['height']}p {kind}, "
+                           f"{choice['size'] / (1024*1024):.1f} MB")
+                if all(default):
+                    saved = sum(default) - choice['size']
+                    if saved >= 0:
+                        message += f", {saved / (1024*1024):.1f} MB less than the default"
+                    else:
+                        message += f", {-saved / (1024*1024):.1f} MB more than the default"
+                print(message)
+    
+    choice = job.format_choice
+    if not choice:
+        return probe
+    return {'duration': probe.get('duration'), 'merge': choice['merge'],
+            'formats': [{'filesize': choice['size']}]}
+
+
+def choose_job_format(job, engine, timeout=120):
+    """
+    Probe a job and pick its format (see apply_quality_policy).
+    
+    Only needed when disk admission is off - predict_job_size() picks the
+    format from its own probe otherwise.
+    """
+    options = job.options
+    probe = None
+    if (options.get('combined') and not options.get('metadata_only')
+            and options.get('quality') in QUALITY_POLICIES):
+        cmd = engine.build_command(job.url, job.download_path, options)
+        try:
+            probe = engine.probe(cmd, timeout=timeout)
+        except Exception as e:
+            print(f"Format probe failed for {job.url}: {e}")
+    if probe:
+        apply_quality_policy(job, probe)
+    else:
+        job.format_choice = {}
+
+
+# ============================================================================
+# DISK SPACE ADMISSION
+# Kitsune checks the den has room before bringing more home
+# ============================================================================
+
+def estimate_download_size(probe, options):
+    """
+    Predict the peak disk use of a job from its probed formats.
+    
+    Args:
+        probe: Result of an engine's probe() (see _size_fields)
+        options: The job's archive options
+        
+    Returns:
+        int: Bytes, or None if a format's size can't be worked out
+    """
+    total = 0
+    for fmt in probe['formats']:
+        size = fmt.get('filesize') or fmt.get('filesize_approx')
+        if not size and fmt.get('tbr') and probe.get('duration'):
+            # Bitrate (kbit/s) x duration - good enough for an admission check
+            size = fmt['tbr'] * 1000 / 8 * probe['duration']
+        if not size:
+            return None
+        total += size
+    
+    options = dict(DEFAULT_DOWNLOAD_OPTIONS, **options)
+    converts_audio = (not options['combined'] and options['audio_only']
+                      and not options['video_only'])
+    merges = options['combined'] and probe.get('merge', True)
+    if merges or converts_audio:
+        # The downloaded streams stay on disk until the merged/converted
+        # file next to them is complete
+        total *= POSTPROCESS_SPACE_FACTOR
+    return int(total)
+
+
+def predict_job_size(job, engine, timeout=120):
+    """
+    Probe a job and predict how much disk space it will need at its peak.
+    
+    Args:
+        job: ArchiveJob to predict
+        engine: Download engine used to probe (see get_engine)
+        timeout: Seconds allowed for the probe
+        
+    Returns:
+        int: Bytes, or None if the size couldn't be predicted
+    """
+    if job.options.get('metadata_only'):
+        return 0
+    cmd = engine.build_command(job.url, job.download_path, job.options)
+    try:
+        probe = engine.probe(cmd, timeout=timeout)
+    except Exception as e:
+        print(f"Size probe failed for {job.url}: {e}")
+        return None
+    if not probe:
+        return None
+    # The same probe picks the job's format, so it isn't probed twice
+    return estimate_download_size(apply_quality_policy(job, probe), job.options)
+
+
+def _volume_of(path):
+    """
+    Identify the volume a (possibly not yet existing) directory is on.
+    
+    Returns:
+        tuple: (volume id, an existing path on that volume)
+    """
+    path = Path(path).absolute()
+    while not path.exists() and path != path.parent:
+        path = path.parent
+    return os.stat(path).st_dev, path
+
+
+def make_disk_guard(engine, config):
+    """
+    Build the DiskSpaceGuard for a queue from settings.
+    
+    Returns:
+        DiskSpaceGuard, or None if disk_admission is turned off
+    """
+    if not config.get('disk_admission', True):
+        return None
+    batching = make_job_batcher(engine, config) is not None
+    
+    def predict(job):
+        if batching and is_batchable(job):
+            # Probing would start the very process batching saves
+            return BATCH_JOB_SIZE_MB * 1024 * 1024
+        return predict_job_size(job, engine)
+    
+    return DiskSpaceGuard(predict, margin_mb=config.get('disk_margin_mb'),
+                          unknown_size_mb=config.get('unknown_job_size_mb'))
+
+
+class DiskSpaceGuard:
+    """
+    Admission control for JobQueue based on predicted job sizes.
+    
+    Before a job starts, its peak size is predicted from the probed formats
+    and reserved on the volume it will be written to. A job is admitted only
+    if the volume's free space, minus what running jobs have reserved and a
+    safety margin, still covers it; otherwise the queue holds it until a
+    running job finishes or space is freed. Reservations are released when
+    a job ends. Bytes a running job has already written are counted twice
+    (they are gone from the free space and still reserved), which errs on
+    the side of caution.
+    
+    Args:
+        predictor: Callable(job) -> bytes or None (see predict_job_size)
+        margin_mb: Space always left free on every volume
+        unknown_size_mb: Assumed size of a job that couldn't be predicted
+    """
+    
+    def __init__(self, predictor, margin_mb=None, unknown_size_mb=None):
+        self.predictor = predictor
+        self.margin = (DISK_SAFETY_MARGIN_MB if margin_mb is None else margin_mb) * 1024 * 1024
+        self.unknown_size = (UNKNOWN_JOB_SIZE_MB if unknown_size_mb is None
+                             else unknown_size_mb) * 1024 * 1024
+        self._reserved = defaultdict(int)
+        self._reservations = {}
+        self._lock = threading.Lock()
+    
+    def admit(self, job):
+        """
+        Reserve space for a job if it fits.
+        
+        Returns:
+            bool: True if the job may start now
+        """
+        if job.predicted_size is None:
+            # Probing takes a network round trip, so it happens only once
+            predicted = self.predictor(job)
+            job.predicted_size = self.unknown_size if predicted is None else predicted
+        
+        volume, existing = _volume_of(job.download_path)
+        with self._lock:
+            free = shutil.disk_usage(existing).free
+            available = free - self._reserved[volume] - self.margin
+            if job.predicted_size > available:
+                job.error = (f"Waiting for disk space: needs {job.predicted_size / (1024*1024):.0f} MB, "
+                             f"{max(available, 0) / (1024*1024):.0f} MB available")
+                return False
+            self._reserved[volume] += job.predicted_size
+            self._reservations[job.job_id] = (volume, job.predicted_size)
+        job.error = None
+        return True
+    
+    def release(self, job):
+        """Return a finished job's reservation."""
+        with self._lock:
+            volume, size = self._reservations.pop(job.job_id, (None, 0))
+            if volume is not None:
+                self._reserved[volume] -= size
+    
+    def reserved(self):
+        """Bytes currently reserved, per volume id."""
+        with self._lock:
+            return {volume: size for volume, size in self._reserved.items() if size}
+
+
+# ============================================================================
+# FAILURE CLASSIFICATION & RETRIES
+# Kitsune knows which doors stay shut and which are only stuck
+# ============================================================================
+
+FAILURE_PERMANENT = "permanent"  # retrying can't help (private, removed, blocked)
+FAILURE_TRANSIENT = "transient"  # network trouble or a server error
+FAILURE_THROTTLED = "throttled"  # the site is rate limiting us
+
+# (pattern, failure class, message for the user), checked in order against
+# yt-dlp's ERROR lines - throttling first, since a 429 page often also says
+# the video is "unavailable". A 403 counts as throttling when it comes with
+# rate-limit or bot-check text and as permanent when the site says why it
+# refused (geo-blocking or an access/permission message). A bare
+# "HTTP Error 403: Forbidden" is usually an expired stream link, which a
+# fresh attempt fixes, so it is transient.
+FAILURE_PATTERNS = [
+    (r"HTTP Error 429|Too Many Requests", FAILURE_THROTTLED,
+     "The site is rate limiting downloads."),
+    (r"rate[- ]?limit|confirm you.re not a bot|try again later", FAILURE_THROTTLED,
+     "The site is rate limiting downloads."),
+    (r"Private video", FAILURE_PERMANENT, "This is a private video."),
+    (r"Sign in to confirm your age|age[- ]restricted|inappropriate for some users",
+     FAILURE_PERMANENT, "Age-restricted video. Cannot download."),
+    (r"available in your country|available from your location|geo[- ]?restrict",
+     FAILURE_PERMANENT, "This video is blocked in your country."),
+    (r"removed by the|has been removed|account .* terminated|copyright",
+     FAILURE_PERMANENT, "This video has been removed."),
+    (r"members[- ]only|Join this channel", FAILURE_PERMANENT,
+     "This video is only available to channel members."),
+    (r"This video is unavailable", FAILURE_PERMANENT, "This video is unavailable or private."),
+    (r"Video unavailable", FAILURE_PERMANENT, "Video is not available for download."),
+    (r"HTTP Error 404|HTTP Error 410", FAILURE_PERMANENT, "Video not found (404 error)."),
+    (r"(?=.*HTTP Error 403)(?=.*(?:access denied|permission|not authori[sz]ed|not allowed))",
+     FAILURE_PERMANENT, "The site refused access to this video (403 error)."),
+    (r"HTTP Error 403", FAILURE_TRANSIENT,
+     "The site refused the request (403 error); the download link may have expired."),
+    (r"Unsupported URL", FAILURE_PERMANENT, "This site or URL is not supported."),
+    (r"HTTP Error 5\d\d", FAILURE_TRANSIENT,
+     "The site had a server error."),
+    (r"Worker process exited unexpectedly", FAILURE_TRANSIENT,
+     "The download worker crashed."),
+    (r"timed out|timeout|Connection reset|reset by peer|Connection aborted|"
+     r"Connection refused|Remote end closed|IncompleteRead|"
+     r"Temporary failure in name resolution|getaddrinfo failed|Network is unreachable",
+     FAILURE_TRANSIENT, "The connection failed or timed out."),
+]
+
+
+def classify_failure(output):
+    """
+    Work out why a job failed from yt-dlp's output.
+    
+    Only ERROR lines are looked at when there are any, so the warnings yt-dlp
+    prints while retrying internally don't mask the real cause. Output that
+    matches nothing is treated as permanent: retrying a failure nobody
+    understands mostly wastes a worker slot.
+    
+    Args:
+        output: Error text of the failed job
+        
+    Returns:
+        tuple: (failure class, message for the user or None)
+    """
+    lines = (output or '').splitlines()
+    errors = '\n'.join(line for line in lines if line.startswith('ERROR')) or '\n'.join(lines)
+    for pattern, failure, message in FAILURE_PATTERNS:
+        if re.search(pattern, errors, re.IGNORECASE):
+            return failure, message
+    return FAILURE_PERMANENT, None
+
+
+class RetryPolicy:
+    """
+    Decides whether a failed JobQueue job runs again, and when.
+    
+    Transient and throttled failures are retried with exponential backoff
+    and "equal jitter" (half the delay fixed, half random), so jobs that
+    failed together - say, during a network outage - don't all come back
+    at the same moment. Permanent failures are never retried.
+    
+    Args:
+        max_retries: Retries per job before it is marked failed
+        backoff: {failure class: (first delay, longest delay)} in seconds
+    """
+    
+    def __init__(self, max_retries=None, backoff=None):
+        self.max_retries = JOB_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = dict(RETRY_BACKOFF, **(backoff or {}))
+    
+    def delay(self, job):
+        """
+        Classify a failed job and pick its retry delay.
+        
+        Returns:
+            float: Seconds to wait before the next attempt, or None to give up
+        """
+        job.failure, _ = classify_failure(job.error)
+        if job.failure not in self.backoff or job.retries >= self.max_retries:
+            return None
+        first, longest = self.backoff[job.failure]
+        delay = min(longest, first * 2 ** job.retries)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+# ============================================================================
+# BATCHED ARCHIVING
+# Kitsune fetches a whole armful of short clips in one trip
+# ============================================================================
+
+# yt-dlp announces every item of a batch with this line before extracting it
+_BATCH_ITEM_PATTERN = re.compile(r'^\[[^\]]+\] Extracting URL: (\S+)')
+
+
+def is_batchable(job):
+    """
+    True if a job may share a yt-dlp run with others: a short-form clip that
+    wasn't started from the window (which expects to report on it alone).
+    """
+    return (platform_of(job.url) in BATCH_PLATFORMS and job.source != 'window'
+            and not job.options.get('metadata_only'))
+
+
+def build_batch_command(batch_file, download_path, options, manifest_path):
+    """
+    Build a yt-dlp command that archives every URL in a batch file.
+    
+    Args:
+        batch_file: File with one URL per line
+        download_path: Directory to save downloaded files
+        options: Archive options shared by the whole batch
+        manifest_path: File yt-dlp appends "<input URL> <final path>" to for
+            every file it produces
+            
+    Returns:
+        list: Command arguments for subprocess
+    """
+    # Batched clips aren't probed, so their policy goes to yt-dlp as filters
+    policy = QUALITY_POLICIES.get(options.get('quality'))
+    spec = quality_format_spec(policy) if policy and options.get('combined') else None
+    if spec:
+        options = dict(options, format=spec)
+    cmd = build_download_command("", download_path, options)
+    # The URLs come from the batch file, and one bad clip mustn't stop the rest
+    cmd[1:2] = ["-a", str(batch_file), "--no-abort-on-error"]
+    cmd.extend(["--print-to-file", "after_move:%(original_url)s %(filepath)s",
+                str(manifest_path)])
+    return cmd
+
+
+def _url_matches(printed, url):
+    """Compare a URL as yt-dlp printed it (long ones are shortened with "...")."""
+    if printed == url:
+        return True
+    head, ellipsis, tail = printed.partition('...')
+    return bool(ellipsis) and url.startswith(head) and url.endswith(tail)
+
+
+class JobBatcher:
+    """
+    Runs queued short-form jobs in batches, one yt-dlp.exe per batch.
+    
+    Used as the batcher of a JobQueue. Jobs are grouped by site, archive
+    directory and options, and their URLs are handed to yt-dlp in a batch
+    file. yt-dlp works through them in order and announces each one, so its
+    output is split between the jobs as it streams: every job gets its own
+    progress and error text, and fails or is retried on its own. The files
+    each produced are read from a manifest keyed by URL.
+    
+    Batch sizes adapt per site (additive increase, multiplicative
+    decrease): a full batch that went through without throttling lets the
+    next one grow by one, and a throttling error halves it and stops the
+    batch straight away - the clips it didn't reach fail as throttled, so
+    the retry policy backs them off instead of hammering the site.
+    
+    Cancelling or preempting one job stops the whole process; its batch
+    mates that weren't finished go back to the front of the queue.
+    
+    Args:
+        platforms: Sites whose jobs are batched
+        start: Initial batch size
+        maximum: Largest batch size
+        timeout_per_job: Seconds allowed per job in a batch
+    """
+    
+    def __init__(self, platforms=BATCH_PLATFORMS, start=BATCH_SIZE_START,
+                 maximum=BATCH_SIZE_MAX, timeout_per_job=BATCH_TIMEOUT_PER_JOB):
+        self.platforms = platforms
+        self.start = start
+        self.maximum = maximum
+        self.timeout_per_job = timeout_per_job
+        self._sizes = {}
+        self._lock = threading.Lock()
+    
+    def key(self, job):
+        """Jobs with the same key can share a batch (None = never batched)."""
+        if not is_batchable(job) or platform_of(job.url) not in self.platforms:
+            return None
+        return (platform_of(job.url), job.download_path,
+                json.dumps(job.options, sort_keys=True))
+    
+    def limit(self, key):
+        """Current batch size for a key's site."""
+        with self._lock:
+            return self._sizes.get(key[0], self.start)
+    
+    def sizes(self):
+        """Current batch size per site that has run a batch."""
+        with self._lock:
+            return dict(self._sizes)
+    
+    def _resize(self, platform, ran, throttled):
+        with self._lock:
+            size = self._sizes.get(platform, self.start)
+            if throttled:
+                new_size = max(1, size // 2)
+            elif ran >= size:
+                new_size = min(self.maximum, size + 1)
+            else:
+                # A partial batch says nothing about how much the site takes
+                new_size = size
+            self._sizes[platform] = new_size
+        if new_size != size:
+            print(f"Batch size for {platform}: {size} -> {new_size}")
+    
+    def run(self, jobs):
+        """
+        Archive a batch of jobs sharing one key.
+        
+        Sets each job's progress, files and error like execute_job() does.
+        
+        Returns:
+            dict: job_id -> True if the job succeeded
+        """
+        # A job cancelled while the batch was put together just drops out
+        jobs = [job for job in jobs if not job.cancel_event.is_set()]
+        if not jobs:
+            return {}
+        platform = platform_of(jobs[0].url)
+        download_path = Path(jobs[0].download_path)
+        download_path.mkdir(parents=True, exist_ok=True)
+        
+        batch_id = uuid.uuid4().hex[:12]
+        batch_file = download_path / f".tubearc-batch-{batch_id}.txt"
+        manifest_path = download_path / f".tubearc-batch-{batch_id}.files"
+        batch_file.write_text(''.join(f"{job.url}\n" for job in jobs), encoding='utf-8')
+        cmd = build_batch_command(batch_file, download_path, jobs[0].options, manifest_path)
+        print(f"Executing batch of {len(jobs)} {platform} job(s):", ' '.join(cmd))
+        
+        try:
+            run = self._stream(cmd, jobs, self.timeout_per_job * len(jobs))
+        finally:
+            try:
+                batch_file.unlink()
+            except OSError:
+                pass
+        files = self._read_manifest(manifest_path, jobs, run['aliases'])
+        
+        results = {}
+        for index, job in enumerate(jobs):
+            job.files = files.get(job.job_id, [])
+            if job.files and job.options.get('layout') == 'hash':
+                job.files = [str(place_in_shard(path)) for path in job.files]
+            output = ''.join(run['output'][job.job_id])
+            results[job.job_id] = bool(job.files)
+            if job.files or job.cancel_event.is_set():
+                continue
+            if run['stopped']:
+                # Another job was cancelled or paused - this one goes again
+                job.preempted = True
+            elif run['timed_out']:
+                job.error = "Archive timed out"
+            elif run['throttled'] and index > run['throttled_at']:
+                # Not reached, or cut off when the batch was stopped
+                job.error = run['throttled']
+            else:
+                job.error = output[-2000:] or "yt-dlp finished without archiving this clip"
+        
+        done = sum(results.values())
+        print(f"Batch {batch_id} finished: {done} of {len(jobs)} {platform} job(s) archived")
+        if not run['stopped']:
+            self._resize(platform, len(jobs), bool(run['throttled']))
+        return results
+    
+    def _stream(self, cmd, jobs, timeout):
+        """
+        Run a batch command, splitting its output between the jobs.
+        
+        Returns:
+            dict: 'output' (job_id -> lines), 'aliases' (job_id -> URLs
+                yt-dlp used for the job), 'throttled' (the throttling error,
+                if any), 'throttled_at' (index of the job it came from),
+                'stopped' (a job was cancelled) and 'timed_out'
+        """
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, text=True,
+                                   encoding='utf-8', errors='replace')
+        
+        stopped = threading.Event()
+        timed_out = threading.Event()
+        throttled = threading.Event()
+        finished = threading.Event()
+        deadline = time.monotonic() + timeout
+        
+        def _watch():
+            while not finished.wait(0.2):
+                if throttled.is_set():
+                    process.kill()
+                    return
+                if any(job.cancel_event.is_set() for job in jobs):
+                    stopped.set()
+                    process.kill()
+                    return
+                if time.monotonic() > deadline:
+                    timed_out.set()
+                    process.kill()
+                    return
+        
+        watchdog = threading.Thread(target=_watch, daemon=True)
+        watchdog.start()
+        
+        output = {job.job_id: [] for job in jobs}
+        aliases = {job.job_id: {job.url} for job in jobs}
+        current = 0
+        throttle_error = throttled_at = None
+        try:
+            for line in process.stdout:
+                match = _BATCH_ITEM_PATTERN.match(line)
+                if match:
+                    printed = match.group(1)
+                    for index in range(current + 1, len(jobs)):
+                        if _url_matches(printed, jobs[index].url):
+                            current = index
+                            break
+                    else:
+                        # A redirect or playlist inside the current clip
+                        aliases[jobs[current].job_id].add(printed)
+                job = jobs[current]
+                output[job.job_id].append(line)
+                progress = parse_progress(line)
+                if progress:
+                    job.progress = progress
+                if (throttle_error is None and line.startswith('ERROR')
+                        and classify_failure(line)[0] == FAILURE_THROTTLED):
+                    throttle_error, throttled_at = line, current
+                    throttled.set()
+            process.wait()
+        finally:
+            finished.set()
+            process.stdout.close()
+        
+        return {'output': output, 'aliases': aliases, 'throttled': throttle_error,
+                'throttled_at': throttled_at, 'stopped': stopped.is_set(),
+                'timed_out': timed_out.is_set()}
+    
+    @staticmethod
+    def _read_manifest(manifest_path, jobs, aliases):
+        """
+        Read and remove a batch manifest.
+        
+        Returns:
+            dict: job_id -> unique paths that exist on disk
+        """
+        try:
+            with manifest_path.open('r', encoding='utf-8') as f:
+                lines = [line.strip() for line in f if line.strip()]
+            manifest_path.unlink()
+        except OSError:
+            return {}
+        owners = {}
+        for job in jobs:
+            for url in aliases[job.job_id]:
+                owners.setdefault(url, job.job_id)
+        files = defaultdict(list)
+        for line in lines:
+            url, _, path = line.partition(' ')
+            job_id = owners.get(url)
+            if job_id and path not in files[job_id] and os.path.exists(path):
+                files[job_id].append(path)
+        return files
+
+
+def make_job_batcher(engine, config):
+    """
+    Build the JobBatcher for a queue from settings.
+    
+    Only yt-dlp.exe pays a process start per job; the other engines keep
+    yt-dlp loaded, so they don't batch.
+    
+    Returns:
+        JobBatcher, or None if batching is off or doesn't apply
+    """
+    if not config.get('batch_short_clips', True) or engine.name != SubprocessEngine.name:
+        return None
+    return JobBatcher(maximum=config.get('batch_size_max', BATCH_SIZE_MAX))
+
+
+# ============================================================================
+# HTTP API & SERVICE MODE
+# Kitsune takes requests from other dens too
+# ============================================================================
+
+def expand_playlist(url, limit=None):
+    """
+    List the video URLs of a playlist or channel without downloading anything.
+    
+    A URL that isn't a playlist comes back as a single-item list.
+    
+    Args:
+        url: Playlist, channel or video URL
+        limit: Optional maximum number of entries
+        
+    Returns:
+        list: Video page URLs in playlist order
+        
+    Raises:
+        RuntimeError: If yt-dlp can't read the playlist
+    """
+    yt_dlp = load_yt_dlp_module()
+    if yt_dlp is not None:
+        opts = {'extract_flat': 'in_playlist', 'quiet': True,
+                'logger': _OutputLogger(), 'playlistend': limit}
+        try:
+            with yt_dlp.YoutubeDL(opts) as ydl:
+                info = ydl.extract_info(url, download=False, process=True)
+        except yt_dlp.utils.DownloadError as e:
+            raise RuntimeError(str(e))
+        if not info.get('entries'):
+            return [info.get('webpage_url') or url]
+        return [entry.get('url') or entry.get('webpage_url')
+                for entry in info['entries'] if entry][:limit]
+    
+    cmd = [str(YT_DLP_PATH), url, "--flat-playlist", "--print", "%(webpage_url,url)s"]
+    if limit:
+        cmd.extend(["--playlist-end", str(limit)])
+    result = run_download_command(cmd, timeout=300)
+    if result.returncode != 0:
+        raise RuntimeError(result.stdout.strip().splitlines()[-1] if result.stdout.strip()
+                           else "yt-dlp failed")
+    return [line.strip() for line in result.stdout.splitlines()
+            if re.match(r'https?://', line.strip())]
+
+
+def make_job_runner(engine, config=None):
+    """
+    Build a JobQueue runner for running without the window (service mode).
+    
+    Args:
+        engine: Download engine from get_engine()
+        config: Settings (profile_jobs)
+        
+    Returns:
+        callable: Runner(job) -> bool
+    """
+    config = config or {}
+    
+    def run(job):
+        try:
+            result = execute_job(job, timeout=600, profile=profiling_enabled(config),
+                                 engine=engine)
+        except subprocess.TimeoutExpired:
+            job.error = "Archive timed out"
+            return False
+        except JobCancelled:
+            print(f"Job {job.job_id} {'paused' if job.preempted else 'cancelled'}")
+            return False
+        if result.returncode != 0:
+            job.error = (result.stderr or result.stdout)[-2000:]
+            print(f"Job {job.job_id} failed: {job.url}")
+            return False
+        print(f"Job {job.job_id} finished: {len(job.files)} file(s)")
+        return True
+    
+    return run
+
+
+class _APIHandler(BaseHTTPRequestHandler):
+    """
+    Routes for ArchiveAPIServer:
+    
+        GET    /status              queue counts and capacity
+        GET    /jobs                jobs submitted since the server started
+        POST   /jobs                {"url": ...} or {"urls": [...]}, + "options"
+        POST   /playlists           {"url": ..., "limit": n}, + "options"
+        GET    /jobs/<id>           one job
+        GET    /jobs/<id>/events    progress as newline-delimited JSON
+        DELETE /jobs/<id>           cancel
+    
+    POST bodies may set "priority" (interactive, normal or bulk; playlists
+    default to bulk). Jobs are shared fairly between clients, identified by
+    the X-TubeArc-Client header or else the client's address.
+    """
+    
+    protocol_version = "HTTP/1.1"
+    server_version = f"TubeArc/{TUBEARC_VERSION}"
+    
+    def log_message(self, format, *args):
+        print(f"API {self.address_string()} - {format % args}")
+    
+    @property
+    def api(self):
+        return self.server.api
+    
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _error(self, status, message, **extra):
+        # The request body may not have been read; don't reuse the connection
+        self.close_connection = True
+        self._send_json(status, dict(extra, error=message))
+    
+    def _authorized(self):
+        token = self.api.token
+        if not token:
+            return True
+        header = self.headers.get("Authorization", "")
+        if hmac.compare_digest(header.encode(), f"Bearer {token}".encode()):
+            return True
+        self._error(401, "missing or invalid API token")
+        return False
+    
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > API_MAX_BODY:
+            raise ValueError("request body too large")
+        data = json.loads(self.rfile.read(length) or b'{}')
+        if not isinstance(data, dict):
+            raise ValueError("request body must be a JSON object")
+        return data
+    
+    def _route(self):
+        return [part for part in urlsplit(self.path).path.split('/') if part]
+    
+    def _job_or_404(self, job_id):
+        job = self.api.queue.get(job_id)
+        if job is None:
+            self._error(404, f"unknown job {job_id}")
+        return job
+    
+    def do_GET(self):
+        if not self._authorized():
+            return
+        parts = self._route()
+        if parts == ['status']:
+            self._send_json(200, dict(self.api.queue.counts(), version=TUBEARC_VERSION))
+        elif parts == ['jobs']:
+            self._send_json(200, {'jobs': [job.status() for job in self.api.queue.jobs()]})
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = self._job_or_404(parts[1])
+            if job:
+                self._send_json(200, job.status())
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'events':
+            job = self._job_or_404(parts[1])
+            if job:
+                self._stream_events(job)
+        else:
+            self._error(404, "not found")
+    
+    def do_POST(self):
+        if not self._authorized():
+            return
+        parts = self._route()
+        if parts not in (['jobs'], ['playlists']):
+            self._error(404, "not found")
+            return
+        try:
+            data = self._read_json()
+            options = data.get('options') or {}
+            priority = data.get('priority',
+                                PRIORITY_BULK if parts == ['playlists'] else PRIORITY_NORMAL)
+            if parts == ['playlists']:
+                if not isinstance(data.get('url'), str):
+                    raise ValueError("'url' is required")
+                limit = data.get('limit')
+                if limit is not None and (not isinstance(limit, int) or limit < 1):
+                    raise ValueError("'limit' must be a positive integer")
+                urls = expand_playlist(data['url'], limit=limit)
+            elif 'urls' in data:
+                urls = data['urls']
+                if not isinstance(urls, list) or not urls:
+                    raise ValueError("'urls' must be a non-empty list")
+            else:
+                urls = [data.get('url')]
+            source = self.headers.get("X-TubeArc-Client") or self.client_address[0]
+            jobs = [self.api.make_job(url, options, priority, source=f"api:{source}")
+                    for url in urls]
+        except (ValueError, RuntimeError) as e:
+            self._error(400, str(e))
+            return
+        
+        try:
+            self.api.queue.submit_many(jobs)
+        except QueueFull as e:
+            self._error(429, f"queue is full ({e})",
+                        **self.api.queue.counts())
+            return
+        
+        if parts == ['jobs'] and 'urls' not in data:
+            self._send_json(201, jobs[0].status())
+        else:
+            self._send_json(201, {'jobs': [job.status() for job in jobs]})
+    
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        parts = self._route()
+        if len(parts) != 2 or parts[0] != 'jobs':
+            self._error(404, "not found")
+            return
+        job = self.api.queue.cancel(parts[1])
+        if job is None:
+            self._error(404, f"unknown job {parts[1]}")
+        elif job.state in (JOB_FINISHED, JOB_FAILED):
+            self._error(409, f"job already {job.state}", job=job.status())
+        else:
+            self._send_json(200, job.status())
+    
+    def _stream_events(self, job):
+        """Send the job's status whenever it changes, until it is done."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        
+        last, last_sent = None, 0.0
+        try:
+            while True:
+                status = job.status()
+                snapshot = (status['state'], json.dumps(status['progress'], sort_keys=True))
+                now = time.monotonic()
+                if snapshot != last or now - last_sent >= API_EVENT_HEARTBEAT:
+                    self.wfile.write(json.dumps(status).encode('utf-8') + b"\n")
+                    self.wfile.flush()
+                    last, last_sent = snapshot, now
+                if status['state'] not in JOB_PENDING_STATES:
+                    return
+                time.sleep(API_EVENT_INTERVAL)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class ArchiveAPIServer:
+    """
+    Local HTTP/JSON API in front of a JobQueue.
+    
+    Jobs submitted over HTTP go into the same queue as the ones from the
+    window, so they share its workers, its journal and its capacity. A full
+    queue answers 429 instead of growing without bound.
+    
+    Args:
+        queue: JobQueue to submit to
+        host: Interface to listen on (default: localhost only)
+        port: TCP port (0 = any free port)
+        token: Require "Authorization: Bearer <token>" if set
+        download_path: Where API jobs are archived
+        options: Default archive options, overridden per request
+    """
+    
+    def __init__(self, queue, host=API_DEFAULT_HOST, port=API_DEFAULT_PORT, token=None,
+                 download_path=None, options=None):
+        self.queue = queue
+        self.token = token
+        self.download_path = str(download_path or DOWNLOAD_FOLDER)
+        self.options = dict(DEFAULT_DOWNLOAD_OPTIONS, **(options or {}))
+        self._httpd = ThreadingHTTPServer((host, port), _APIHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.api = self
+        self._thread = None
+    
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def make_job(self, url, options, priority=PRIORITY_NORMAL, source='api'):
+        """
+        Validate a request and turn it into an ArchiveJob.
+        
+        Raises:
+            ValueError: If the URL, options or priority are invalid
+        """
+        if not isinstance(url, str) or not re.match(r'https?://', url):
+            raise ValueError(f"invalid URL: {url!r}")
+        if priority not in JOB_PRIORITIES:
+            raise ValueError(f"'priority' must be one of: {', '.join(JOB_PRIORITIES)}")
+        if not isinstance(options, dict):
+            raise ValueError("'options' must be an object")
+        unknown = set(options) - set(DEFAULT_DOWNLOAD_OPTIONS)
+        if unknown:
+            raise ValueError(f"unknown options: {', '.join(sorted(unknown))}")
+        if options.get('layout', 'flat') not in OUTPUT_LAYOUTS:
+            raise ValueError(f"unknown layout: {options['layout']}")
+        if options.get('quality', 'best') not in QUALITY_POLICIES:
+            raise ValueError(f"unknown quality: {options['quality']}")
+        for key, value in options.items():
+            if key not in ('layout', 'quality') and not isinstance(value, bool):
+                raise ValueError(f"option '{key}' must be true or false")
+        return ArchiveJob(url, self.download_path, dict(self.options, **options),
+                          priority=priority, source=source)
+    
+    def start(self):
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"Archive API listening on {self.url}")
+        return self
+    
+    def serve_forever(self):
+        """Serve on the calling thread until stop() or Ctrl+C."""
+        print(f"Archive API listening on {self.url}")
+        self._httpd.serve_forever()
+    
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+# ============================================================================
+# SUBSCRIPTIONS
+# Kitsune checks the usual trails for fresh tracks
+# ============================================================================
+
+def platform_of(url):
+    """Site a URL belongs to, for rate limiting: youtube, tiktok, instagram or its host."""
+    host = (urlsplit(url).hostname or '').lower()
+    if host == 'youtu.be' or host == 'youtube.com' or host.endswith('.youtube.com'):
+        return 'youtube'
+    for platform in ('tiktok', 'instagram'):
+        if host == f"{platform}.com" or host.endswith(f".{platform}.com"):
+            return platform
+    return host[4:] if host.startswith('www.') else host
+
+
+def _is_known(entry, seen_ids, last_upload):
+    if entry['id'] in seen_ids:
+        return True
+    # Flat listings rarely carry dates, but when they do an older upload
+    # means we've gone past the mark even if its ID was forgotten
+    return bool(last_upload and entry['upload_date'] and entry['upload_date'] < last_upload)
+
+
+def list_new_entries(url, seen_ids=(), last_upload=None, limit=SUBSCRIPTION_MAX_NEW,
+                     skip_ids=()):
+    """
+    List a channel's or playlist's uploads, newest first, down to the
+    high-water mark.
+    
+    Entries are read lazily, page by page, and listing stops at the first
+    one that is already known - an up-to-date channel costs one page, not
+    its whole history.
+    
+    Args:
+        url: Channel, tab or playlist URL (newest-first listings)
+        seen_ids: IDs already archived or skipped
+        last_upload: Newest known upload date (YYYYMMDD), if any
+        limit: Stop after this many new entries
+        skip_ids: IDs above the mark that were already queued - passed
+            over, not stopped at
+        
+    Returns:
+        list: Dicts with id, url and upload_date (None if unknown)
+        
+    Raises:
+        RuntimeError: If yt-dlp can't read the listing
+    """
+    seen_ids = set(seen_ids)
+    skip_ids = set(skip_ids)
+    entries = []
+    yt_dlp = load_yt_dlp_module()
+    if yt_dlp is not None:
+        opts = {'extract_flat': 'in_playlist', 'lazy_playlist': True, 'quiet': True,
+                'logger': _OutputLogger()}
+        try:
+            with yt_dlp.YoutubeDL(opts) as ydl:
+                info = ydl.extract_info(url, download=False, process=False)
+                # A channel's home page redirects to its uploads tab
+                for _ in range(3):
+                    if not info or info.get('_type') not in ('url', 'url_transparent'):
+                        break
+                    info = ydl.extract_info(info['url'], download=False, process=False,
+                                            ie_key=info.get('ie_key'))
+                for item in (info or {}).get('entries') or []:
+                    if not item or not item.get('id'):
+                        continue
+                    entry = {'id': str(item['id']),
+                             'url': item.get('url') or item.get('webpage_url'),
+                             'upload_date': item.get('upload_date')}
+                    if entry['id'] in skip_ids:
+                        continue
+                    if _is_known(entry, seen_ids, last_upload) or len(entries) >= limit:
+                        break
+                    entries.append(entry)
+        except yt_dlp.utils.DownloadError as e:
+            raise RuntimeError(str(e))
+        return [entry for entry in entries if entry['url']]
+    
+    cmd = [str(YT_DLP_PATH), url, "--flat-playlist", "--lazy-playlist",
+           "--print", "%(id)s\t%(upload_date)s\t%(webpage_url,url)s"]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               text=True, encoding='utf-8', errors='replace')
+    output = []
+    try:
+        for line in process.stdout:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) != 3 or not re.match(r'https?://', fields[2]):
+                output.append(line)
+                continue
+            entry = {'id': fields[0], 'url': fields[2],
+                     'upload_date': fields[1] if fields[1].isdigit() else None}
+            if entry['id'] in skip_ids:
+                continue
+            if _is_known(entry, seen_ids, last_upload) or len(entries) >= limit:
+                # Stop before yt-dlp asks for the next page
+                process.kill()
+                return entries
+            entries.append(entry)
+        process.wait(timeout=30)
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+    if process.returncode != 0 and not entries:
+        raise RuntimeError(output[-1].strip() if output else "yt-dlp failed")
+    return entries
+
+
+def new_subscription(url, download_path, options=None, interval_hours=None, backfill=0):
+    """
+    Build a subscription record (save it with StateStore.save_subscription).
+    
+    Its first sync is placed at a fixed point in the interval derived from
+    the URL, so a few hundred channels end up spread evenly across the day
+    instead of all syncing at once.
+    
+    Args:
+        url: Channel or playlist URL
+        download_path: Where its uploads are archived
+        options: Archive options for its jobs
+        interval_hours: Hours between syncs
+        backfill: Newest existing uploads to archive on the first sync
+            (the rest are only marked as seen)
+    """
+    interval_hours = interval_hours or SUBSCRIPTION_INTERVAL_HOURS
+    interval = interval_hours * 3600
+    phase = int(hashlib.sha1(url.encode('utf-8')).hexdigest(), 16) % int(interval)
+    now = time.time()
+    return {
+        'url': url,
+        'platform': platform_of(url),
+        'download_path': str(download_path),
+        'options': dict(DEFAULT_DOWNLOAD_OPTIONS, **(options or {})),
+        'interval_hours': interval_hours,
+        'backfill': backfill,
+        'seen_ids': [],
+        'last_upload': None,
+        'pending_ids': [],
+        'pending_upload': None,
+        'last_sync': None,
+        'next_sync': now + (phase - now) % interval,
+        'last_error': None,
+    }
+
+
+def sync_subscription(sub, queue, store=None):
+    """
+    Queue a subscription's new uploads and move its high-water mark.
+    
+    The jobs are submitted (and journaled) before the mark moves, so a crash
+    in between at worst lists the same uploads again.
+    
+    A sync lists at most SUBSCRIPTION_MAX_NEW uploads. If more arrived since
+    the last one, the mark stays where it is: the queued IDs are kept as
+    pending_ids, the next sync (due right away) passes over them and queues
+    the next-older uploads, and the mark only moves once a listing reaches
+    it - so nothing between the old mark and the newest upload is lost.
+    
+    Args:
+        sub: Subscription dict from StateStore.subscriptions()
+        queue: JobQueue the new uploads are archived by (as bulk jobs)
+        store: StateStore (defaults to the process-wide store)
+        
+    Returns:
+        list: The submitted ArchiveJobs
+        
+    Raises:
+        RuntimeError: If the listing failed
+        QueueFull: If the queue has no room - the mark isn't moved
+    """
+    store = store or get_state_store()
+    first_sync = sub['last_sync'] is None
+    pending_ids = sub.get('pending_ids') or []
+    if first_sync:
+        limit = max(sub['backfill'], SUBSCRIPTION_SEEN_IDS)
+    else:
+        # One extra entry tells a full listing from one that was cut short
+        limit = SUBSCRIPTION_MAX_NEW + 1
+    entries = list_new_entries(sub['url'], sub['seen_ids'], sub['last_upload'], limit=limit,
+                               skip_ids=pending_ids)
+    truncated = not first_sync and len(entries) > SUBSCRIPTION_MAX_NEW
+    if truncated:
+        entries = entries[:SUBSCRIPTION_MAX_NEW]
+    
+    wanted = entries[:sub['backfill']] if first_sync else entries
+    jobs = [ArchiveJob(entry['url'], sub['download_path'], sub['options'],
+                       priority=PRIORITY_BULK, source=f"subscription:{sub['url']}")
+            for entry in reversed(wanted)]  # oldest first
+    if jobs:
+        queue.submit_many(jobs)
+    
+    # Newest first: uploads queued by earlier catch-up syncs, then these
+    listed_ids = pending_ids + [entry['id'] for entry in entries]
+    dates = [entry['upload_date'] for entry in entries if entry['upload_date']]
+    if sub.get('pending_upload'):
+        dates.append(sub['pending_upload'])
+    sub['last_error'] = None
+    sub['last_sync'] = time.time()
+    if truncated:
+        # Keep the mark; come back for the older uploads at the next pass
+        sub['pending_ids'] = listed_ids
+        sub['pending_upload'] = max(dates) if dates else None
+        sub['next_sync'] = sub['last_sync']
+        print(f"Subscription {sub['url']}: more than {SUBSCRIPTION_MAX_NEW} new uploads, "
+              f"{len(listed_ids)} queued so far - continuing with older ones")
+    else:
+        sub['seen_ids'] = list(dict.fromkeys(listed_ids + sub['seen_ids']))[:SUBSCRIPTION_SEEN_IDS]
+        if sub['last_upload']:
+            dates.append(sub['last_upload'])
+        sub['last_upload'] = max(dates) if dates else None
+        sub['pending_ids'], sub['pending_upload'] = [], None
+        interval = sub['interval_hours'] * 3600
+        while sub['next_sync'] <= sub['last_sync']:
+            sub['next_sync'] += interval
+    store.save_subscription(sub)
+    return jobs
+
+
+class PlatformPacer:
+    """
+    Keeps requests to the same platform a minimum time apart.
+    
+    Args:
+        spacing: {platform: seconds}; other platforms use default
+        default: Seconds between requests to an unlisted platform
+    """
+    
+    def __init__(self, spacing=None, default=DEFAULT_LISTING_SPACING):
+        self.spacing = dict(PLATFORM_LISTING_SPACING, **(spacing or {}))
+        self.default = default
+        self._next = {}
+        self._lock = threading.Lock()
+    
+    def wait_time(self, platform):
+        """Seconds until the platform may be contacted again."""
+        with self._lock:
+            return max(0.0, self._next.get(platform, 0.0) - time.monotonic())
+    
+    def claim(self, platform):
+        """Record a request to the platform now."""
+        with self._lock:
+            self._next[platform] = time.monotonic() + self.spacing.get(platform, self.default)
+    
+    def back_off(self, platform, seconds):
+        """Leave the platform alone for a while (e.g. after being throttled)."""
+        with self._lock:
+            self._next[platform] = max(self._next.get(platform, 0.0),
+                                       time.monotonic() + seconds)
+
+
+def sync_due_subscriptions(queue, pacer, store=None, everything=False, stop_event=None):
+    """
+    Sync every subscription whose time has come, pacing each platform.
+    
+    A failed listing is retried after SUBSCRIPTION_ERROR_RETRY; a throttled
+    one also keeps its platform quiet for a while. The pass stops while the
+    queue is full, so nothing is listed that couldn't be queued.
+    
+    Args:
+        queue: JobQueue for the new uploads
+        pacer: PlatformPacer shared by every sync
+        store: StateStore (defaults to the process-wide store)
+        everything: Sync all subscriptions, due or not
+        stop_event: Optional threading.Event that ends the pass early
+        
+    Returns:
+        int: Number of jobs queued
+    """
+    store = store or get_state_store()
+    queued = 0
+    for sub in store.subscriptions():
+        if stop_event is not None and stop_event.is_set():
+            break
+        if not everything and sub['next_sync'] > time.time():
+            break  # sorted by next_sync, so nothing after this is due either
+        counts = queue.counts()
+        if counts['capacity'] and \
+                counts['queued'] + counts['held'] + counts['retrying'] >= counts['capacity']:
+            break
+        delay = pacer.wait_time(sub['platform'])
+        if delay:
+            if stop_event is not None:
+                if stop_event.wait(delay):
+                    break
+            else:
+                time.sleep(delay)
+        pacer.claim(sub['platform'])
+        try:
+            jobs = sync_subscription(sub, queue, store)
+        except (RuntimeError, QueueFull) as e:
+            if isinstance(e, QueueFull):
+                failure = "queue full"
+            else:
+                failure, _ = classify_failure(str(e))
+            if failure == FAILURE_THROTTLED:
+                pacer.back_off(sub['platform'], RETRY_BACKOFF[FAILURE_THROTTLED][0])
+            sub['last_error'] = str(e)[-500:]
+            sub['next_sync'] = time.time() + SUBSCRIPTION_ERROR_RETRY
+            store.save_subscription(sub)
+            print(f"Subscription {sub['url']} failed ({failure}): {_first_line(str(e))}")
+            continue
+        if jobs:
+            print(f"Subscription {sub['url']}: {len(jobs)} new upload(s) queued")
+        queued += len(jobs)
+    return queued
+
+
+class SubscriptionScheduler:
+    """
+    Background thread that keeps subscriptions synced (service mode).
+    
+    Each subscription's syncs stay at their own point in the day (see
+    new_subscription), and PlatformPacer spaces out listings on the same
+    platform, so a few hundred channels never hit a site in one burst.
+    
+    Args:
+        queue: JobQueue for the new uploads
+        store: StateStore (defaults to the process-wide store)
+    """
+    
+    def __init__(self, queue, store=None):
+        self.queue = queue
+        self.store = store or get_state_store()
+        self.pacer = PlatformPacer()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sync_due_subscriptions(self.queue, self.pacer, self.store, stop_event=self._stop)
+                subs = self.store.subscriptions()
+            except sqlite3.Error as e:
+                print(f"Subscription sync error: {e}")
+                subs = []
+            # Wake for the next due sync, and at least once a minute to
+            # notice subscriptions added from the command line
+            wait = min([sub['next_sync'] - time.time() for sub in subs] + [60])
+            self._stop.wait(max(wait, 5))
+
+
+# ============================================================================
+# DUPLICATE DETECTION
+# Kitsune recognizes the same prey under any disguise
+# ============================================================================
+
+# Bytes read from each end of a file for the cheap first-pass hash
+PARTIAL_HASH_BYTES = 64 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _partial_hash(path, size):
+    """Hash the first and last PARTIAL_HASH_BYTES of a file."""
+    digest = hashlib.blake2b(str(size).encode(), digest_size=20)
+    with open(path, 'rb') as f:
+        digest.update(f.read(PARTIAL_HASH_BYTES))
+        if size > 2 * PARTIAL_HASH_BYTES:
+            f.seek(-PARTIAL_HASH_BYTES, os.SEEK_END)
+            digest.update(f.read(PARTIAL_HASH_BYTES))
+    return digest.hexdigest()
+
+
+def _full_hash(path):
+    """Hash the whole file (hashlib releases the GIL, so threads scale)."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DedupScanner:
+    """
+    Find identical files across one or more archive trees.
+    
+    Files are narrowed down in stages so most are never read at all:
+    grouped by size, then by a hash of their first and last 64 KiB, and
+    only files that still collide get a full hash. Hashes are cached by
+    path, size and mtime, so re-runs only read new or changed files.
+    
+    Args:
+        roots: Directories to scan
+        cache_path: JSON file holding cached hashes
+        workers: Hashing threads (defaults to a small multiple of the CPUs)
+        min_size: Ignore files smaller than this many bytes
+    """
+    
+    def __init__(self, roots, cache_path=DEDUP_CACHE_PATH, workers=None, min_size=1):
+        self.roots = [Path(root) for root in roots]
+        self.cache_path = Path(cache_path)
+        self.workers = workers or min(32, (os.cpu_count() or 1) * 2)
+        self.min_size = min_size
+        self._cache = {}
+        self._files = {}
+        self.stats = {'files': 0, 'partial_hashed': 0, 'full_hashed': 0, 'cache_hits': 0}
+    
+    def _load_cache(self):
+        try:
+            with self.cache_path.open('r') as f:
+                self._cache = json.load(f)
+        except (OSError, ValueError):
+            self._cache = {}
+    
+    def _save_cache(self):
+        """Write the cache back, keeping only files seen in this scan."""
+        seen = {key: self._cache[key] for key in self._files if key in self._cache}
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        try:
+            with tmp_path.open('w') as f:
+                json.dump(seen, f)
+            os.replace(str(tmp_path), str(self.cache_path))
+        except OSError as e:
+            print(f"Failed to save dedup cache: {e}")
+    
+    def _walk(self):
+        """Collect regular files, keyed by path, with their stat results."""
+        for root in self.roots:
+            for dirpath, _, filenames in os.walk(root):
+                for name in filenames:
+                    if name.endswith(('.part', '.ytdl', '.tubearc-link')):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.lstat(path)
+                    except OSError:
+                        continue
+                    if not os.path.isfile(path) or os.path.islink(path):
+                        continue
+                    if st.st_size >= self.min_size:
+                        self._files[os.path.abspath(path)] = st
+    
+    def _cached(self, path, kind, func):
+        """Return a cached hash if size and mtime still match, else compute it."""
+        st = self._files[path]
+        entry = self._cache.get(path)
+        if (entry and entry.get('size') == st.st_size
+                and entry.get('mtime_ns') == st.st_mtime_ns and kind in entry):
+            self.stats['cache_hits'] += 1
+            return entry[kind]
+        
+        value = func(path, st.st_size) if kind == 'partial' else func(path)
+        if not entry or entry.get('size') != st.st_size or entry.get('mtime_ns') != st.st_mtime_ns:
+            entry = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+            self._cache[path] = entry
+        entry[kind] = value
+        self.stats['partial_hashed' if kind == 'partial' else 'full_hashed'] += 1
+        return value
+    
+    def _refine(self, groups, kind, func):
+        """Split each candidate group by a hash computed in parallel."""
+        candidates = [path for group in groups for path in group]
+        refined = defaultdict(list)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            hashes = pool.map(lambda p: self._safe_hash(p, kind, func), candidates)
+            for path, value in zip(candidates, hashes):
+                if value is not None:
+                    refined[(self._files[path].st_size, value)].append(path)
+        return [group for group in refined.values() if len(group) > 1]
+    
+    def _safe_hash(self, path, kind, func):
+        try:
+            return self._cached(path, kind, func)
+        except OSError as e:
+            print(f"  Skipping unreadable file {path}: {e}")
+            return None
+    
+    def scan(self):
+        """
+        Scan the roots for duplicate files.
+        
+        Returns:
+            list: Groups (lists of path strings) of files with identical content
+        """
+        self._load_cache()
+        self._walk()
+        self.stats['files'] = len(self._files)
+        
+        # Stage 1: size. Paths sharing an inode are already linked - keep one.
+        by_size = defaultdict(dict)
+        for path, st in self._files.items():
+            by_size[st.st_size].setdefault((st.st_dev, st.st_ino), path)
+        groups = [list(inodes.values()) for inodes in by_size.values() if len(inodes) > 1]
+        
+        # Stage 2 and 3: partial hash, then full hash for what still collides
+        groups = self._refine(groups, 'partial', _partial_hash)
+        groups = self._refine(groups, 'full', lambda path: _full_hash(path))
+        
+        self._save_cache()
+        return [sorted(group) for group in groups]
+    
+    def link_duplicates(self, groups, dry_run=False):
+        """
+        Replace duplicates with hardlinks to one kept copy.
+        
+        The oldest file in each group is kept. Each duplicate is swapped out
+        atomically (link to a temp name, then rename over it), so an
+        interruption never leaves a missing file. Files on a different
+        volume than the kept copy can't be hardlinked and are left alone,
+        as are files that changed since the scan (their hashes are stale).
+        
+        Args:
+            groups: Output of scan()
+            dry_run: Only report what would be linked
+            
+        Returns:
+            tuple: (files linked, bytes reclaimed) - a duplicate with other
+                hardlinks of its own frees nothing when it's replaced
+        """
+        linked = 0
+        reclaimed = 0
+        for group in groups:
+            keep = min(group, key=lambda path: (self._files[path].st_mtime_ns, path))
+            keep_st = self._current_stat(keep)
+            if keep_st is None:
+                print(f"  Skipping group of {keep} (changed since the scan)")
+                continue
+            for path in group:
+                if path == keep:
+                    continue
+                st = self._current_stat(path)
+                if st is None:
+                    print(f"  Skipping {path} (changed since the scan)")
+                    continue
+                if st.st_dev != keep_st.st_dev:
+                    print(f"  Skipping {path} (different volume than {keep})")
+                    continue
+                if st.st_ino == keep_st.st_ino:
+                    continue
+                print(f"  {'Would link' if dry_run else 'Linking'} {path} -> {keep}")
+                if not dry_run:
+                    tmp_path = path + '.tubearc-link'
+                    try:
+                        os.link(keep, tmp_path)
+                        os.replace(tmp_path, path)
+                    except OSError as e:
+                        print(f"  Failed to link {path}: {e}")
+                        if os.path.exists(tmp_path):
+                            os.unlink(tmp_path)
+                        continue
+                linked += 1
+                if st.st_nlink == 1:
+                    reclaimed += st.st_size
+        return linked, reclaimed
+    
+    def _current_stat(self, path):
+        """Stat a scanned file again; None if it's gone or changed since the scan."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        scanned = self._files[path]
+        if (st.st_size, st.st_mtime_ns) != (scanned.st_size, scanned.st_mtime_ns):
+            return None
+        return st
+
+
+# ============================================================================
+# ARCHIVE VERIFICATION
+# Kitsune counts her treasures and checks none have crumbled
+# ============================================================================
+
+# Files checked at once on each volume - reading is the bottleneck, and more
+# readers than this just make a spinning disk seek back and forth
+VERIFY_PER_VOLUME = 2
+
+# Probed and catalogued durations may differ by this many seconds (or 1%,
+# whichever is more) before a file counts as truncated
+VERIFY_DURATION_TOLERANCE = 2.0
+
+# A deep check decodes this many evenly spaced segments (the last one ends
+# at the end of the file) of this many seconds each
+VERIFY_SAMPLE_SEGMENTS = 5
+VERIFY_SAMPLE_SECONDS = 2
+
+# Longest a single ffprobe or ffmpeg run may take
+VERIFY_TIMEOUT = 120
+
+
+def _media_tool(path, name):
+    """Return the bundled tool if it exists, else the one on PATH (or None)."""
+    if Path(path).exists():
+        return str(path)
+    return shutil.which(name)
+
+
+def _expected_duration(path):
+    """Duration (seconds) recorded in a media file's .info.json, or None."""
+    info_path = os.path.splitext(path)[0] + '.info.json'
+    try:
+        with open(info_path, 'r', encoding='utf-8') as f:
+            duration = json.load(f).get('duration')
+    except (OSError, ValueError):
+        return None
+    if isinstance(duration, (int, float)) and duration > 0:
+        return float(duration)
+    return None
+
+
+def _sample_starts(duration):
+    """Start times of the segments a deep check decodes."""
+    if not duration or VERIFY_SAMPLE_SEGMENTS < 2:
+        return [0.0]
+    span = max(0.0, duration - VERIFY_SAMPLE_SECONDS)
+    count = VERIFY_SAMPLE_SEGMENTS - 1
+    return sorted({round(span * i / count, 3) for i in range(count + 1)})
+
+
+def _run_media_tool(cmd):
+    return subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8',
+                          errors='replace', timeout=VERIFY_TIMEOUT)
+
+
+def _first_line(text):
+    lines = (text or '').strip().splitlines()
+    return lines[0] if lines else "no details"
+
+
+def check_media_file(path, ffprobe, ffmpeg=None):
+    """
+    Check one media file for damage.
+    
+    ffprobe must be able to read the container without errors and find an
+    audio or video stream, and the duration must match the one in the
+    file's .info.json (if there is one). With ffmpeg, sampled segments are
+    also decoded, which catches corrupt data a container check can't see.
+    
+    Args:
+        path: Media file
+        ffprobe: ffprobe executable
+        ffmpeg: ffmpeg executable for a deep check (None = container only)
+        
+    Returns:
+        str: What is wrong with the file, or None if it looks fine
+    """
+    try:
+        result = _run_media_tool([ffprobe, "-v", "error", "-show_entries",
+                                  "format=duration:stream=codec_type", "-of", "json", path])
+    except subprocess.TimeoutExpired:
+        return "ffprobe timed out"
+    if result.returncode != 0:
+        return f"unreadable: {_first_line(result.stderr)}"
+    try:
+        probe = json.loads(result.stdout)
+    except ValueError:
+        return "ffprobe returned no data"
+    if not any(stream.get('codec_type') in ('video', 'audio')
+               for stream in probe.get('streams', [])):
+        return "no audio or video streams"
+    if result.stderr.strip():
+        return f"container errors: {_first_line(result.stderr)}"
+    
+    try:
+        duration = float(probe.get('format', {}).get('duration'))
+    except (TypeError, ValueError):
+        duration = None
+    expected = _expected_duration(path)
+    if expected:
+        if duration is None:
+            return f"no duration (expected {expected:.1f}s)"
+        if abs(duration - expected) > max(VERIFY_DURATION_TOLERANCE, expected * 0.01):
+            return f"duration {duration:.1f}s, expected {expected:.1f}s"
+    
+    if ffmpeg:
+        for start in _sample_starts(duration):
+            try:
+                result = _run_media_tool([ffmpeg, "-nostdin", "-v", "error",
+                                          "-ss", f"{start:.3f}", "-i", path,
+                                          "-t", str(VERIFY_SAMPLE_SECONDS), "-f", "null", "-"])
+            except subprocess.TimeoutExpired:
+                return f"decoding timed out at {start:.0f}s"
+            if result.returncode != 0 or result.stderr.strip():
+                return f"decode error at {start:.0f}s: {_first_line(result.stderr)}"
+    return None
+
+
+class ArchiveVerifier:
+    """
+    Check every media file in one or more archive trees for damage.
+    
+    Results are stored in the state store by path, size and mtime, so a
+    nightly run only checks files that are new or changed (or, for a deep
+    run, that have only had a quick check). Files are checked in parallel,
+    but only per_volume at a time on each volume, so a big tree on one slow
+    disk isn't read by dozens of competing threads.
+    
+    Args:
+        roots: Directories to check
+        deep: Also decode sampled segments with ffmpeg
+        per_volume: Files checked at once on each volume
+        recheck: Ignore earlier results and check everything
+        store: StateStore to keep results in (defaults to the process-wide store)
+    """
+    
+    def __init__(self, roots, deep=False, per_volume=VERIFY_PER_VOLUME, recheck=False,
+                 store=None):
+        self.roots = [Path(root) for root in roots]
+        self.deep = deep
+        self.per_volume = max(1, per_volume)
+        self.recheck = recheck
+        self.store = store or get_state_store()
+        self.ffprobe = _media_tool(FFPROBE_PATH, 'ffprobe')
+        self.ffmpeg = _media_tool(FFMPEG_PATH, 'ffmpeg') if deep else None
+        self.stats = {'files': 0, 'checked': 0, 'unchanged': 0, 'problems': 0}
+    
+    def _walk(self):
+        """Collect media files, keyed by absolute path, with their stat results."""
+        files = {}
+        for root in self.roots:
+            for dirpath, _, filenames in os.walk(root):
+                for name in filenames:
+                    if os.path.splitext(name)[1].lower() not in MEDIA_EXTENSIONS:
+                        continue
+                    path = os.path.abspath(os.path.join(dirpath, name))
+                    try:
+                        files[path] = os.stat(path)
+                    except OSError:
+                        continue
+        return files
+    
+    def _is_current(self, entry, st):
+        return (entry is not None and entry['size'] == st.st_size
+                and entry['mtime_ns'] == st.st_mtime_ns and (entry['deep'] or not self.deep))
+    
+    def verify(self, on_result=None):
+        """
+        Check every new or changed media file under the roots.
+        
+        Args:
+            on_result: Optional callable(path, problem) called as each file
+                is checked (problem is None if it passed)
+            
+        Returns:
+            dict: Path -> problem for every damaged file, including ones
+                found by earlier runs that haven't changed since
+                
+        Raises:
+            RuntimeError: If ffprobe (or ffmpeg, for a deep check) is missing
+        """
+        if not self.ffprobe:
+            raise RuntimeError("ffprobe not found - delete bin/ffmpeg.exe and restart "
+                               "TubeArc to download FFmpeg again, or put ffprobe on PATH")
+        if self.deep and not self.ffmpeg:
+            raise RuntimeError("ffmpeg not found - start TubeArc once to download it")
+        
+        files = self._walk()
+        known = self.store.verification_results()
+        prefixes = tuple(os.path.join(str(root.absolute()), '') for root in self.roots)
+        self.store.forget_verifications(
+            [path for path in known if path.startswith(prefixes) and path not in files])
+        
+        problems = {}
+        by_volume = defaultdict(list)
+        for path, st in files.items():
+            entry = known.get(path)
+            if not self.recheck and self._is_current(entry, st):
+                self.stats['unchanged'] += 1
+                if entry['problem']:
+                    problems[path] = entry['problem']
+            else:
+                by_volume[st.st_dev].append(path)
+        
+        pools = [ThreadPoolExecutor(max_workers=self.per_volume) for _ in by_volume]
+        futures = {}
+        batch = []
+        try:
+            for pool, paths in zip(pools, by_volume.values()):
+                for path in paths:
+                    futures[pool.submit(check_media_file, path, self.ffprobe, self.ffmpeg)] = path
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    problem = future.result()
+                except OSError as e:
+                    problem = f"could not be checked: {e}"
+                st = files[path]
+                batch.append((path, st.st_size, st.st_mtime_ns, self.deep, problem))
+                self.stats['checked'] += 1
+                if problem:
+                    problems[path] = problem
+                if on_result:
+                    on_result(path, problem)
+                # Save as we go, so an interrupted run isn't wasted
+                if len(batch) >= 100:
+                    self.store.record_verifications(batch)
+                    batch = []
+        finally:
+            for future in futures:
+                future.cancel()
+            for pool in pools:
+                pool.shutdown(wait=False)
+            self.store.record_verifications(batch)
+        
+        self.stats['files'] = len(files)
+        self.stats['problems'] = len(problems)
+        return problems
+
+
+# ============================================================================
+# BATCH TRANSCODING
+# Kitsune reshapes the whole hoard without fetching it again
+# ============================================================================
+
+# Each profile: output extension, which files it converts, the ffmpeg
+# output options, and how many threads one ffmpeg run keeps busy (the pool
+# runs cores // threads of them at once)
+TRANSCODE_PROFILES = {
+    'mp3': {
+        'description': "Audio-only MP3 library (same as the Audio only option)",
+        'extension': '.mp3',
+        'inputs': MEDIA_EXTENSIONS - {'.mp3'},
+        'args': ["-map", "0:a:0", "-c:a", "libmp3lame", "-q:a", "2"],
+        'threads': 1,
+    },
+    'mobile': {
+        'description': "720p H.264/AAC MP4 for phones and tablets",
+        'extension': '.mp4',
+        'inputs': {'.mp4', '.mkv', '.webm', '.mov', '.avi', '.flv', '.m4v'},
+        'args': ["-map", "0:v:0", "-map", "0:a:0?", "-vf", "scale=-2:'min(720,ih)'",
+                 "-c:v", "libx264", "-preset", "veryfast", "-crf", "26",
+                 "-c:a", "aac", "-b:a", "128k", "-movflags", "+faststart"],
+        'threads': 4,
+    },
+}
+
+
+def transcode_file(source, target, profile, ffmpeg):
+    """
+    Convert one file with a transcode profile.
+    
+    ffmpeg writes to a temporary name next to the target, which is renamed
+    into place only once it's complete - an interrupted run never leaves a
+    truncated file that looks up to date.
+    
+    Args:
+        source: Input media file
+        target: Output file
+        profile: Entry of TRANSCODE_PROFILES
+        ffmpeg: ffmpeg executable
+        
+    Raises:
+        RuntimeError: If ffmpeg fails
+    """
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = target.with_name(target.stem + '.transcoding' + target.suffix)
+    cmd = [ffmpeg, "-nostdin", "-v", "error", "-y", "-i", str(source),
+           *profile['args'], "-threads", str(profile['threads']), str(temp_path)]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8',
+                                errors='replace')
+        if result.returncode != 0:
+            raise RuntimeError(_first_line(result.stderr))
+        os.replace(temp_path, target)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+
+class BatchTranscoder:
+    """
+    Convert every matching file in an archive tree with one profile.
+    
+    The output mirrors the source tree. Sources that would share an output
+    name (clip.webm and clip.m4a with an MP3 profile) keep their extension in
+    it instead - clip.webm.mp3 and clip.m4a.mp3 - so no two conversions
+    write the same file. A file is skipped when its output already exists
+    and is newer than the source, so re-running after an interruption (or
+    after new downloads) only converts what's missing.
+    ffmpeg runs in a pool sized to the CPU: profiles whose encoder is
+    multithreaded get fewer, wider processes.
+    
+    Args:
+        root: Archive directory to convert
+        profile: Name of a TRANSCODE_PROFILES entry
+        output: Directory for the converted tree (default: "<root>-<profile>")
+        workers: ffmpeg processes at once (default: cores // profile threads)
+    """
+    
+    def __init__(self, root, profile, output=None, workers=None):
+        self.root = Path(root).absolute()
+        self.profile_name = profile
+        self.profile = TRANSCODE_PROFILES[profile]
+        self.output = (Path(output) if output else
+                       self.root.with_name(f"{self.root.name}-{profile}")).absolute()
+        if self.output == self.root:
+            raise ValueError("the output directory must differ from the archive directory")
+        self.workers = workers or max(1, (os.cpu_count() or 1) // self.profile['threads'])
+        self.ffmpeg = _media_tool(FFMPEG_PATH, 'ffmpeg')
+        self.stats = {'files': 0, 'up_to_date': 0, 'converted': 0, 'failed': 0}
+    
+    def plan(self):
+        """
+        Work out which files need converting.
+        
+        Returns:
+            list: (source, target) Path pairs, largest source first so the
+                longest conversions don't start last
+        """
+        extension = self.profile['extension']
+        sources = []
+        targets = defaultdict(list)
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            # Don't convert our own output if it lives inside the archive
+            dirnames[:] = [name for name in dirnames
+                           if Path(dirpath, name).absolute() != self.output]
+            for name in filenames:
+                if os.path.splitext(name)[1].lower() not in self.profile['inputs']:
+                    continue
+                source = Path(dirpath, name)
+                try:
+                    source_st = source.stat()
+                except OSError:
+                    continue
+                target = (self.output / source.relative_to(self.root)).with_suffix(extension)
+                sources.append((source, source_st, target))
+                # normcase: on Windows Clip.webm and clip.m4a collide too
+                targets[os.path.normcase(str(target))].append(source)
+        
+        todo = []
+        claimed = {}
+        for source, source_st, target in sources:
+            self.stats['files'] += 1
+            if len(targets[os.path.normcase(str(target))]) > 1:
+                target = target.with_name(source.name + extension)
+            # Even the long name can be taken (clip.webm.m4a next to clip.webm)
+            owner = claimed.setdefault(os.path.normcase(str(target)), source)
+            if owner is not source:
+                print(f"Skipping {source}: {owner} already converts to {target}")
+                continue
+            try:
+                target_st = target.stat()
+                if target_st.st_size > 0 and target_st.st_mtime_ns >= source_st.st_mtime_ns:
+                    self.stats['up_to_date'] += 1
+                    continue
+            except OSError:
+                pass
+            todo.append((source_st.st_size, source, target))
+        todo.sort(key=lambda item: item[0], reverse=True)
+        return [(source, target) for _, source, target in todo]
+    
+    def run(self, on_result=None):
+        """
+        Convert every file that isn't up to date.
+        
+        Args:
+            on_result: Optional callable(source, error) called as each file
+                finishes (error is None on success)
+            
+        Returns:
+            list: (source, error) for every file that failed
+            
+        Raises:
+            RuntimeError: If ffmpeg isn't available
+        """
+        if not self.ffmpeg:
+            raise RuntimeError("ffmpeg not found - start TubeArc once to download it")
+        todo = self.plan()
+        failed = []
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        futures = {pool.submit(transcode_file, source, target, self.profile, self.ffmpeg): source
+                   for source, target in todo}
+        try:
+            for future in as_completed(futures):
+                source = futures[future]
+                try:
+                    future.result()
+                    error = None
+                    self.stats['converted'] += 1
+                except (OSError, RuntimeError) as e:
+                    error = str(e)
+                    failed.append((source, error))
+                    self.stats['failed'] += 1
+                if on_result:
+                    on_result(source, error)
+        finally:
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=False)
+        return failed
+
+
+# ============================================================================
+# JOB TABLE
+# Kitsune keeps an eye on every hunt at once
+# ============================================================================
+
+# How often the job table applies queued changes and redraws (milliseconds)
+JOB_TABLE_REFRESH_MS = 250
+JOB_TABLE_ROW_HEIGHT = 20
+
+# State filter choices -> states shown
+JOB_TABLE_FILTERS = {
+    "All": None,
+    "Active": (JOB_QUEUED, JOB_HELD, JOB_RETRYING, JOB_RUNNING),
+    "Running": (JOB_RUNNING,),
+    "Waiting": (JOB_QUEUED, JOB_HELD, JOB_RETRYING),
+    "Failed": (JOB_FAILED,),
+    "Finished": (JOB_FINISHED,),
+    "Cancelled": (JOB_CANCELLED,),
+}
+
+_SIZE_UNITS = {'B': 1, 'KB': 1e3, 'MB': 1e6, 'GB': 1e9, 'TB': 1e12,
+               'KIB': 1024, 'MIB': 1024 ** 2, 'GIB': 1024 ** 3, 'TIB': 1024 ** 4}
+
+
+def _size_to_bytes(text):
+    """Parse a yt-dlp size such as "1.23MiB" or "1.23MiB/s" (0 if it can't)."""
+    match = re.match(r'\s*([\d.]+)\s*([KMGT]?i?B)', text or '', re.IGNORECASE)
+    if not match:
+        return 0
+    try:
+        return float(match.group(1)) * _SIZE_UNITS.get(match.group(2).upper(), 1)
+    except ValueError:
+        return 0
+
+
+class JobTable:
+    """
+    Virtualized table of every job in a JobQueue.
+    
+    The Treeview only ever holds as many rows as fit on screen; scrolling
+    moves a window over the filtered, sorted list of jobs and rewrites those
+    rows in place, so 10k jobs cost no more widgets than 20. Queue listeners
+    (on worker threads) only set a flag; every JOB_TABLE_REFRESH_MS the Tk
+    thread rebuilds the list once if anything changed and redraws the
+    visible rows, skipping rows whose values haven't changed.
+    
+    Args:
+        parent: Tk container to build the table in
+        queue: JobQueue whose jobs are shown
+    """
+    
+    COLUMNS = (
+        # (id, heading, width, anchor)
+        ('url', "URL", 260, tk.W),
+        ('state', "Status", 70, tk.W),
+        ('progress', "Progress", 70, tk.E),
+        ('speed', "Speed", 85, tk.E),
+        ('eta', "ETA", 55, tk.E),
+        ('priority', "Priority", 75, tk.W),
+    )
+    STATE_COLORS = {JOB_RUNNING: "blue", JOB_FAILED: "red", JOB_HELD: "#C06000",
+                    JOB_RETRYING: "#C06000", JOB_FINISHED: "#2E7D32", JOB_CANCELLED: "gray"}
+    
+    def __init__(self, parent, queue):
+        self.queue = queue
+        self._jobs = []
+        self._view = []
+        self._offset = 0
+        self._items = []
+        self._shown = []
+        self._selected = None
+        self._sort_column = None
+        self._sort_reverse = False
+        self._dirty = True
+        self._closed = False
+        
+        controls = tk.Frame(parent)
+        controls.pack(fill=tk.X, pady=(0, 5))
+        tk.Label(controls, text="Show:", font=("Arial", 9)).pack(side=tk.LEFT)
+        self.filter_var = tk.StringVar(value="All")
+        filter_box = ttk.Combobox(controls, textvariable=self.filter_var, state="readonly",
+                                  values=list(JOB_TABLE_FILTERS), width=10)
+        filter_box.pack(side=tk.LEFT, padx=(2, 8))
+        filter_box.bind('<<ComboboxSelected>>', lambda event: self.refresh())
+        tk.Label(controls, text="URL contains:", font=("Arial", 9)).pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        search = tk.Entry(controls, textvariable=self.search_var, font=("Arial", 9), width=24)
+        search.pack(side=tk.LEFT, padx=(2, 8))
+        search.bind('<KeyRelease>', lambda event: self.refresh())
+        self.cancel_btn = tk.Button(controls, text="Cancel Job", command=self._cancel_selected,
+                                    state=tk.DISABLED)
+        self.cancel_btn.pack(side=tk.RIGHT)
+        
+        body = tk.Frame(parent)
+        body.pack(fill=tk.BOTH, expand=True)
+        style = ttk.Style()
+        style.configure("Jobs.Treeview", rowheight=JOB_TABLE_ROW_HEIGHT)
+        self.tree = ttk.Treeview(body, columns=[c[0] for c in self.COLUMNS], show="headings",
+                                 style="Jobs.Treeview", selectmode="browse")
+        for column, heading, width, anchor in self.COLUMNS:
+            self.tree.heading(column, text=heading,
+                              command=lambda c=column: self._sort_by(c))
+            self.tree.column(column, width=width, anchor=anchor,
+                             stretch=(column == 'url'))
+        for state, color in self.STATE_COLORS.items():
+            self.tree.tag_configure(state, foreground=color)
+        self.scrollbar = ttk.Scrollbar(body, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        self.summary_label = tk.Label(parent, text="", font=("Arial", 9), fg="gray")
+        self.summary_label.pack(anchor=tk.W, pady=(5, 0))
+        
+        self.tree.bind('<Configure>', self._on_resize)
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+        # The tree never has more rows than fit, so scrolling is ours to do
+        self.tree.bind('<MouseWheel>', self._on_wheel)
+        self.tree.bind('<Button-4>', lambda event: self._scroll_to(self._offset - 3))
+        self.tree.bind('<Button-5>', lambda event: self._scroll_to(self._offset + 3))
+        self.tree.bind('<Prior>', lambda event: self._scroll_to(self._offset - len(self._items)))
+        self.tree.bind('<Next>', lambda event: self._scroll_to(self._offset + len(self._items)))
+        
+        queue.add_listener(self._on_job_changed)
+        self._tick()
+    
+    def close(self):
+        """Stop refreshing and detach from the queue."""
+        self._closed = True
+        self.queue.remove_listener(self._on_job_changed)
+    
+    def refresh(self):
+        """Rebuild the filtered, sorted job list on the next tick."""
+        self._dirty = True
+    
+    def _on_job_changed(self, job):
+        # Runs on queue worker threads - just note that something changed
+        self._dirty = True
+    
+    # --- Model -----------------------------------------------------------------
+    
+    def _sort_key(self, column):
+        if column == 'progress':
+            return lambda job: (job.progress or {}).get('percent') or \
+                (100.0 if job.state == JOB_FINISHED else 0.0)
+        if column == 'speed':
+            return lambda job: _size_to_bytes((job.progress or {}).get('speed'))
+        if column == 'eta':
+            return lambda job: (job.progress or {}).get('eta') or ''
+        if column == 'priority':
+            return lambda job: JOB_PRIORITIES.index(job.priority)
+        return lambda job: getattr(job, column)
+    
+    def _rebuild_view(self):
+        states = JOB_TABLE_FILTERS.get(self.filter_var.get())
+        text = self.search_var.get().strip().lower()
+        view = [job for job in self._jobs
+                if (states is None or job.state in states)
+                and (not text or text in job.url.lower())]
+        if self._sort_column:
+            view.sort(key=self._sort_key(self._sort_column), reverse=self._sort_reverse)
+        self._view = view
+        self._scroll_to(self._offset)
+    
+    def _sort_by(self, column):
+        if self._sort_column == column:
+            self._sort_reverse = not self._sort_reverse
+        else:
+            self._sort_column, self._sort_reverse = column, column in ('progress', 'speed')
+        for name, heading, _, _ in self.COLUMNS:
+            arrow = (" \u25BC" if self._sort_reverse else " \u25B2") if name == column else ""
+            self.tree.heading(name, text=heading + arrow)
+        self.refresh()
+    
+    # --- View --------------------------------------------------------------------
+    
+    @staticmethod
+    def _row_values(job):
+        progress = job.progress or {}
+        if job.state == JOB_FINISHED:
+            percent = "100%"
+        elif progress.get('postprocessor'):
+            percent = "processing"
+        elif 'percent' in progress and job.state == JOB_RUNNING:
+            percent = f"{progress['percent']:.1f}%"
+        else:
+            percent = ""
+        running = job.state == JOB_RUNNING
+        return (job.url, job.state, percent,
+                (progress.get('speed') or "") if running else "",
+                (progress.get('eta') or "") if running else "",
+                job.priority)
+    
+    def _on_resize(self, event):
+        # Header height isn't exposed by ttk; one row's worth is close enough
+        rows = max(1, event.height // JOB_TABLE_ROW_HEIGHT - 1)
+        if rows != len(self._items):
+            if self._items:
+                self.tree.delete(*self._items)
+            self._items = [self.tree.insert("", tk.END, values=()) for _ in range(rows)]
+            self._shown = [None] * rows
+            self._scroll_to(self._offset)
+    
+    def _scroll_to(self, offset):
+        self._offset = max(0, min(offset, len(self._view) - len(self._items)))
+        self._render()
+        return "break"
+    
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self._scroll_to(int(float(amount) * len(self._view)))
+        elif action == 'scroll':
+            step = len(self._items) if unit == 'pages' else 1
+            self._scroll_to(self._offset + int(amount) * step)
+    
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        steps = -event.delta // 120 if abs(event.delta) >= 120 else -event.delta
+        return self._scroll_to(self._offset + steps * 3)
+    
+    def _render(self):
+        """Write the visible slice of the view into the recycled rows."""
+        visible = self._view[self._offset:self._offset + len(self._items)]
+        selected_item = None
+        for index, item in enumerate(self._items):
+            if index < len(visible):
+                job = visible[index]
+                values, tags = self._row_values(job), (job.state,)
+                if job.job_id == self._selected:
+                    selected_item = item
+            else:
+                values, tags = ("",) * len(self.COLUMNS), ()
+            if self._shown[index] != (values, tags):
+                self.tree.item(item, values=values, tags=tags)
+                self._shown[index] = (values, tags)
+        # Selection follows the job, not the recycled row
+        current = self.tree.selection()
+        if selected_item and current != (selected_item,):
+            self.tree.selection_set(selected_item)
+        elif not selected_item and current:
+            self.tree.selection_remove(*current)
+        
+        total = len(self._view)
+        if total:
+            self.scrollbar.set(self._offset / total,
+                               min(1.0, (self._offset + len(self._items)) / total))
+        else:
+            self.scrollbar.set(0, 1)
+    
+    def _on_select(self, event=None):
+        selection = self.tree.selection()
+        if selection and selection[0] in self._items:
+            index = self._items.index(selection[0]) + self._offset
+            if index < len(self._view):
+                self._selected = self._view[index].job_id
+        job = self.queue.get(self._selected) if self._selected else None
+        pending = job is not None and job.state in JOB_PENDING_STATES
+        self.cancel_btn.config(state=tk.NORMAL if pending else tk.DISABLED)
+    
+    def _cancel_selected(self):
+        if self._selected:
+            self.queue.cancel(self._selected)
+            self.refresh()
+    
+    def _tick(self):
+        if self._closed:
+            return
+        volatile = self._sort_column in ('progress', 'speed', 'eta')
+        if self._dirty or volatile:
+            self._dirty = False
+            self._jobs = self.queue.jobs()
+            self._rebuild_view()
+            self._on_select()
+            counts = self.queue.counts()
+            self.summary_label.config(
+                text=f"{counts['running']} running, {counts['queued']} queued, "
+                     f"{counts['held']} held, {counts['retrying']} retrying - "
+                     f"showing {len(self._view):,} of {len(self._jobs):,} jobs")
+        else:
+            # Progress moves without state changes; only visible rows are read
+            self._render()
+        self.tree.after(JOB_TABLE_REFRESH_MS, self._tick)
+
 
 # ============================================================================
 # MAIN APPLICATION CLASS
@@ -124,7 +5949,9 @@ class TubeArcArchiver:
         self._configure_window()
         self._ensure_directories()
         self.config = self._load_config()
+        self.engine = get_engine(self.config.get('engine', 'auto'), self.config)
         self._build_ui()
+        self._create_job_queue()
         self._initialize_tools()
     
     # ------------------------------------------------------------------------
@@ -134,9 +5961,9 @@ class TubeArcArchiver:
     def _configure_window(self):
         """Configure the main application window properties."""
         self.root.title(f"TubeArc Media Archiver v{TUBEARC_VERSION} ({TUBEARC_CODENAME})")
-        self.root.geometry("600x420")
+        self.root.geometry("600x440")
         self.root.resizable(True, False)
-        self.root.minsize(500, 420)
+        self.root.minsize(500, 440)
     
     def _ensure_directories(self):
         """Create necessary application directories if they don't exist."""
@@ -145,28 +5972,75 @@ class TubeArcArchiver:
     
     def _load_config(self):
         """
-        Load application configuration from JSON file.
+        Load application configuration from the state store.
         
         Returns:
-            dict: Configuration dictionary with default values if file doesn't exist
+            dict: Configuration dictionary with default values for missing keys
         """
         default_config = {'download_path': str(DOWNLOAD_FOLDER)}
         
-        if not CONFIG_PATH.exists():
-            return default_config
-        
         try:
-            with CONFIG_PATH.open('r') as f:
-                return json.load(f)
+            return dict(default_config, **get_state_store().get_section('config'))
         except Exception as e:
             print(f"Config load error: {e}")
             return default_config
     
+    def _create_job_queue(self):
+        """Create the job queue and requeue jobs interrupted by a crash or close."""
+        self.job_queue = JobQueue(self._run_job, journal=JobJournal(),
+                                  max_workers=self.config.get('max_concurrent_jobs', 1),
+                                  capacity=self.config.get('queue_capacity', DEFAULT_QUEUE_CAPACITY),
+                                  admission=make_disk_guard(self.engine, self.config),
+                                  preemption=self.config.get('preempt_bulk_jobs', True),
+                                  retry_policy=RetryPolicy(self.config.get('max_retries')),
+                                  batcher=make_job_batcher(self.engine, self.config))
+        self.job_queue.add_listener(index_finished_job)
+        self.job_queue.add_listener(self._on_job_held)
+        self.job_queue.add_listener(self._on_job_failed)
+        restored = self.job_queue.restore()
+        if restored:
+            print(f"{len(restored)} interrupted job(s) will resume once tools are ready")
+        
+        self.api_server = None
+        if self.config.get('api_enabled'):
+            try:
+                self.api_server = ArchiveAPIServer(
+                    self.job_queue,
+                    host=self.config.get('api_host', API_DEFAULT_HOST),
+                    port=self.config.get('api_port', API_DEFAULT_PORT),
+                    token=self.config.get('api_token'),
+                    download_path=self.config['download_path'],
+                    options={'layout': self.config.get('output_layout', 'flat'),
+                             'quality': self.config.get('quality_policy', 'best')}).start()
+            except OSError as e:
+                print(f"Archive API could not start: {e}")
+    
+    def _on_job_held(self, job):
+        """Explain why a job isn't starting (runs on a worker thread)."""
+        if job.state == JOB_HELD:
+            message = job.error or "Waiting for disk space"
+            self.root.after(0, lambda: self._update_status(message, "orange"))
+    
+    def _on_job_failed(self, job):
+        """Report a failed job, or when it will be retried (runs on a worker thread)."""
+        if job.state == JOB_RETRYING:
+            message = f"Archive failed ({job.failure}) - retrying at {job.retry_at[11:16]}"
+            self.root.after(0, lambda: self._update_status(message, "orange"))
+        elif job.state == JOB_FAILED:
+            if job.source == 'window':
+                self._handle_error(job.error or '')
+            else:
+                self.root.after(0, lambda: self._update_status("Archive failed", "red"))
+    
+    def _start_job_queue(self):
+        """Start processing queued jobs once yt-dlp is available."""
+        if self.engine.available():
+            self.job_queue.start()
+    
     def _save_config(self):
-        """Save current configuration to JSON file."""
+        """Save changed configuration keys to the state store."""
         try:
-            with CONFIG_PATH.open('w') as f:
-                json.dump(self.config, f, indent=2)
+            get_state_store().update_section('config', self.config)
         except Exception as e:
             print(f"Config save error: {e}")
     
@@ -198,6 +6072,19 @@ class TubeArcArchiver:
         menubar = tk.Menu(self.root)
         self.root.config(menu=menubar)
         
+        # Tools menu
+        tools_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Tools", menu=tools_menu)
+        tools_menu.add_command(label="Job Queue...", command=self._show_job_table,
+                               accelerator="Ctrl+J")
+        self.root.bind('<Control-j>', self._show_job_table)
+        tools_menu.add_separator()
+        tools_menu.add_command(label="Search Catalog...", command=self._show_catalog_search)
+        tools_menu.add_command(label="Rebuild Catalog", command=self._rebuild_catalog)
+        tools_menu.add_separator()
+        tools_menu.add_command(label="Harvest Metadata from URL List...",
+                               command=self._harvest_from_file)
+        
         # Help menu
         help_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Help", menu=help_menu)
@@ -275,6 +6162,145 @@ class TubeArcArchiver:
         tk.Button(frame, text="Close", command=about_window.destroy,
                  font=("Arial", 10), width=10).pack()
     
+    def _rebuild_catalog(self):
+        """Scan the archive directory into the catalog in the background."""
+        archive_dir = self.dir_entry.get().strip()
+        self._update_status("Updating catalog...", "blue")
+        
+        def scan():
+            try:
+                catalog = Catalog()
+                stats = catalog.scan(archive_dir)
+                catalog.close()
+                message = (f"Catalog updated: {stats['indexed']} indexed, "
+                           f"{stats['removed']} removed")
+                self.root.after(0, lambda: self._update_status(message, "green"))
+            except Exception as e:
+                self.root.after(0, lambda: self._update_status(f"Catalog update failed: {e}", "red"))
+        
+        threading.Thread(target=scan, daemon=True).start()
+    
+    def _harvest_from_file(self):
+        """Pick a URL list and harvest its metadata in the background."""
+        if not YT_DLP_PATH.exists():
+            messagebox.showerror("Error", "yt-dlp not available. Please wait for setup to complete.")
+            return
+        url_file = filedialog.askopenfilename(
+            title="Select URL list", filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        if not url_file:
+            return
+        
+        urls = read_url_list(url_file)
+        download_path = self.dir_entry.get().strip()
+        concurrency = self.config.get('harvest_concurrency', DEFAULT_HARVEST_CONCURRENCY)
+        
+        def on_progress(done, total, result):
+            self.root.after(0, lambda: self._update_status(
+                f"Harvesting metadata... {done}/{total}", "blue"))
+        
+        def harvest():
+            results = harvest_metadata(urls, download_path, {'layout': self.layout_var.get()},
+                                       concurrency=concurrency, progress_callback=on_progress)
+            failed = sum(1 for result in results if not result['ok'])
+            message = f"Metadata harvest complete: {len(results) - failed} ok, {failed} failed"
+            self.root.after(0, lambda: self._update_status(message, "red" if failed else "green"))
+        
+        self._update_status(f"Harvesting metadata for {len(urls)} URL(s)...", "blue")
+        threading.Thread(target=harvest, daemon=True).start()
+    
+    def _show_job_table(self, event=None):
+        """Open the job queue window (or bring it to the front)."""
+        window = getattr(self, '_job_window', None)
+        if window is not None and window.winfo_exists():
+            window.lift()
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Job Queue")
+        window.geometry("760x420")
+        frame = tk.Frame(window, padx=10, pady=10)
+        frame.pack(fill=tk.BOTH, expand=True)
+        table = JobTable(frame, self.job_queue)
+        window.protocol("WM_DELETE_WINDOW", lambda: (table.close(), window.destroy()))
+        self._job_window = window
+    
+    def _show_catalog_search(self):
+        """Open the catalog search window."""
+        window = tk.Toplevel(self.root)
+        window.title("Search Catalog")
+        window.geometry("720x420")
+        
+        frame = tk.Frame(window, padx=10, pady=10)
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        search_frame = tk.Frame(frame)
+        search_frame.pack(fill=tk.X)
+        
+        fields = {}
+        for label, key, width in (("Search:", 'query', 24), ("Uploader:", 'uploader', 12),
+                                  ("Tag:", 'tag', 10), ("From:", 'date_from', 10),
+                                  ("To:", 'date_to', 10)):
+            tk.Label(search_frame, text=label, font=("Arial", 9)).pack(side=tk.LEFT)
+            entry = tk.Entry(search_frame, font=("Arial", 9), width=width)
+            entry.pack(side=tk.LEFT, padx=(2, 8))
+            fields[key] = entry
+        
+        columns = ("title", "uploader", "date", "platform")
+        tree = ttk.Treeview(frame, columns=columns, show="headings")
+        for column, width in zip(columns, (320, 150, 80, 80)):
+            tree.heading(column, text=column.title())
+            tree.column(column, width=width, anchor=tk.W)
+        tree.pack(fill=tk.BOTH, expand=True, pady=(10, 5))
+        
+        result_label = tk.Label(frame, text="", font=("Arial", 9), fg="gray")
+        result_label.pack(anchor=tk.W)
+        
+        catalog = Catalog()
+        window.protocol("WM_DELETE_WINDOW", lambda: (catalog.close(), window.destroy()))
+        
+        def run_search(event=None):
+            criteria = {key: entry.get().strip() or None for key, entry in fields.items()}
+            started = time.perf_counter()
+            try:
+                results = catalog.search(limit=500, **criteria)
+            except sqlite3.Error as e:
+                result_label.config(text=f"Search error: {e}", fg="red")
+                return
+            elapsed = (time.perf_counter() - started) * 1000
+            
+            tree.delete(*tree.get_children())
+            for row in results:
+                date = row['upload_date'] or ''
+                if len(date) == 8:
+                    date = f"{date[:4]}-{date[4:6]}-{date[6:]}"
+                tree.insert("", tk.END, iid=row['media_path'],
+                            values=(row['title'], row['uploader'] or '', date, row['platform'] or ''))
+            result_label.config(text=f"{len(results)} result(s) in {elapsed:.1f} ms "
+                                     f"(double-click to open)", fg="gray")
+        
+        def open_selected(event=None):
+            selection = tree.selection()
+            if selection:
+                self._open_path(selection[0])
+        
+        for entry in fields.values():
+            entry.bind('<Return>', run_search)
+        tree.bind('<Double-1>', open_selected)
+        tk.Button(search_frame, text="Search", command=run_search).pack(side=tk.LEFT)
+        fields['query'].focus_set()
+        run_search()
+    
+    def _open_path(self, path):
+        """Open a file with the system's default application."""
+        try:
+            if os.name == 'nt':
+                os.startfile(path)
+            elif sys.platform == 'darwin':
+                subprocess.Popen(["open", path])
+            else:
+                subprocess.Popen(["xdg-open", path])
+        except Exception as e:
+            messagebox.showerror("Open Failed", f"Could not open file:\n{e}")
+    
     def _create_header(self, parent):
         """Create the application title header."""
         tk.Label(parent, text="TubeArc Media Archiver", 
@@ -316,6 +6342,12 @@ class TubeArcArchiver:
         
         tk.Button(input_frame, text="Browse", 
                  command=self._browse_directory).pack(side=tk.RIGHT, padx=(5, 0))
+        
+        # Folder layout inside the archive directory
+        self.layout_var = tk.StringVar(value=self.config.get('output_layout', 'flat'))
+        ttk.Combobox(input_frame, textvariable=self.layout_var, width=9,
+                     values=list(OUTPUT_LAYOUTS), state="readonly").pack(side=tk.RIGHT, padx=(5, 0))
+        tk.Label(input_frame, text="Layout:", font=("Arial", 9)).pack(side=tk.RIGHT, padx=(5, 0))
     
     def _create_options_section(self, parent):
         """Create the download options section."""
@@ -352,6 +6384,11 @@ class TubeArcArchiver:
                                                state="disabled")
         self.audio_only_check.pack(anchor=tk.W)
         
+        self.metadata_only_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(left_col, text="Metadata only (no media)",
+                      variable=self.metadata_only_var, font=("Arial", 9),
+                      command=self._toggle_metadata_only).pack(anchor=tk.W)
+        
         # Right column - Additional options
         right_col = tk.Frame(options_frame)
         right_col.pack(side=tk.LEFT)
@@ -366,10 +6403,19 @@ class TubeArcArchiver:
         self.subtitle_var = tk.BooleanVar(value=False)
         tk.Checkbutton(right_col, text="Download subtitles",
                       variable=self.subtitle_var, font=("Arial", 9)).pack(anchor=tk.W)
+        
+        # Quality policy for combined archives
+        quality_frame = tk.Frame(right_col)
+        quality_frame.pack(anchor=tk.W, pady=(3, 0))
+        tk.Label(quality_frame, text="Quality:", font=("Arial", 9)).pack(side=tk.LEFT)
+        self.quality_var = tk.StringVar(value=self.config.get('quality_policy', 'best'))
+        ttk.Combobox(quality_frame, textvariable=self.quality_var, width=7,
+                     values=list(QUALITY_POLICIES), state="readonly").pack(side=tk.LEFT, padx=(5, 0))
     
     def _toggle_separate_options(self):
         """Enable/disable separate download options based on combined checkbox."""
         if self.combined_var.get():
+            self.metadata_only_var.set(False)
             # Combined is checked - disable separate options
             self.video_only_check.config(state="disabled")
             self.audio_only_check.config(state="disabled")
@@ -380,6 +6426,19 @@ class TubeArcArchiver:
             self.video_only_check.config(state="normal")
             self.audio_only_check.config(state="normal")
     
+    def _toggle_metadata_only(self):
+        """Disable the media options while 'Metadata only' is checked."""
+        if self.metadata_only_var.get():
+            self.combined_var.set(False)
+            self._toggle_separate_options()
+            self.video_only_check.config(state="disabled")
+            self.audio_only_check.config(state="disabled")
+            self.video_only_var.set(False)
+            self.audio_only_var.set(False)
+        else:
+            self.combined_var.set(True)
+            self._toggle_separate_options()
+    
     def _create_download_button(self, parent):
         """Create the main download button."""
         self.download_btn = tk.Button(parent, text="Archive Video", 
@@ -462,8 +6521,12 @@ class TubeArcArchiver:
                 "Missing Library",
                 "The 'requests' library is required.\n\n"
                 "Please run: pip install requests"))
+            self._start_job_queue()
             return
         
+        # Finish bookkeeping for an update applied before this start
+        self._confirm_applied_update()
+        
         # Check if we should check for updates (once per day)
         should_check = self._should_check_for_updates()
         
@@ -476,15 +6539,14 @@ class TubeArcArchiver:
         
         # Download tools if missing
         self._download_all_tools()
+        
+        # Resume interrupted jobs and accept new ones
+        self._start_job_queue()
     
     def _should_check_for_updates(self):
         """Determine if we should check for updates (once per day)."""
-        if not VERSION_CACHE_PATH.exists():
-            return True
-        
         try:
-            with VERSION_CACHE_PATH.open('r') as f:
-                cache = json.load(f)
+            cache = get_state_store().get_section('version_cache')
             
             last_check = datetime.fromisoformat(cache.get('last_check', '2000-01-01'))
             return (datetime.now() - last_check) > timedelta(days=1)
@@ -492,21 +6554,39 @@ class TubeArcArchiver:
             return True
     
     def _update_version_cache(self, data):
-        """Update the version cache file."""
+        """Update the version cache (one atomic write, only changed keys)."""
         try:
-            cache = {}
-            if VERSION_CACHE_PATH.exists():
-                with VERSION_CACHE_PATH.open('r') as f:
-                    cache = json.load(f)
-            
-            cache.update(data)
-            cache['last_check'] = datetime.now().isoformat()
-            
-            with VERSION_CACHE_PATH.open('w') as f:
-                json.dump(cache, f, indent=2)
+            get_state_store().update_section(
+                'version_cache', dict(data, last_check=datetime.now().isoformat()))
         except Exception as e:
             print(f"Failed to update version cache: {e}")
     
+    def _confirm_applied_update(self):
+        """
+        Keep the file validators of an update only if it was really applied.
+        
+        They are stored as pending when the updater is launched. If this
+        process runs the version that was downloaded, the files on disk are
+        the ones the validators describe; otherwise the updater failed and
+        the validators would make the next update skip files it still needs.
+        """
+        try:
+            store = get_state_store()
+            pending = store.get_section('version_cache').get('pending_update')
+            if not pending:
+                return
+            
+            if pending.get('version') == TUBEARC_VERSION:
+                print(f"Update to v{TUBEARC_VERSION} applied")
+                store.update_section('version_cache', {
+                    'file_validators': pending.get('file_validators') or {}})
+            else:
+                print(f"Update to v{pending.get('version')} was not applied "
+                      f"(running v{TUBEARC_VERSION}); it will be offered again")
+            store.delete_key('version_cache', 'pending_update')
+        except Exception as e:
+            print(f"Failed to confirm the last update: {e}")
+    
     def _check_tubearc_update(self):
         """Check if a new version of TubeArc is available on GitHub."""
         try:
@@ -515,23 +6595,26 @@ class TubeArcArchiver:
             
             print(f"Checking for updates... Current version: {TUBEARC_VERSION}")
             
-            # Try to get latest release from GitHub
-            response = requests.get(GITHUB_API_URL, timeout=10)
+            # Ask GitHub for the latest release - a 304 if nothing changed
+            cache = get_state_store().get_section('version_cache')
+            release, validators, changed = fetch_latest_release(cache)
             
-            if response.status_code == 200:
-                release = response.json()
+            if release is not None:
                 latest_version = release['tag_name'].lstrip('v')
                 
-                print(f"Latest version on GitHub: {latest_version}")
+                if changed:
+                    print(f"Latest version on GitHub: {latest_version}")
+                else:
+                    print(f"Release unchanged since last check (v{latest_version})")
                 
                 if self._is_newer_version(latest_version, TUBEARC_VERSION):
                     self.root.after(0, lambda: self._prompt_tubearc_update(latest_version, release))
                 else:
                     print("TubeArc is up to date!")
                 
-                self._update_version_cache({'tubearc_version': latest_version})
-            else:
-                print(f"Could not check for updates (HTTP {response.status_code})")
+                self._update_version_cache({'tubearc_version': latest_version,
+                                            'release': release,
+                                            'release_validators': validators})
                 
         except Exception as e:
             print(f"Update check failed: {e}")
@@ -566,45 +6649,27 @@ class TubeArcArchiver:
         try:
             self._update_status("Downloading TubeArc update...", "blue")
             
-            # Get list of files to download from the release
-            files_to_download = [
-                "tubearc.py",
-                "updater.py",
-                "README.md",
-                "README_TUBEARC.md"
-            ]
+            # Fetch changed files in parallel; nothing is staged unless every
+            # file matches the release's checksum manifest
+            cache = get_state_store().get_section('version_cache')
+            payloads, validators = download_update_files(
+                UPDATE_FILES, cache.get('file_validators'))
             
-            downloaded_files = []
+            if payloads is None:
+                messagebox.showwarning(
+                    "Update Can't Be Verified",
+                    f"This release has no {UPDATE_CHECKSUMS_FILE} manifest, so TubeArc "
+                    "can't check its files and won't install it automatically.\n\n"
+                    "You can download it yourself from:\n"
+                    f"https://github.com/{GITHUB_REPO_OWNER}/{GITHUB_REPO_NAME}/releases")
+                return
             
-            # Download each file
-            for filename in files_to_download:
-                try:
-                    file_url = f"{GITHUB_RAW_URL}/{filename}"
-                    print(f"Downloading {filename} from: {file_url}")
-                    
-                    response = requests.get(file_url, timeout=30)
-                    response.raise_for_status()
-                    
-                    # Save with _new suffix (except updater.py which we need now)
-                    if filename == "updater.py":
-                        target_path = SCRIPT_DIR / filename
-                    else:
-                        target_path = SCRIPT_DIR / f"{Path(filename).stem}_new{Path(filename).suffix}"
-                    
-                    target_path.write_text(response.text, encoding='utf-8')
-                    downloaded_files.append(target_path)
-                    print(f"✓ Downloaded to: {target_path}")
-                    
-                except requests.HTTPError as e:
-                    if e.response.status_code == 404:
-                        print(f"  Skipping {filename} (not found in repo)")
-                    else:
-                        print(f"  Warning: Failed to download {filename}: {e}")
-                except Exception as e:
-                    print(f"  Warning: Failed to download {filename}: {e}")
+            if not payloads:
+                messagebox.showinfo("No Changes",
+                                    "All TubeArc files are already up to date.")
+                return
             
-            if not downloaded_files:
-                raise Exception("No files were downloaded successfully!")
+            downloaded_files = stage_update_files(payloads)
             
             # Prompt to run updater
             response = messagebox.askyesno(
@@ -620,6 +6685,11 @@ class TubeArcArchiver:
             )
             
             if response:
+                # The validators only count once the new version starts up
+                # (see _confirm_applied_update); until then they are pending
+                self._update_version_cache({'pending_update': {
+                    'version': release_info['tag_name'].lstrip('v'),
+                    'file_validators': validators}})
                 self._launch_updater()
             else:
                 # User declined - clean up downloaded files
@@ -760,33 +6830,16 @@ class TubeArcArchiver:
                 self.root.after(0, lambda: self._update_status(
                     "Downloading FFmpeg (large file, may take a minute)...", "blue"))
                 
-                # Download FFmpeg archive - try multiple URLs
+                # Download FFmpeg archive - race the mirrors, keep the fastest
                 if not FFMPEG_ARCHIVE.exists():
-                    ffmpeg_downloaded = False
-                    for i, url in enumerate(FFMPEG_URLS, 1):
-                        try:
-                            self.root.after(0, lambda u=url: self._update_status(
-                                f"Trying FFmpeg download {i}/{len(FFMPEG_URLS)}...", "blue"))
-                            print(f"\nAttempting FFmpeg download from URL {i}/{len(FFMPEG_URLS)}")
-                            self._download_file(url, FFMPEG_ARCHIVE)
-                            
-                            # Verify download
-                            if FFMPEG_ARCHIVE.exists() and FFMPEG_ARCHIVE.stat().st_size > 0:
-                                print(f"✓ FFmpeg downloaded successfully from URL {i}")
-                                ffmpeg_downloaded = True
-                                break
-                            else:
-                                print(f"✗ Download from URL {i} resulted in 0 bytes")
-                                if FFMPEG_ARCHIVE.exists():
-                                    FFMPEG_ARCHIVE.unlink()
-                        except Exception as e:
-                            print(f"✗ Failed to download from URL {i}: {e}")
-                            if FFMPEG_ARCHIVE.exists():
-                                FFMPEG_ARCHIVE.unlink()
-                            continue
-                    
-                    if not ffmpeg_downloaded:
-                        raise Exception("Failed to download FFmpeg from all available sources!")
+                    try:
+                        download_from_mirrors(
+                            FFMPEG_URLS, FFMPEG_ARCHIVE, sha256=FFMPEG_SHA256,
+                            status_callback=lambda msg: self.root.after(
+                                0, lambda m=msg: self._update_status(m, "blue")))
+                    except Exception as e:
+                        raise Exception(f"Failed to download FFmpeg from all available sources! {e}")
+                    print("✓ FFmpeg downloaded successfully")
                 
                 # Extract FFmpeg using 7-Zip
                 self.root.after(0, lambda: self._update_status(
@@ -816,118 +6869,11 @@ class TubeArcArchiver:
             url: URL to download from
             destination: Path to save the file
         """
-        print(f"Downloading from: {url}")
-        print(f"Saving to: {destination}")
-        
-        try:
-            # Get file size first
-            response = requests.head(url, timeout=30, allow_redirects=True)
-            total_size = int(response.headers.get('content-length', 0))
-            print(f"File size: {total_size / (1024*1024):.2f} MB")
-            
-            # Download with streaming
-            response = requests.get(url, timeout=300, stream=True, allow_redirects=True)
-            response.raise_for_status()
-            
-            downloaded = 0
-            with destination.open('wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        # Print progress every 10MB
-                        if downloaded % (10 * 1024 * 1024) < 8192:
-                            progress = (downloaded / total_size * 100) if total_size > 0 else 0
-                            print(f"Progress: {downloaded / (1024*1024):.1f} MB / {total_size / (1024*1024):.1f} MB ({progress:.1f}%)")
-            
-            final_size = destination.stat().st_size
-            print(f"Download complete! Final size: {final_size / (1024*1024):.2f} MB")
-            
-            if final_size == 0:
-                raise Exception("Downloaded file is 0 bytes!")
-                
-        except Exception as e:
-            print(f"Download error: {e}")
-            # Clean up partial download
-            if destination.exists():
-                destination.unlink()
-            raise Exception(f"Failed to download {url}: {e}")
+        download_file(url, destination)
     
     def _extract_ffmpeg(self):
         """Extract FFmpeg from the downloaded archive using 7-Zip."""
-        try:
-            print(f"Extracting FFmpeg archive: {FFMPEG_ARCHIVE}")
-            print(f"Archive size: {FFMPEG_ARCHIVE.stat().st_size / (1024*1024):.2f} MB")
-            
-            # Verify 7-Zip exists
-            if not SEVEN_ZIP_PATH.exists():
-                raise Exception("7-Zip not found! Cannot extract FFmpeg.")
-            
-            # Verify archive exists and is not empty
-            if not FFMPEG_ARCHIVE.exists():
-                raise Exception("FFmpeg archive does not exist!")
-            
-            if FFMPEG_ARCHIVE.stat().st_size == 0:
-                raise Exception("FFmpeg archive is 0 bytes! Download failed.")
-            
-            print("Running 7-Zip extraction...")
-            
-            # Extract the archive
-            result = subprocess.run([
-                str(SEVEN_ZIP_PATH), "x",
-                str(FFMPEG_ARCHIVE),
-                f"-o{BIN_DIR}",
-                "-y"  # Overwrite without prompt
-            ], check=True, capture_output=True, text=True)
-            
-            print("7-Zip output:", result.stdout)
-            if result.stderr:
-                print("7-Zip errors:", result.stderr)
-            
-            print("Searching for ffmpeg.exe in extracted files...")
-            
-            # Find the ffmpeg.exe in the extracted folder
-            found = False
-            for item in BIN_DIR.rglob("ffmpeg.exe"):
-                print(f"Found ffmpeg.exe at: {item}")
-                # Move it to the bin directory
-                if item != FFMPEG_PATH:
-                    shutil.move(str(item), str(FFMPEG_PATH))
-                    print(f"Moved to: {FFMPEG_PATH}")
-                found = True
-                break
-            
-            if not found:
-                raise Exception("Could not find ffmpeg.exe in extracted archive!")
-            
-            # Verify ffmpeg was extracted successfully
-            if not FFMPEG_PATH.exists():
-                raise Exception("FFmpeg extraction failed - ffmpeg.exe not found!")
-            
-            print(f"FFmpeg ready at: {FFMPEG_PATH}")
-            print(f"FFmpeg size: {FFMPEG_PATH.stat().st_size / (1024*1024):.2f} MB")
-            
-            # Clean up: remove the archive and extracted folder
-            print("Cleaning up temporary files...")
-            if FFMPEG_ARCHIVE.exists():
-                FFMPEG_ARCHIVE.unlink()
-                print("Removed archive")
-            
-            # Remove extracted directory
-            for item in BIN_DIR.iterdir():
-                if item.is_dir() and item.name.startswith("ffmpeg"):
-                    print(f"Removing extracted folder: {item}")
-                    shutil.rmtree(item)
-            
-            print("FFmpeg extraction complete!")
-                    
-        except subprocess.CalledProcessError as e:
-            error_msg = f"7-Zip extraction failed: {e}\nStdout: {e.stdout}\nStderr: {e.stderr}"
-            print(error_msg)
-            raise Exception(error_msg)
-        except Exception as e:
-            print(f"FFmpeg extraction error: {e}")
-            raise Exception(f"Failed to extract FFmpeg: {e}")
+        extract_ffmpeg()
     
     # ------------------------------------------------------------------------
     # USER INTERACTIONS
@@ -957,13 +6903,7 @@ class TubeArcArchiver:
     # ------------------------------------------------------------------------
     
     def _start_download(self):
-        """Launch the download process in a separate thread."""
-        threading.Thread(target=self._download, daemon=True).start()
-    
-    def _download(self):
-        """
-        Main download function that handles the entire archiving workflow.
-        """
+        """Validate the inputs and add the archive job to the queue."""
         url = self.url_entry.get().strip()
         download_path = Path(self.dir_entry.get().strip())
         
@@ -972,37 +6912,81 @@ class TubeArcArchiver:
             return
         
         # Save configuration
-        self.config['download_path'] = str(download_path)
-        self._save_config()
+        settings = {'download_path': str(download_path), 'output_layout': self.layout_var.get(),
+                    'quality_policy': self.quality_var.get()}
+        if any(self.config.get(key) != value for key, value in settings.items()):
+            self.config.update(settings)
+            self._save_config()
+        
+        job = ArchiveJob(url, download_path, self._get_download_options(),
+                         priority=PRIORITY_INTERACTIVE, source='window')
+        try:
+            self.job_queue.submit(job)
+        except QueueFull:
+            messagebox.showwarning("Queue Full",
+                "Too many videos are waiting to be archived. Try again once some have finished.")
+            return
+        
+        if self.job_queue.pending_count > 1:
+            self._update_status(f"Queued ({self.job_queue.pending_count} jobs pending)", "blue")
+    
+    def _run_job(self, job):
+        """
+        Archive a single queued job (runs on a queue worker thread).
         
+        Args:
+            job: ArchiveJob to run
+            
+        Returns:
+            bool: True if the job succeeded
+        """
         # Prepare UI for download
         self._set_downloading_state(True)
         
         try:
-            download_path.mkdir(parents=True, exist_ok=True)
-            
-            # Build and execute download command
-            cmd = self._build_download_command(url, download_path)
-            
-            # Debug: Print the command
-            print("Executing command:", ' '.join(cmd))
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
+            result = execute_job(job, self._on_download_progress, timeout=600,
+                                 profile=profiling_enabled(self.config),
+                                 engine=self.engine)
             
             # Handle result
             if result.returncode == 0:
-                self._handle_success(download_path)
-            else:
-                self._handle_error(result.stderr or result.stdout)
+                self._handle_success(job.download_path)
+                return True
+            # The queue decides whether to retry; _on_job_failed reports it
+            job.error = result.stderr or result.stdout
+            self._update_status("Archive failed", "red")
+            return False
                 
+        except JobCancelled:
+            if job.preempted:
+                self._update_status("Paused for an interactive archive", "orange")
+            else:
+                self._update_status("Archive cancelled", "orange")
+            return False
         except subprocess.TimeoutExpired:
+            job.error = "Archive timed out"
             self._update_status("Archive timed out", "red")
-            messagebox.showerror("Timeout", "Archiving took too long and was cancelled.")
+            return False
         except Exception as e:
+            job.error = str(e)
             self._update_status("Error occurred", "red")
-            messagebox.showerror("Error", f"An unexpected error occurred:\n{e}")
+            return False
         finally:
-            self._set_downloading_state(False)
+            if self.job_queue.pending_count <= 1:
+                self._set_downloading_state(False)
+    
+    def _on_download_progress(self, progress):
+        """Show yt-dlp progress in the status label (called from the worker thread)."""
+        if progress.get('postprocessor'):
+            text = f"Post-processing ({progress['postprocessor']})..."
+            self.root.after(0, lambda: self._update_status(text, "blue"))
+            return
+        text = f"Archiving... {progress['percent']:.1f}%"
+        if progress.get('speed'):
+            text += f" at {progress['speed']}"
+        if progress.get('eta'):
+            text += f" (ETA {progress['eta']})"
+        self.root.after(0, lambda: self._update_status(text, "blue"))
     
     def _validate_inputs(self, url):
         """
@@ -1022,10 +7006,13 @@ class TubeArcArchiver:
             messagebox.showerror("Invalid URL", "Please enter a valid HTTP/HTTPS URL")
             return False
         
-        if not YT_DLP_PATH.exists():
+        if not self.engine.available():
             messagebox.showerror("Error", "yt-dlp not available. Please wait for setup to complete.")
             return False
         
+        if self.metadata_only_var.get():
+            return True
+        
         if not FFMPEG_PATH.exists() and self.combined_var.get():
             messagebox.showerror("Error", "FFmpeg not available. Please wait for setup to complete.")
             return False
@@ -1039,6 +7026,24 @@ class TubeArcArchiver:
         
         return True
     
+    def _get_download_options(self):
+        """
+        Collect the archive options currently selected in the UI.
+        
+        Returns:
+            dict: Archive options (see DEFAULT_DOWNLOAD_OPTIONS)
+        """
+        return {
+            'combined': self.combined_var.get(),
+            'video_only': self.video_only_var.get(),
+            'audio_only': self.audio_only_var.get(),
+            'metadata': self.metadata_var.get(),
+            'subtitles': self.subtitle_var.get(),
+            'metadata_only': self.metadata_only_var.get(),
+            'layout': self.layout_var.get(),
+            'quality': self.quality_var.get(),
+        }
+    
     def _build_download_command(self, url, download_path):
         """
         Build the yt-dlp command with appropriate flags and options.
@@ -1050,63 +7055,23 @@ class TubeArcArchiver:
         Returns:
             list: Command arguments for subprocess
         """
-        platform = self._get_platform(url)
-        
-        # Build proper output template
-        output_template = str(download_path / "%(title)s.%(ext)s")
-        
-        # Base command
-        cmd = [str(YT_DLP_PATH), url, "-o", output_template]
-        
-        # Set FFmpeg location
-        cmd.extend(["--ffmpeg-location", str(FFMPEG_PATH)])
-        
-        # Download type selection
-        if self.combined_var.get():
-            # Combined video + audio - Kitsune merges them cleverly
-            cmd.extend(["-f", "bestvideo[ext=mp4]+bestaudio[ext=m4a]/bestvideo+bestaudio/best"])
-            cmd.extend(["--merge-output-format", "mp4"])
-            # Ensure audio codec is copied properly
-            cmd.extend(["--postprocessor-args", "ffmpeg:-c:v copy -c:a aac"])
-        else:
-            # Separate downloads
-            if self.video_only_var.get() and self.audio_only_var.get():
-                # Download both separately
-                cmd.extend(["-f", "bestvideo[ext=mp4],bestaudio[ext=m4a]"])
-                cmd.append("--keep-video")
-            elif self.video_only_var.get():
-                # Video only
-                cmd.extend(["-f", "bestvideo[ext=mp4]/bestvideo"])
-            elif self.audio_only_var.get():
-                # Audio only - extract to mp3
-                cmd.extend(["-f", "bestaudio/best"])
-                cmd.extend(["-x", "--audio-format", "mp3"])
-        
-        # Optional features
-        if self.metadata_var.get():
-            cmd.extend(["--write-description", "--write-thumbnail"])
-        
-        if self.subtitle_var.get():
-            cmd.extend(["--write-subs", "--write-auto-subs", "--sub-format", "srt"])
-        
-        # Common options
-        cmd.extend(["--no-playlist"])
-        
-        return cmd
+        return self.engine.build_command(url, download_path, self._get_download_options())
     
     def _set_downloading_state(self, is_downloading):
         """
         Toggle UI state between downloading and ready.
         
+        The button stays enabled while archiving so more videos can be queued.
+        
         Args:
-            is_downloading: True to disable UI, False to enable
+            is_downloading: True while a job is running, False when idle
         """
         if is_downloading:
-            self.download_btn.config(state="disabled", text="Archiving...")
+            self.download_btn.config(text="Archiving... (click to queue another)")
             self.progress.start()
             self._update_status("Archiving...", "blue")
         else:
-            self.download_btn.config(state="normal", text="Archive Video")
+            self.download_btn.config(text="Archive Video")
             self.progress.stop()
     
     def _handle_success(self, download_path):
@@ -1125,31 +7090,510 @@ class TubeArcArchiver:
         self._update_status("Archive failed", "red")
         
         # Map common errors to user-friendly messages
-        error_patterns = {
-            "This video is unavailable": "This video is unavailable or private.",
-            "Video unavailable": "Video is not available for download.",
-            "Sign in to confirm your age": "Age-restricted video. Cannot download.",
-            "HTTP Error 404": "Video not found (404 error).",
-            "Private video": "This is a private video."
-        }
-        
-        for pattern, message in error_patterns.items():
-            if pattern in error_msg:
-                messagebox.showerror("Archive Failed", message)
-                return
+        _, message = classify_failure(error_msg)
+        if message:
+            messagebox.showerror("Archive Failed", message)
+            return
         
         # Generic error message
         messagebox.showerror("Archive Failed", 
             f"Failed to archive video.\n\nError details:\n{error_msg[:300]}...")
 
 
+
+# ============================================================================
+# COMMAND LINE INTERFACE
+# Kitsune also works in the dark (no window needed)
+# ============================================================================
+
+def _cli_dedup(args):
+    """Find duplicate media and optionally replace them with hardlinks."""
+    scanner = DedupScanner(args.directories, workers=args.workers,
+                           min_size=args.min_size_kb * 1024)
+    started = time.perf_counter()
+    groups = scanner.scan()
+    elapsed = time.perf_counter() - started
+    
+    stats = scanner.stats
+    print(f"Scanned {stats['files']} files in {elapsed:.1f}s "
+          f"({stats['partial_hashed']} partial hashes, {stats['full_hashed']} full hashes, "
+          f"{stats['cache_hits']} cache hits)")
+    print(f"Found {len(groups)} duplicate group(s)")
+    
+    if not groups:
+        return 0
+    if args.link or args.dry_run:
+        linked, reclaimed = scanner.link_duplicates(groups, dry_run=not args.link)
+        verb = "Linked" if args.link else "Would link"
+        print(f"{verb} {linked} file(s), reclaiming {reclaimed / (1024*1024):.1f} MB")
+    else:
+        for group in groups:
+            print("\n  " + "\n  ".join(group))
+        print("\nRe-run with --link to replace duplicates with hardlinks.")
+    return 0
+
+
+def _cli_reshard(args):
+    """Move an existing archive into a new folder layout."""
+    started = time.perf_counter()
+    stats = reshard_archive(args.directory, args.layout, dry_run=args.dry_run)
+    elapsed = time.perf_counter() - started
+    
+    verb = "Would move" if args.dry_run else "Moved"
+    print(f"{verb} {stats['files']} file(s) in {stats['groups']} group(s) in {elapsed:.1f}s")
+    print(f"  Already in place: {stats['already_placed']}")
+    if stats['no_metadata']:
+        print(f"  Skipped (no .info.json for '{args.layout}' layout): {stats['no_metadata']}")
+    if stats['conflicts']:
+        print(f"  Skipped (name already taken at destination): {stats['conflicts']}")
+    return 0
+
+
+def _cli_catalog_index(args):
+    """Index archive directories into the catalog."""
+    catalog = Catalog()
+    for directory in args.directories:
+        started = time.perf_counter()
+        stats = catalog.scan(directory)
+        print(f"{directory}: {stats['indexed']} indexed, {stats['unchanged']} unchanged, "
+              f"{stats['removed']} removed ({time.perf_counter() - started:.1f}s)")
+    print(f"Catalog holds {catalog.count()} item(s)")
+    catalog.close()
+    return 0
+
+
+def _cli_search(args):
+    """Search the catalog and print matching files."""
+    catalog = Catalog()
+    started = time.perf_counter()
+    results = catalog.search(args.query, uploader=args.uploader, tag=args.tag,
+                             date_from=args.after, date_to=args.before, limit=args.limit)
+    elapsed = (time.perf_counter() - started) * 1000
+    catalog.close()
+    
+    for row in results:
+        if args.json:
+            print(json.dumps(row))
+        else:
+            print(f"{row['upload_date'] or '--------'}  {(row['uploader'] or '-')[:20]:<20}  "
+                  f"{row['title']}\n          {row['media_path']}")
+    if not args.json:
+        print(f"{len(results)} result(s) in {elapsed:.1f} ms")
+    return 0
+
+
+def _cli_harvest(args):
+    """Collect metadata for a list of URLs without downloading media."""
+    urls = read_url_list(args.url_file)
+    print(f"Harvesting metadata for {len(urls)} URL(s) with {args.concurrency} concurrent probes")
+    
+    def on_progress(done, total, result):
+        if not result['ok']:
+            print(f"  FAILED {result['url']}: {result['error']}")
+        if done % 50 == 0 or done == total:
+            print(f"[{done}/{total}]")
+    
+    started = time.perf_counter()
+    results = harvest_metadata(urls, args.output, {'layout': args.layout},
+                               concurrency=args.concurrency, progress_callback=on_progress,
+                               update_catalog=not args.no_catalog)
+    elapsed = time.perf_counter() - started
+    
+    failed = [result['url'] for result in results if not result['ok']]
+    print(f"Harvested {len(results) - len(failed)}/{len(results)} in {elapsed:.1f}s "
+          f"({len(results) / max(elapsed, 0.001):.1f} URLs/s)")
+    if failed:
+        failed_path = Path(args.url_file).with_suffix('.failed.txt')
+        failed_path.write_text('\n'.join(failed) + '\n', encoding='utf-8')
+        print(f"Failed URLs written to {failed_path}")
+    return 1 if failed else 0
+
+
+def _cli_config_section():
+    return dict({'download_path': str(DOWNLOAD_FOLDER)}, **get_state_store().get_section('config'))
+
+
+def _headless_queue(engine, config, capacity=None):
+    """Build, restore and start a JobQueue for running without the window."""
+    queue = JobQueue(make_job_runner(engine, config), journal=JobJournal(),
+                     max_workers=config.get('max_concurrent_jobs', 1),
+                     capacity=capacity or config.get('queue_capacity', DEFAULT_QUEUE_CAPACITY),
+                     admission=make_disk_guard(engine, config),
+                     preemption=config.get('preempt_bulk_jobs', True),
+                     retry_policy=RetryPolicy(config.get('max_retries')),
+                     batcher=make_job_batcher(engine, config))
+    queue.add_listener(index_finished_job)
+    restored = queue.restore()
+    if restored:
+        print(f"Resuming {len(restored)} interrupted job(s)")
+    queue.start()
+    return queue
+
+
+def _cli_engine(config):
+    """Return the configured engine, or None (with a message) if yt-dlp is missing."""
+    engine = get_engine(config.get('engine', 'auto'), config)
+    if not engine.available():
+        print("yt-dlp is not available - start the GUI once to download it, "
+              "or install the yt_dlp package")
+        return None
+    return engine
+
+
+def _cli_serve(args):
+    """Run the archive queue headless behind the HTTP API."""
+    config = _cli_config_section()
+    if args.workers:
+        config['max_concurrent_jobs'] = args.workers
+    engine = _cli_engine(config)
+    if engine is None:
+        return 1
+    
+    queue = _headless_queue(engine, config, capacity=args.capacity)
+    scheduler = None if args.no_subscriptions else SubscriptionScheduler(queue).start()
+    
+    server = ArchiveAPIServer(queue,
+                              host=args.host or config.get('api_host', API_DEFAULT_HOST),
+                              port=args.port or config.get('api_port', API_DEFAULT_PORT),
+                              token=args.token or config.get('api_token'),
+                              download_path=args.output or config['download_path'],
+                              options={'layout': config.get('output_layout', 'flat'),
+                                       'quality': config.get('quality_policy', 'best')})
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping - unfinished jobs resume at the next start")
+    finally:
+        if scheduler is not None:
+            scheduler.stop()
+        server.stop()
+        engine.close()
+    return 0
+
+
+def _cli_subscriptions(args):
+    """Add, list, remove or sync channel subscriptions."""
+    store = get_state_store()
+    if args.action == 'add':
+        if not re.match(r'https?://', args.url):
+            print(f"Not a URL: {args.url}")
+            return 2
+        config = _cli_config_section()
+        sub = new_subscription(args.url, args.output or config['download_path'],
+                               options={'layout': config.get('output_layout', 'flat'),
+                                        'quality': config.get('quality_policy', 'best')},
+                               interval_hours=args.every, backfill=args.backfill)
+        store.save_subscription(sub)
+        first = datetime.fromtimestamp(sub['next_sync']).strftime('%H:%M')
+        print(f"Subscribed to {args.url} ({sub['platform']}) - synced every "
+              f"{sub['interval_hours']:g}h, first at {first}")
+    elif args.action == 'remove':
+        if not store.delete_subscription(args.url):
+            print(f"Not subscribed to {args.url}")
+            return 1
+    elif args.action == 'list':
+        for sub in store.subscriptions():
+            next_sync = datetime.fromtimestamp(sub['next_sync']).strftime('%Y-%m-%d %H:%M')
+            print(f"{next_sync}  every {sub['interval_hours']:g}h  {sub['url']}")
+            if sub['pending_ids']:
+                print(f"                  catching up: {len(sub['pending_ids'])} new uploads "
+                      "queued, older ones follow")
+            if sub['last_error']:
+                print(f"                  {_first_line(sub['last_error'])}")
+    elif args.action == 'sync':
+        config = _cli_config_section()
+        if args.workers:
+            config['max_concurrent_jobs'] = args.workers
+        engine = _cli_engine(config)
+        if engine is None:
+            return 1
+        queue = _headless_queue(engine, config)
+        try:
+            queued = sync_due_subscriptions(queue, PlatformPacer(), store, everything=args.all)
+            print(f"{queued} new upload(s) queued")
+            while queue.pending_count:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("Stopping - unfinished jobs resume at the next start")
+        finally:
+            engine.close()
+    else:
+        args.print_help()
+        return 2
+    return 0
+
+
+def _cli_config(args):
+    """Show or change a configuration value."""
+    store = get_state_store()
+    if args.key is None:
+        for key, value in sorted(store.get_section('config').items()):
+            print(f"{key} = {json.dumps(value)}")
+    elif args.unset:
+        store.delete_key('config', args.key)
+    elif args.value is None:
+        print(json.dumps(store.get_section('config').get(args.key)))
+    else:
+        try:
+            value = json.loads(args.value)
+        except ValueError:
+            value = args.value
+        store.update_section('config', {args.key: value})
+    return 0
+
+
+def _cli_history(args):
+    """Show recent jobs from the job history."""
+    for job in get_state_store().job_history(args.limit):
+        updated = datetime.fromtimestamp(job['updated']).strftime('%Y-%m-%d %H:%M')
+        print(f"{updated}  {job['state']:<9} {job['url']}")
+        if job['error'] and args.errors:
+            print(f"                  {job['error'].strip().splitlines()[-1]}")
+    return 0
+
+
+def _cli_verify(args):
+    """Check archived media files for truncation and decode errors."""
+    verifier = ArchiveVerifier(args.directories, deep=args.deep,
+                               per_volume=args.per_volume, recheck=args.recheck)
+    
+    reported = set()
+    
+    def report(path, problem):
+        if problem:
+            print(f"  {path}: {problem}")
+            reported.add(path)
+    
+    started = time.perf_counter()
+    try:
+        problems = verifier.verify(report)
+    except RuntimeError as e:
+        print(e)
+        return 1
+    elapsed = time.perf_counter() - started
+    
+    stats = verifier.stats
+    print(f"Verified {stats['files']} files in {elapsed:.1f}s "
+          f"({stats['checked']} checked, {stats['unchanged']} unchanged since the last run)")
+    if problems:
+        print(f"{len(problems)} damaged file(s)")
+        for path, problem in sorted(problems.items()):
+            if path not in reported:
+                print(f"  {path}: {problem} (found by an earlier run)")
+    return 1 if problems else 0
+
+
+def _cli_transcode(args):
+    """Convert an archive folder with a transcode profile."""
+    try:
+        transcoder = BatchTranscoder(args.directory, args.profile, output=args.output,
+                                     workers=args.workers)
+    except ValueError as e:
+        print(e)
+        return 2
+    
+    if args.dry_run:
+        todo = transcoder.plan()
+        for source, target in todo:
+            print(f"  {source} -> {target}")
+        print(f"{len(todo)} of {transcoder.stats['files']} file(s) would be converted "
+              f"into {transcoder.output}")
+        return 0
+    
+    started = time.perf_counter()
+    
+    def report(source, error):
+        done = transcoder.stats['converted'] + transcoder.stats['failed']
+        print(f"  [{done}] {source.relative_to(transcoder.root)}"
+              + (f" FAILED: {error}" if error else ""))
+    
+    print(f"Converting into {transcoder.output} with {transcoder.workers} ffmpeg process(es)")
+    try:
+        failed = transcoder.run(report)
+    except RuntimeError as e:
+        print(e)
+        return 1
+    stats = transcoder.stats
+    print(f"Converted {stats['converted']} file(s) in {time.perf_counter() - started:.1f}s "
+          f"({stats['up_to_date']} already up to date, {stats['failed']} failed)")
+    return 1 if failed else 0
+
+
+def _cli_checksums(args):
+    """Write the SHA256SUMS manifest for a release."""
+    checksums = write_update_checksums(args.dir)
+    if not checksums:
+        print(f"None of {', '.join(UPDATE_FILES)} found in {args.dir}")
+        return 1
+    for filename, digest in checksums.items():
+        print(f"  {digest}  {filename}")
+    print(f"Wrote {Path(args.dir) / UPDATE_CHECKSUMS_FILE} ({len(checksums)} file(s)); "
+          "commit it with the release so self-updates can verify it")
+    return 0
+
+
+def build_cli_parser():
+    """Build the argument parser for headless commands."""
+    parser = argparse.ArgumentParser(
+        prog="tubearc",
+        description=f"TubeArc Media Archiver v{TUBEARC_VERSION} ({TUBEARC_CODENAME}). "
+                    "Run without arguments to open the GUI.")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    
+    config = commands.add_parser("config", help="Show or change settings")
+    config.add_argument("key", nargs="?", help="Setting to show or change")
+    config.add_argument("value", nargs="?",
+                        help="New value (parsed as JSON when possible, e.g. 4 or true)")
+    config.add_argument("--unset", action="store_true", help="Remove the setting")
+    config.set_defaults(func=_cli_config)
+    
+    history = commands.add_parser("history", help="Show recent jobs")
+    history.add_argument("--limit", type=int, default=30, help="Number of jobs (default: 30)")
+    history.add_argument("--errors", action="store_true", help="Show the last error line")
+    history.set_defaults(func=_cli_history)
+    
+    dedup = commands.add_parser("dedup", help="Find duplicate files and hardlink them")
+    dedup.add_argument("directories", nargs="+", help="Archive directories to scan")
+    dedup.add_argument("--link", action="store_true",
+                       help="Replace duplicates with hardlinks")
+    dedup.add_argument("--dry-run", action="store_true",
+                       help="Show what --link would do without changing anything")
+    dedup.add_argument("--workers", type=int, help="Hashing threads")
+    dedup.add_argument("--min-size-kb", type=int, default=1,
+                       help="Ignore files smaller than this (default: 1 KB)")
+    dedup.set_defaults(func=_cli_dedup)
+    
+    verify = commands.add_parser("verify", help="Check archived media files for damage")
+    verify.add_argument("directories", nargs="+", help="Archive directories to check")
+    verify.add_argument("--deep", action="store_true",
+                        help="Also decode sampled segments with ffmpeg (slower)")
+    verify.add_argument("--per-volume", type=int, default=VERIFY_PER_VOLUME,
+                        help=f"Files checked at once on each disk (default: {VERIFY_PER_VOLUME})")
+    verify.add_argument("--recheck", action="store_true",
+                        help="Check every file again, ignoring earlier results")
+    verify.set_defaults(func=_cli_verify)
+    
+    transcode = commands.add_parser("transcode",
+                                    help="Convert an archive folder, e.g. to an MP3 library")
+    transcode.add_argument("directory", help="Archive directory")
+    transcode.add_argument("--profile", required=True, choices=list(TRANSCODE_PROFILES),
+                           help="; ".join(f"{name}: {profile['description']}"
+                                          for name, profile in TRANSCODE_PROFILES.items()))
+    transcode.add_argument("--output", help="Directory for the converted files "
+                                            "(default: <directory>-<profile>)")
+    transcode.add_argument("--workers", type=int,
+                           help="ffmpeg processes at once (default: based on CPU cores)")
+    transcode.add_argument("--dry-run", action="store_true",
+                           help="List the files that would be converted")
+    transcode.set_defaults(func=_cli_transcode)
+    
+    reshard = commands.add_parser("reshard", help="Move an archive into a new folder layout")
+    reshard.add_argument("directory", help="Archive directory")
+    reshard.add_argument("--layout", required=True, choices=list(OUTPUT_LAYOUTS),
+                         help="Target layout")
+    reshard.add_argument("--dry-run", action="store_true",
+                         help="Show the planned moves without changing anything")
+    reshard.set_defaults(func=_cli_reshard)
+    
+    catalog = commands.add_parser("catalog", help="Build or update the metadata catalog")
+    catalog.add_argument("directories", nargs="+", help="Archive directories to index")
+    catalog.set_defaults(func=_cli_catalog_index)
+    
+    search = commands.add_parser("search", help="Search the metadata catalog")
+    search.add_argument("query", nargs="?", default=None,
+                        help="Words to find in title, uploader, tags or description")
+    search.add_argument("--uploader", help="Only items from a matching uploader")
+    search.add_argument("--tag", help="Only items with a matching tag")
+    search.add_argument("--after", help="Uploaded on/after date (YYYY-MM-DD)")
+    search.add_argument("--before", help="Uploaded on/before date (YYYY-MM-DD)")
+    search.add_argument("--limit", type=int, default=50, help="Maximum results (default: 50)")
+    search.add_argument("--json", action="store_true", help="Print one JSON object per result")
+    search.set_defaults(func=_cli_search)
+    
+    harvest = commands.add_parser("harvest",
+                                  help="Collect metadata only (no media) for a list of URLs")
+    harvest.add_argument("url_file", help="Text file with one URL per line")
+    harvest.add_argument("--output", default=str(DOWNLOAD_FOLDER),
+                         help="Directory for the metadata files")
+    harvest.add_argument("--concurrency", type=int, default=DEFAULT_HARVEST_CONCURRENCY,
+                         help=f"Simultaneous probes (default: {DEFAULT_HARVEST_CONCURRENCY})")
+    harvest.add_argument("--layout", default='flat', choices=list(OUTPUT_LAYOUTS),
+                         help="Folder layout (default: flat)")
+    harvest.add_argument("--no-catalog", action="store_true",
+                         help="Don't add the results to the catalog")
+    harvest.set_defaults(func=_cli_harvest)
+    
+    serve = commands.add_parser("serve", help="Run headless and accept jobs over HTTP")
+    serve.add_argument("--host", help=f"Interface to listen on (default: {API_DEFAULT_HOST})")
+    serve.add_argument("--port", type=int, help=f"Port (default: {API_DEFAULT_PORT})")
+    serve.add_argument("--token", help="Require this bearer token on every request")
+    serve.add_argument("--output", help="Archive directory (default: download_path setting)")
+    serve.add_argument("--workers", type=int, help="Jobs archived at the same time")
+    serve.add_argument("--capacity", type=int,
+                       help=f"Waiting jobs before new ones are refused "
+                            f"(default: {DEFAULT_QUEUE_CAPACITY})")
+    serve.add_argument("--no-subscriptions", action="store_true",
+                       help="Don't sync subscriptions in the background")
+    serve.set_defaults(func=_cli_serve)
+    
+    subscriptions = commands.add_parser("subscriptions",
+                                        help="Archive new uploads from channels automatically")
+    subscriptions.set_defaults(func=_cli_subscriptions, action=None,
+                               print_help=subscriptions.print_help)
+    actions = subscriptions.add_subparsers(dest="action", metavar="action")
+    sub_add = actions.add_parser("add", help="Subscribe to a channel or playlist")
+    sub_add.add_argument("url", help="Channel, uploads tab or playlist URL")
+    sub_add.add_argument("--every", type=float, metavar="HOURS",
+                         help=f"Hours between syncs (default: {SUBSCRIPTION_INTERVAL_HOURS})")
+    sub_add.add_argument("--backfill", type=int, default=0,
+                         help="Also archive this many existing uploads (default: new ones only)")
+    sub_add.add_argument("--output", help="Archive directory (default: download_path setting)")
+    sub_remove = actions.add_parser("remove", help="Unsubscribe")
+    sub_remove.add_argument("url", help="Subscribed URL")
+    actions.add_parser("list", help="Show subscriptions and their next sync")
+    sub_sync = actions.add_parser("sync", help="Sync due subscriptions now and archive "
+                                               "their new uploads (e.g. from a scheduled task)")
+    sub_sync.add_argument("--all", action="store_true", help="Sync every subscription, due or not")
+    sub_sync.add_argument("--workers", type=int, help="Jobs archived at the same time")
+    
+    checksums = commands.add_parser("checksums",
+                                    help=f"Write the {UPDATE_CHECKSUMS_FILE} manifest "
+                                         "self-updates verify (for publishing a release)")
+    checksums.add_argument("--dir", default=str(SCRIPT_DIR),
+                           help="Folder with the release files (default: TubeArc's folder)")
+    checksums.set_defaults(func=_cli_checksums)
+    
+    return parser
+
+
+def run_cli(argv):
+    """
+    Run a headless command.
+    
+    Args:
+        argv: Command line arguments (without the program name)
+        
+    Returns:
+        int: Process exit code
+    """
+    parser = build_cli_parser()
+    args = parser.parse_args(argv)
+    if not getattr(args, 'func', None):
+        parser.print_help()
+        return 2
+    return args.func(args)
+
+
 # ============================================================================
 # APPLICATION ENTRY POINT
 # Kitsune awakens
 # ============================================================================
 
 def main():
-    """Initialize and run the application."""
+    """Initialize and run the application (or a headless command if given)."""
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
+    
     try:
         root = tk.Tk()
         app = TubeArcArchiver(root)
@@ -1161,6 +7605,7 @@ def main():
         root.geometry(f"+{x}+{y}")
         
         root.mainloop()
+        app.engine.close()
     except Exception as e:
         # Show error in a message box if GUI fails to start
         error_root = tk.Tk()